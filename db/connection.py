@@ -0,0 +1,67 @@
+"""
+Access to the SQLite settings database.
+
+Every module goes through get_connection(), which hands each thread its own
+long-lived connection per database file instead of connecting and closing
+per operation. Connections run in WAL mode, so readers never block the
+writer and other sessions or background workers only wait for each other
+while writing, and with a busy timeout instead of failing immediately with
+"database is locked". Each connection keeps its compiled statements, so the
+same queries are not prepared again.
+"""
+
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+BUSY_TIMEOUT_S = 30
+STATEMENT_CACHE_SIZE = 128
+
+_local = threading.local()
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Opens a new connection configured for concurrent use."""
+    conn = sqlite3.connect(
+        db_path, timeout=BUSY_TIMEOUT_S, cached_statements=STATEMENT_CACHE_SIZE
+    )
+    conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT_S * 1000)}")
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+    except sqlite3.OperationalError as e:
+        # Another connection holds a lock; the mode is persistent, so it is
+        # enabled by whichever connection gets there first.
+        logger.debug(f"Could not enable WAL mode on {db_path}: {e}")
+    return conn
+
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """Returns the calling thread's pooled connection to db_path."""
+    connections: Dict[str, sqlite3.Connection] = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = connect(db_path)
+    return conn
+
+
+@contextmanager
+def transaction(db_path: str) -> Iterator[sqlite3.Connection]:
+    """Runs the block in a transaction on the pooled connection."""
+    conn = get_connection(db_path)
+    with conn:
+        yield conn
+
+
+def close_connections():
+    """Closes the calling thread's pooled connections."""
+    connections = getattr(_local, "connections", None) or {}
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
@@ -1,57 +1,37 @@
-import sqlite3
-import json
-import os
 import logging
 from typing import Any, Dict
 
+from .settings_store import ensure_schema, load_setting, save_setting
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "settings.db")
+# Optional per-model retry and timeout settings, mapped to whether zero is an
+# allowed value. Defaults are in util.consts.LLM_RETRY_DEFAULTS.
+LLM_RETRY_SETTING_KEYS = {
+    "max_retries": True,
+    "retry_base_delay": False,
+    "retry_max_delay": False,
+    "timeout_base": False,
+    "timeout_per_token": True,
+    "retry_budget": False,
+}
 
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""CREATE TABLE IF NOT EXISTS settings
-                 (key TEXT PRIMARY KEY, value TEXT)""")
-    conn.commit()
-    conn.close()
-
-
-def save_setting(key: str, value: Any):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
-        (key, json.dumps(value)),
-    )
-    conn.commit()
-    conn.close()
-
-
-def load_setting(key: str, default: Any = None) -> Any:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT value FROM settings WHERE key=?", (key,))
-    result = c.fetchone()
-    conn.close()
-
-    if result:
-        return json.loads(result[0])
-    return default
-
-
-def save_search_options(options: Dict[str, Any]):
+    ensure_schema()
+
+
+def save_search_options(options: Dict[str, Any]) -> bool:
     validate_search_options(options)
-    save_setting("search_options", options)
+    return save_setting("search_options", options)
 
 
-def save_llm_settings(settings: Dict[str, Any]):
+def save_llm_settings(settings: Dict[str, Any]) -> bool:
     validate_llm_settings(settings)
-    save_setting("llm_settings", settings)
+    return save_setting("llm_settings", settings)
 
 
 def validate_llm_settings(settings: Dict[str, Any]):
@@ -62,6 +42,13 @@ def validate_llm_settings(settings: Dict[str, Any]):
     if not isinstance(settings["model_settings"], dict):
         raise ValueError("model_settings must be a dictionary")
 
+    if "run_budgets" in settings:
+        validate_run_budgets(settings["run_budgets"])
+    if "storm_parallelism" in settings:
+        validate_storm_parallelism(settings["storm_parallelism"])
+    if "ollama_residency" in settings:
+        validate_ollama_residency(settings["ollama_residency"])
+
     for model, model_settings in settings["model_settings"].items():
         if "model" not in model_settings or "max_tokens" not in model_settings:
             raise ValueError(f"Missing required keys for {model} in model_settings")
@@ -72,6 +59,87 @@ def validate_llm_settings(settings: Dict[str, Any]):
         ):
             raise ValueError(f"max_tokens for {model} must be a positive integer")
 
+        for key in LLM_RETRY_SETTING_KEYS:
+            if key in model_settings:
+                validate_llm_setting_value(
+                    f"model_settings.{model}.{key}", model_settings[key]
+                )
+
+
+def validate_run_budgets(budgets: Dict[str, Any]):
+    if not isinstance(budgets, dict):
+        raise ValueError("run_budgets must be a dictionary")
+    for key, value in budgets.items():
+        if key == "on_exceed":
+            if value not in {"abort", "downgrade"}:
+                raise ValueError("on_exceed must be 'abort' or 'downgrade'")
+        elif key in {"max_total_tokens", "max_llm_calls", "max_duration_s"}:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{key} must be a number")
+            if value < 0:
+                raise ValueError(f"{key} must be non-negative")
+        else:
+            raise ValueError(f"Unknown run budget key: {key}")
+
+
+def validate_storm_parallelism(parallelism: Dict[str, Any]):
+    if not isinstance(parallelism, dict):
+        raise ValueError("storm_parallelism must be a dictionary")
+    for key, value in parallelism.items():
+        if key in {"auto_tune", "speculative_outline", "pipelined_writing"}:
+            if not isinstance(value, bool):
+                raise ValueError(f"{key} must be a boolean")
+        elif key in {"max_conv_turn", "max_perspective", "max_thread_num"}:
+            if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+                raise ValueError(f"{key} must be a positive integer")
+        else:
+            raise ValueError(f"Unknown STORM parallelism key: {key}")
+
+
+def validate_ollama_residency(residency: Dict[str, Any]):
+    if not isinstance(residency, dict):
+        raise ValueError("ollama_residency must be a dictionary")
+    for key, value in residency.items():
+        if key == "warm_up":
+            if not isinstance(value, bool):
+                raise ValueError("warm_up must be a boolean")
+        elif key == "keep_alive_minutes":
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise ValueError("keep_alive_minutes must be an integer")
+        else:
+            raise ValueError(f"Unknown Ollama residency key: {key}")
+
+
+def save_phoenix_settings(settings: Dict[str, Any]) -> bool:
+    validate_phoenix_settings(settings)
+    return save_setting("phoenix_settings", settings)
+
+
+def validate_phoenix_settings(settings: Dict[str, Any]):
+    if not isinstance(settings, dict):
+        raise ValueError("phoenix_settings must be a dictionary")
+    for key, value in settings.items():
+        if key == "enabled":
+            if not isinstance(value, bool):
+                raise ValueError("enabled must be a boolean")
+        elif key in {"project_name", "collector_endpoint"}:
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError(f"{key} must be a non-empty string")
+        elif key == "sample_ratio":
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError("sample_ratio must be a number")
+            if not 0 <= value <= 1:
+                raise ValueError("sample_ratio must be between 0 and 1")
+        elif key in {"schedule_delay_ms", "max_queue_size", "max_export_batch_size"}:
+            if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+                raise ValueError(f"{key} must be a positive integer")
+        else:
+            raise ValueError(f"Unknown Phoenix setting key: {key}")
+    if settings.get("max_export_batch_size", 0) > settings.get(
+        "max_queue_size", float("inf")
+    ):
+        raise ValueError("max_export_batch_size must not exceed max_queue_size")
+
 
 def load_search_options() -> Dict[str, Any]:
     default_options = {
@@ -180,6 +248,13 @@ def update_llm_setting(key: str, value: Any):
         if key not in settings:
             raise ValueError(f"Invalid LLM setting key: {key}")
         settings[key] = validate_llm_setting_value(key, value)
+    elif len(keys) == 2 and keys[0] in {
+        "run_budgets",
+        "storm_parallelism",
+        "ollama_residency",
+    }:
+        # The group is validated as a whole by save_llm_settings.
+        settings[keys[0]] = {**settings.get(keys[0], {}), keys[1]: value}
     elif len(keys) == 3 and keys[0] == "model_settings":
         if keys[1] not in settings["model_settings"]:
             settings["model_settings"][keys[1]] = {}
@@ -201,6 +276,17 @@ def validate_llm_setting_value(key: str, value: Any) -> Any:
     elif key.endswith(".model"):
         if not isinstance(value, str):
             raise ValueError("model must be a string")
+    elif key.split(".")[-1] in LLM_RETRY_SETTING_KEYS:
+        name = key.split(".")[-1]
+        allow_zero = LLM_RETRY_SETTING_KEYS[name]
+        if name == "max_retries" and not isinstance(value, int):
+            raise ValueError("max_retries must be an integer")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{name} must be a number")
+        if value < 0 or (value == 0 and not allow_zero):
+            raise ValueError(
+                f"{name} must be {'non-negative' if allow_zero else 'positive'}"
+            )
     else:
         raise ValueError(f"Unknown LLM setting key: {key}")
     return value
@@ -0,0 +1,322 @@
+"""
+The settings store shared by every page and helper.
+
+The database path comes from the DB_PATH environment variable (set by the
+Docker image to the mounted volume) and defaults to db/settings.db. The
+schema is created and migrated once per process and database, the first
+time the database is used, instead of on every rerun.
+"""
+
+import os
+import json
+import logging
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .connection import get_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "settings.db")
+
+# Schema migrations, applied in order. PRAGMA user_version records how many
+# of them a database has already been through.
+MIGRATIONS = [
+    "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)",
+    # Article catalog, see util.article_catalog.
+    """CREATE TABLE IF NOT EXISTS articles (
+        category TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        files TEXT NOT NULL,
+        title TEXT NOT NULL,
+        short_text TEXT NOT NULL,
+        word_count INTEGER NOT NULL,
+        citation_count INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        size INTEGER NOT NULL,
+        PRIMARY KEY (category, topic)
+    )""",
+    "CREATE INDEX IF NOT EXISTS articles_by_mtime ON articles (mtime DESC)",
+    """CREATE INDEX IF NOT EXISTS articles_by_category_mtime
+        ON articles (category, mtime DESC)""",
+    # Full-text index of the cataloged articles.
+    """CREATE VIRTUAL TABLE IF NOT EXISTS article_search USING fts5(
+        category UNINDEXED,
+        topic UNINDEXED,
+        title,
+        headings,
+        body,
+        reference_titles,
+        tokenize = 'porter unicode61'
+    )""",
+    # Articles cataloged before the search index existed are re-read by the
+    # next reconciliation, which indexes them.
+    "DELETE FROM articles",
+    # Bumped on every write of a key, see SettingsEvents.
+    "ALTER TABLE settings ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+    # Search rows share the rowid of their article, so they are found by
+    # rowid instead of scanning the UNINDEXED category and topic columns.
+    "DROP TABLE IF EXISTS article_search",
+    """CREATE VIRTUAL TABLE article_search USING fts5(
+        title,
+        headings,
+        body,
+        reference_titles,
+        tokenize = 'porter unicode61'
+    )""",
+    "DELETE FROM articles",
+]
+
+_migrated: Set[str] = set()
+_migrate_lock = threading.Lock()
+
+
+def get_db_path() -> str:
+    """Returns the settings database path, honoring DB_PATH."""
+    return os.environ.get("DB_PATH") or DEFAULT_DB_PATH
+
+
+def ensure_schema(db_path: Optional[str] = None):
+    """
+    Creates or migrates the schema of the settings database. Only the first
+    call per database in a process touches the database.
+    """
+    db_path = db_path or get_db_path()
+    if db_path in _migrated:
+        return
+    with _migrate_lock:
+        if db_path in _migrated:
+            return
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with transaction(db_path) as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for migration in MIGRATIONS[version:]:
+                conn.execute(migration)
+            if version < len(MIGRATIONS):
+                logger.info(
+                    f"Migrated {db_path} from schema {version} to {len(MIGRATIONS)}"
+                )
+                conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+        _migrated.add(db_path)
+
+
+_UNDECODED = object()
+
+
+class SettingsCache:
+    """
+    Process-wide cache of the settings table.
+
+    Reads and writes go through the calling thread's pooled connection from
+    db.connection. The cache follows get_db_path(), so changing DB_PATH
+    switches to the other database.
+
+    SQLite bumps PRAGMA data_version on a connection whenever any other
+    connection, in this or another process, commits to the database, so
+    checking it is enough to know whether the cached rows are still valid.
+    The value is tracked per connection, and thus per thread; writes made
+    through the cache drop the keys they change themselves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._db_path = None
+        # key -> (stored text, decoded value, version); None when the key is
+        # missing.
+        self._rows: Dict[str, Optional[Tuple[str, Any, int]]] = {}
+
+    def _validate(self) -> sqlite3.Connection:
+        db_path = get_db_path()
+        if self._db_path != db_path:
+            ensure_schema(db_path)
+            self._db_path = db_path
+            self._rows.clear()
+        conn = get_connection(db_path)
+        data_versions = getattr(self._local, "data_versions", None)
+        if data_versions is None:
+            data_versions = self._local.data_versions = {}
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_versions.get(db_path) != data_version:
+            # Also the case on a thread's first read: its connection cannot
+            # tell what changed before it was opened.
+            self._rows.clear()
+            data_versions[db_path] = data_version
+        return conn
+
+    def _row(
+        self, conn: sqlite3.Connection, key: str
+    ) -> Optional[Tuple[str, Any, int]]:
+        if key not in self._rows:
+            result = conn.execute(
+                "SELECT value, version FROM settings WHERE key=?", (key,)
+            ).fetchone()
+            self._rows[key] = (result[0], _UNDECODED, result[1]) if result else None
+        return self._rows[key]
+
+    def get_text(self, key: str) -> Optional[str]:
+        """Returns the stored text of a setting, or None if it is not set."""
+        with self._lock:
+            conn = self._validate()
+            row = self._row(conn, key)
+            return row[0] if row else None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Returns the JSON-decoded value of a setting."""
+        with self._lock:
+            conn = self._validate()
+            row = self._row(conn, key)
+            if row is None:
+                return default
+            text, value, version = row
+            if value is _UNDECODED:
+                value = json.loads(text)
+                self._rows[key] = (text, value, version)
+        if isinstance(value, (dict, list)):
+            # Callers modify loaded settings in place; decoding is cheaper
+            # than a deepcopy.
+            return json.loads(text)
+        return value
+
+    def get_version(self, key: str) -> int:
+        """Returns how often a setting was written; 0 if it is not set."""
+        with self._lock:
+            conn = self._validate()
+            row = self._row(conn, key)
+            return row[2] if row else 0
+
+    def set_texts(self, texts: Dict[str, str]) -> List[str]:
+        """
+        Stores several settings in one transaction and notifies the
+        subscribers of the changed keys. Settings whose stored text is
+        already the same are not written.
+
+        Returns:
+            list: The keys that were written.
+        """
+        with self._lock:
+            conn = self._validate()
+            changed = {
+                key: text
+                for key, text in texts.items()
+                if (self._row(conn, key) or (None,))[0] != text
+            }
+            if changed:
+                with conn:
+                    conn.executemany(
+                        """INSERT INTO settings (key, value, version) VALUES (?, ?, 1)
+                           ON CONFLICT(key) DO UPDATE
+                           SET value=excluded.value, version=settings.version + 1""",
+                        list(changed.items()),
+                    )
+                for key in changed:
+                    # Read back with its new version on next access.
+                    self._rows.pop(key, None)
+        if changed:
+            settings_events.poll()
+        return list(changed)
+
+    def set_text(self, key: str, text: str) -> bool:
+        return bool(self.set_texts({key: text}))
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+class SettingsEvents:
+    """
+    Notifies subscribers when a setting changes, so whatever is built from
+    it is rebuilt only then instead of on every rerun.
+
+    Every write bumps the version of its key in the settings table. Writes
+    made through this process notify at once; poll() notices writes made by
+    other processes, such as batch workers or another server, and is cheap
+    enough to call on every rerun since nothing is read while the database
+    is unchanged.
+    """
+
+    def __init__(self, cache: SettingsCache):
+        self._cache = cache
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = {}
+        self._versions: Dict[str, int] = {}
+
+    def subscribe(self, key: str, callback: Callable[[str], None]):
+        """
+        Calls callback(key) after every change of key.
+
+        Returns:
+            callable: Removes the subscription.
+        """
+        version = self._cache.get_version(key)
+        with self._lock:
+            self._subscribers.setdefault(key, []).append(callback)
+            self._versions.setdefault(key, version)
+
+        def unsubscribe():
+            with self._lock:
+                callbacks = self._subscribers.get(key, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+
+        return unsubscribe
+
+    def version(self, key: str) -> int:
+        return self._cache.get_version(key)
+
+    def poll(self) -> List[str]:
+        """
+        Notifies the subscribers of keys changed since the last poll.
+
+        Returns:
+            list: The changed keys.
+        """
+        with self._lock:
+            keys = [key for key, callbacks in self._subscribers.items() if callbacks]
+        changed = []
+        for key in keys:
+            version = self._cache.get_version(key)
+            with self._lock:
+                if self._versions.get(key) == version:
+                    continue
+                self._versions[key] = version
+                callbacks = list(self._subscribers.get(key, []))
+            changed.append(key)
+            for callback in callbacks:
+                try:
+                    callback(key)
+                except Exception as e:
+                    logger.error(f"Settings subscriber for {key} failed: {e}")
+        return changed
+
+
+settings_cache = SettingsCache()
+settings_events = SettingsEvents(settings_cache)
+
+
+def save_setting(key: str, value: Any) -> bool:
+    """Saves a setting unless it is unchanged; returns whether it was written."""
+    return settings_cache.set_text(key, json.dumps(value))
+
+
+def save_settings(values: Dict[str, Any]) -> List[str]:
+    """
+    Saves several settings in a single transaction, skipping unchanged ones.
+
+    Args:
+        values (dict): Setting keys mapped to their new values.
+
+    Returns:
+        list: The keys that were written.
+    """
+    return settings_cache.set_texts(
+        {key: json.dumps(value) for key, value in values.items()}
+    )
+
+
+def load_setting(key: str, default: Any = None) -> Any:
+    return settings_cache.get(key, default)
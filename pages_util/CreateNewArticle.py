@@ -1,10 +1,15 @@
 import os
 import json
+import time
+import uuid
 import openai
 from datetime import datetime
 import streamlit as st
-from util.ui_components import UIComponents, StreamlitCallbackHandler
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from util.ui_components import UIComponents
+from util.streamlit_callback import StreamlitCallbackHandler
 from util.file_io import FileIOHelper
+from util import article_catalog
 from util.text_processing import convert_txt_to_md
 from util.storm_runner import (
     set_storm_runner,
@@ -13,6 +18,15 @@ from util.storm_runner import (
     collect_existing_information,
     use_fallback_llm,
     write_fallback_result,
+    fallback_result_path,
+    save_run_metrics,
+)
+from util.run_control import (
+    RunCancelledError,
+    install_cancellation_checks,
+    start_background_run,
+    cancel_run,
+    finish_background_run,
 )
 
 from util.theme_manager import (
@@ -321,6 +335,68 @@ def display_ollama_options(llm_settings):
     return llm_settings["model_settings"]
 
 
+def cancel_article_run(run_key):
+    run_id = st.session_state.pop(run_key, None)
+    if run_id:
+        cancel_run(run_id)
+        finish_background_run(run_id)
+    st.session_state["page3_write_article_state"] = "not started"
+
+
+def run_in_background(run_key, target, **kwargs):
+    """
+    Runs target(cancellation_token=..., **kwargs) on a worker thread and waits
+    for it while keeping the page interruptible, so the Cancel button can stop
+    the run. Returns the result of target or raises its error.
+    """
+    if run_key not in st.session_state:
+        st.session_state[run_key] = uuid.uuid4().hex
+    run_id = st.session_state[run_key]
+    ctx = get_script_run_ctx()
+    run = start_background_run(
+        run_id,
+        target,
+        thread_setup=lambda thread: add_script_run_ctx(thread, ctx),
+        **kwargs,
+    )
+
+    st.button(
+        "Cancel",
+        key=f"{run_key}_cancel",
+        help="Stop this run and free its LLM and search capacity",
+        on_click=cancel_article_run,
+        args=(run_key,),
+    )
+    elapsed = st.empty()
+    # Each st call below is a point where Streamlit can interrupt this script
+    # when the Cancel button is clicked.
+    while not run.wait(0.5):
+        elapsed.caption(f"Running for {int(time.time() - run.started_at)}s")
+    elapsed.empty()
+
+    finish_background_run(run_id)
+    st.session_state.pop(run_key, None)
+    if run.status == "cancelled":
+        raise RunCancelledError("Run was cancelled")
+    if run.error is not None:
+        raise run.error
+    return run.result
+
+
+def generate_final_article(runner, topic, cancellation_token=None):
+    if cancellation_token is not None:
+        install_cancellation_checks(runner, cancellation_token)
+    runner.run(
+        topic=topic,
+        do_research=False,
+        do_generate_outline=False,
+        do_generate_article=True,
+        do_polish_article=True,
+        remove_duplicate=False,
+    )
+    return runner
+
+
 def run_storm_process(status, progress_bar, progress_text):
     callback = ProgressCallback(progress_bar, progress_text, status)
     with status:
@@ -336,9 +412,11 @@ def run_storm_process(status, progress_bar, progress_text):
             )
             logger.info(f"Current working directory: {current_working_dir}")
 
-            runner = st.session_state["run_storm"](
-                st.session_state["page3_topic"],
-                current_working_dir,
+            runner = run_in_background(
+                "page3_storm_run",
+                st.session_state["run_storm"],
+                topic=st.session_state["page3_topic"],
+                current_working_dir=current_working_dir,
                 callback_handler=callback,
             )
 
@@ -346,6 +424,9 @@ def run_storm_process(status, progress_bar, progress_text):
                 handle_successful_run(runner)
             else:
                 raise Exception("STORM runner returned None")
+        except RunCancelledError:
+            st.warning("Article generation was cancelled.")
+            st.session_state["page3_write_article_state"] = "not started"
         except Exception as e:
             logger.error(f"Failed to generate the article: {str(e)}", exc_info=True)
             st.error(f"Failed to generate the article: {str(e)}")
@@ -372,15 +453,14 @@ def finalize_article(status):
             "Now I will connect the information I found for your reference. (This may take 4-5 minutes.)"
         )
         try:
-            st.session_state["runner"].run(
+            run_in_background(
+                "page3_finalize_run",
+                generate_final_article,
+                runner=st.session_state["runner"],
                 topic=st.session_state["page3_topic"],
-                do_research=False,
-                do_generate_outline=False,
-                do_generate_article=True,
-                do_polish_article=True,
-                remove_duplicate=False,
             )
             st.session_state["runner"].post_run()
+            save_run_metrics(st.session_state["runner"])
             process_search_results(
                 st.session_state["runner"],
                 st.session_state["page3_current_working_dir"],
@@ -388,8 +468,15 @@ def finalize_article(status):
             )
             convert_txt_to_md(st.session_state["page3_current_working_dir"])
             rename_and_date_article()
+            article_catalog.index_article(
+                os.path.basename(st.session_state["page3_current_working_dir"]),
+                st.session_state["page3_topic_name_cleaned"],
+            )
             st.session_state["page3_write_article_state"] = "prepare_to_show_result"
             status.update(label="information synthesis complete!", state="complete")
+        except RunCancelledError:
+            st.warning("Article generation was cancelled.")
+            st.session_state["page3_write_article_state"] = "not started"
         except Exception as e:
             st.error(f"Error during final article generation: {str(e)}")
             try:
@@ -411,8 +498,16 @@ def finalize_article(status):
                     ],
                 )
                 existing_info = collect_existing_information(st.session_state["runner"])
+                preview = st.empty()
                 fallback_result = use_fallback_llm(
-                    st.session_state["page3_topic"], existing_info, fallback_lm
+                    st.session_state["page3_topic"],
+                    existing_info,
+                    fallback_lm,
+                    output_path=fallback_result_path(
+                        st.session_state["page3_current_working_dir"],
+                        st.session_state["page3_topic"],
+                    ),
+                    on_chunk=preview.markdown,
                 )
                 write_fallback_result(
                     fallback_result,
@@ -580,6 +675,7 @@ class ProgressCallback(StreamlitCallbackHandler):
         self.status_container = status
         self.steps = ["research", "outline", "article", "polish"]
         self.current_step = 0
+        self.fallback_preview = None
 
     def on_information_gathering_start(self, **kwargs):
         message = kwargs.get(
@@ -635,3 +731,8 @@ class ProgressCallback(StreamlitCallbackHandler):
 
     def on_outline_refinement_end(self, outline: str, **kwargs):
         self.status_container.success("Finish leveraging the collected information.")
+
+    def on_fallback_chunk(self, text: str, **kwargs):
+        if self.fallback_preview is None:
+            self.fallback_preview = self.status_container.empty()
+        self.fallback_preview.markdown(text)
@@ -2,9 +2,10 @@ import os
 import logging
 import streamlit as st
 from util.file_io import FileIOHelper
+from util import article_catalog
 from util.ui_components import UIComponents
 from util.theme_manager import load_and_apply_theme
-from db.db_operations import load_setting, save_setting
+from db.settings_store import load_setting, save_setting
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -32,80 +33,59 @@ def initialize_session_state():
     if "num_columns" not in st.session_state:
         st.session_state.num_columns = load_setting("num_columns", 3)
 
-    categories = ensure_default_categories()
-
-    if "user_articles" not in st.session_state:
-        st.session_state.user_articles = {}
-        for category in categories:
-            local_dir = FileIOHelper.get_output_dir(category)
-            st.session_state.user_articles[category] = (
-                FileIOHelper.read_structure_to_dict(local_dir)
-            )
-
-
-def get_all_articles():
-    all_articles = {}
-    for category, articles in st.session_state.user_articles.items():
-        for article_key, article_data in articles.items():
-            all_articles[f"{category}/{article_key}"] = article_data
-    return all_articles
+    ensure_default_categories()
+    # Picks up articles added, changed or removed outside the app; cheap,
+    # and skipped if the catalog was reconciled moments ago.
+    article_catalog.reconcile()
 
 
 def display_article_list(page_size, num_columns):
     if st.session_state.selected_category == "All Categories":
-        articles = get_all_articles()
+        category_filter = None
     else:
-        articles = st.session_state.user_articles[st.session_state.selected_category]
-
-    article_keys = list(articles.keys())
-    total_articles = len(article_keys)
+        category_filter = st.session_state.selected_category
 
-    current_page = st.session_state.current_page - 1
-    start_idx = current_page * page_size
-    end_idx = min(start_idx + page_size, total_articles)
+    total_articles = article_catalog.count_articles(category_filter)
+    articles = article_catalog.list_articles(
+        category_filter,
+        limit=page_size,
+        offset=(st.session_state.current_page - 1) * page_size,
+    )
 
     cols = st.columns(num_columns)
-    for i in range(start_idx, end_idx):
-        article_key = article_keys[i]
-        article_file_path_dict = articles[article_key]
+    for i, article in enumerate(articles):
+        category = article["category"]
+        article_name = article["topic"]
         with cols[i % num_columns]:
-            article_data = FileIOHelper.assemble_article_data(article_file_path_dict)
-            if article_data:
-                if st.session_state.selected_category == "All Categories":
-                    category, article_name = article_key.split("/", 1)
-                else:
-                    category = st.session_state.selected_category
-                    article_name = article_key
-
-                st.markdown(
-                    f"""
-                    <h3 style="margin-bottom: 0;">
-                        {article_name.replace("_", " ")}
-                    </h3>
-                    <div style="
-                        font-size: 1em;
-                        font-weight: normal;
-                        color: var(--text-color);
-                        opacity: 0.6;">
-                    category: {category}
-                    </div>
-                    """,
-                    unsafe_allow_html=True,
+            st.markdown(
+                f"""
+                <h3 style="margin-bottom: 0;">
+                    {article["title"]}
+                </h3>
+                <div style="
+                    font-size: 1em;
+                    font-weight: normal;
+                    color: var(--text-color);
+                    opacity: 0.6;">
+                category: {category}
+                </div>
+                """,
+                unsafe_allow_html=True,
+            )
+            st.write(article["short_text"] + "...")
+
+            if st.button(
+                "Read More",
+                key=f"view_{category}/{article_name}",
+                use_container_width=False,
+                type="secondary",
+                help="Click to read the full article",
+            ):
+                st.session_state.page2_selected_my_article = (
+                    category,
+                    article_name,
                 )
-                st.write(article_data.get("short_text", "") + "...")
-
-                if st.button(
-                    "Read More",
-                    key=f"view_{article_key}",
-                    use_container_width=False,
-                    type="secondary",
-                    help="Click to read the full article",
-                ):
-                    st.session_state.page2_selected_my_article = (
-                        category,
-                        article_name,
-                    )
-                    st.rerun()
+                st.rerun()
 
     # Pagination controls
     total_pages = max(1, (total_articles + page_size - 1) // page_size)
@@ -130,11 +110,43 @@ def display_article_list(page_size, num_columns):
         st.write(f"Showing all {total_articles} articles")
 
 
+def display_search_results(query):
+    if st.session_state.selected_category == "All Categories":
+        category_filter = None
+    else:
+        category_filter = st.session_state.selected_category
+
+    results = article_catalog.search_articles(query, category_filter)
+    if not results:
+        st.info(f"No articles match '{query}'.")
+        return
+
+    st.write(f"{len(results)} matching articles")
+    for article in results:
+        category = article["category"]
+        article_name = article["topic"]
+        st.markdown(f"### {article['title_highlight']}")
+        st.caption(f"category: {category}")
+        st.markdown(article["snippet"])
+        if st.button(
+            "Read More",
+            key=f"search_{category}/{article_name}",
+            type="secondary",
+            help="Click to read the full article",
+        ):
+            st.session_state.page2_selected_my_article = (category, article_name)
+            st.rerun()
+
+
 def display_selected_article():
     category, article_key = st.session_state.page2_selected_my_article
-    selected_article_file_path_dict = st.session_state.user_articles[category][
-        article_key
-    ]
+    selected_article_file_path_dict = article_catalog.get_article_files(
+        category, article_key
+    )
+    if selected_article_file_path_dict is None:
+        st.warning("This article no longer exists.")
+        del st.session_state.page2_selected_my_article
+        return
     UIComponents.display_article_page(
         article_key,
         selected_article_file_path_dict,
@@ -184,4 +196,12 @@ def my_articles_page():
             st.session_state.selected_category = selected_category
             st.session_state.current_page = 1
 
-        display_article_list_and_controls()
+        query = st.text_input(
+            "Search articles",
+            key="article_search_query",
+            placeholder="Search titles, headings, text and references",
+        )
+        if query.strip():
+            display_search_results(query)
+        else:
+            display_article_list_and_controls()
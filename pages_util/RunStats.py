@@ -0,0 +1,93 @@
+import streamlit as st
+from util.file_io import FileIOHelper
+from util.ui_components import UIComponents
+from util.theme_manager import load_and_apply_theme, get_theme_css
+from util.token_accounting import load_all_run_metrics
+
+
+def aggregate_run_metrics(runs, group):
+    """
+    Sums the per-stage or per-backend metrics of several runs.
+
+    Args:
+        runs (list): Run summaries as returned by load_all_run_metrics().
+        group (str): "by_stage" or "by_backend".
+
+    Returns:
+        list: One row per stage or backend.
+    """
+    totals = {}
+    for run in runs:
+        for name, metrics in run.get(group, {}).items():
+            row = totals.setdefault(
+                name,
+                {
+                    "name": name,
+                    "calls": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "cache_read_tokens": 0,
+                    "cache_write_tokens": 0,
+                    "latency_s": 0.0,
+                },
+            )
+            row["calls"] += metrics.get("calls", 0)
+            row["prompt_tokens"] += metrics.get("prompt_tokens", 0)
+            row["completion_tokens"] += metrics.get("completion_tokens", 0)
+            row["cache_read_tokens"] += metrics.get("cache_read_tokens", 0)
+            row["cache_write_tokens"] += metrics.get("cache_write_tokens", 0)
+            row["latency_s"] = round(row["latency_s"] + metrics.get("latency_s", 0), 3)
+    return list(totals.values())
+
+
+def run_stats_page():
+    current_theme = load_and_apply_theme()
+    UIComponents.apply_custom_css()
+    st.markdown(get_theme_css(current_theme), unsafe_allow_html=True)
+
+    st.title("Run Stats")
+
+    runs = load_all_run_metrics(FileIOHelper.load_output_base_dir())
+    if not runs:
+        st.info("No run metrics yet. They are recorded for every new article run.")
+        return
+
+    total_tokens = sum(run["totals"].get("total_tokens", 0) for run in runs)
+    total_calls = sum(run["totals"].get("calls", 0) for run in runs)
+    prompt_tokens = sum(run["totals"].get("prompt_tokens", 0) for run in runs)
+    cache_read_tokens = sum(run["totals"].get("cache_read_tokens", 0) for run in runs)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Runs", len(runs))
+    col2.metric("LLM calls", total_calls)
+    col3.metric("Tokens", total_tokens)
+    col4.metric(
+        "Prompt cache hits",
+        f"{cache_read_tokens / prompt_tokens:.0%}" if prompt_tokens else "n/a",
+        help="Share of prompt tokens read from the provider's prompt cache",
+    )
+
+    st.subheader("By stage")
+    st.dataframe(aggregate_run_metrics(runs, "by_stage"), use_container_width=True)
+
+    st.subheader("By backend")
+    st.dataframe(aggregate_run_metrics(runs, "by_backend"), use_container_width=True)
+
+    st.subheader("Runs")
+    st.dataframe(
+        [
+            {
+                "article": run.get("article", ""),
+                "category": run.get("category", ""),
+                "started_at": run.get("started_at", ""),
+                "calls": run["totals"].get("calls", 0),
+                "total_tokens": run["totals"].get("total_tokens", 0),
+                "cache_read_tokens": run["totals"].get("cache_read_tokens", 0),
+                "duration_s": run["totals"].get("duration_s", 0),
+                "downgraded": run.get("downgraded", False),
+            }
+            for run in sorted(
+                runs, key=lambda run: run.get("started_at", ""), reverse=True
+            )
+        ],
+        use_container_width=True,
+    )
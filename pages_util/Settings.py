@@ -1,6 +1,6 @@
 import streamlit as st
-import subprocess
 from util.file_io import FileIOHelper
+from util import article_catalog
 import shutil
 import os
 import re
@@ -10,7 +10,19 @@ from util.consts import (
     DARK_THEMES,
     LIGHT_THEMES,
     LLM_MODELS,
+    LLM_RETRY_DEFAULTS,
+    RUN_BUDGET_DEFAULTS,
+    STORM_PARALLELISM_DEFAULTS,
+    OLLAMA_RESIDENCY_DEFAULTS,
 )
+from util.llm_scheduler import suggest_concurrency
+from util.ollama_models import ollama_models
+from util.ollama_residency import (
+    configured_ollama_models,
+    get_resident_models,
+    warm_up_model,
+)
+from util.phoenix_setup import load_phoenix_settings
 from util.theme_manager import (
     load_and_apply_theme,
     get_theme_css,
@@ -21,13 +33,13 @@ from util.theme_manager import (
     get_option_menu_style,
 )
 
+from db.settings_store import load_setting, save_setting, save_settings
 from db.db_operations import (
-    load_setting,
-    save_setting,
     load_search_options,
     update_search_option,
     load_llm_settings,
     save_llm_settings,
+    save_phoenix_settings,
 )
 
 
@@ -98,6 +110,9 @@ def llm_settings():
         args=("fallback_model", llm_settings),
     )
 
+    run_budget_settings(llm_settings)
+    storm_parallelism_settings(llm_settings)
+
     model_settings = llm_settings.get("model_settings", {})
 
     st.subheader("Model-specific Settings")
@@ -152,18 +167,217 @@ def llm_settings():
             args=(f"model_settings.{model}.max_tokens", llm_settings),
         )
 
+        retry_settings(model, llm_settings)
+        if model == "ollama":
+            ollama_residency_settings(llm_settings)
+
+
+def retry_settings(model, llm_settings):
+    model_settings = llm_settings["model_settings"][model]
+    retry_defaults = LLM_RETRY_DEFAULTS.get(model, LLM_RETRY_DEFAULTS["openai"])
+    fields = [
+        ("max_retries", "Max retries", 0, 1, "Retries of a failed LLM call"),
+        (
+            "retry_base_delay",
+            "Base retry delay (s)",
+            0.1,
+            0.5,
+            "First backoff delay; doubles on every retry",
+        ),
+        ("retry_max_delay", "Max retry delay (s)", 0.1, 1.0, "Upper bound per delay"),
+        (
+            "timeout_base",
+            "Request timeout base (s)",
+            1.0,
+            5.0,
+            "Fixed part of the per-request timeout",
+        ),
+        (
+            "timeout_per_token",
+            "Timeout per max token (s)",
+            0.0,
+            0.01,
+            "Added to the timeout for every token of max_tokens",
+        ),
+        (
+            "retry_budget",
+            "Retry budget (s)",
+            1.0,
+            30.0,
+            "Total time one call may spend including retries",
+        ),
+    ]
+
+    with st.expander(f"{model.capitalize()} Retry and Timeout"):
+        for name, label, min_value, step, help_text in fields:
+            default = model_settings.get(name, retry_defaults[name])
+            is_int = name == "max_retries"
+            st.number_input(
+                label,
+                min_value=int(min_value) if is_int else float(min_value),
+                value=int(default) if is_int else float(default),
+                step=int(step) if is_int else float(step),
+                help=help_text,
+                key=f"model_settings.{model}.{name}_input",
+                on_change=update_llm_setting,
+                args=(f"model_settings.{model}.{name}", llm_settings),
+            )
+
+
+def run_budget_settings(llm_settings):
+    budgets = {**RUN_BUDGET_DEFAULTS, **llm_settings.get("run_budgets", {})}
+    llm_settings["run_budgets"] = budgets
+
+    st.subheader("Run Budgets")
+    st.caption("Limits per article run. 0 means unlimited.")
+    fields = [
+        ("max_total_tokens", "Max total tokens", 1000),
+        ("max_llm_calls", "Max LLM calls", 10),
+        ("max_duration_s", "Max duration (s)", 60),
+    ]
+    columns = st.columns(len(fields) + 1)
+    for column, (name, label, step) in zip(columns, fields):
+        with column:
+            st.number_input(
+                label,
+                min_value=0,
+                value=int(budgets[name]),
+                step=step,
+                key=f"run_budgets.{name}_input",
+                on_change=update_llm_setting,
+                args=(f"run_budgets.{name}", llm_settings),
+            )
+    with columns[-1]:
+        options = ["abort", "downgrade"]
+        st.selectbox(
+            "When exceeded",
+            options=options,
+            index=options.index(budgets["on_exceed"]),
+            help="Abort the run, or send the remaining calls to the fallback LLM",
+            key="run_budgets.on_exceed_input",
+            on_change=update_llm_setting,
+            args=("run_budgets.on_exceed", llm_settings),
+        )
+
+
+def storm_parallelism_settings(llm_settings):
+    parallelism = {
+        **STORM_PARALLELISM_DEFAULTS,
+        **llm_settings.get("storm_parallelism", {}),
+    }
+    llm_settings["storm_parallelism"] = parallelism
+
+    st.subheader("STORM Parallelism")
+    fields = [
+        ("max_conv_turn", "Max conversation turns", "Questions per persona"),
+        ("max_perspective", "Max perspectives", "Personas researched per run"),
+        (
+            "max_thread_num",
+            "Threads",
+            "Persona conversations and sections written in parallel",
+        ),
+    ]
+    columns = st.columns(len(fields))
+    for column, (name, label, help_text) in zip(columns, fields):
+        with column:
+            st.number_input(
+                label,
+                min_value=1,
+                max_value=32,
+                value=int(parallelism[name]),
+                step=1,
+                help=help_text,
+                disabled=name == "max_thread_num" and parallelism["auto_tune"],
+                key=f"storm_parallelism.{name}_input",
+                on_change=update_llm_setting,
+                args=(f"storm_parallelism.{name}", llm_settings),
+            )
+
+    st.checkbox(
+        "Auto-tune threads",
+        value=parallelism["auto_tune"],
+        help="Pick the thread count per run from the primary backend's "
+        "concurrency limit and measured latency",
+        key="storm_parallelism.auto_tune_input",
+        on_change=update_llm_setting,
+        args=("storm_parallelism.auto_tune", llm_settings),
+    )
+    if parallelism["auto_tune"]:
+        st.caption(
+            f"Auto-tune currently picks "
+            f"{suggest_concurrency(llm_settings['primary_model'])} threads "
+            f"for {llm_settings['primary_model']}."
+        )
+    st.checkbox(
+        "Draft the outline during research",
+        value=parallelism["speculative_outline"],
+        help="Write the direct outline from the model's own knowledge while "
+        "research runs, so the outline stage only refines it",
+        key="storm_parallelism.speculative_outline_input",
+        on_change=update_llm_setting,
+        args=("storm_parallelism.speculative_outline", llm_settings),
+    )
+    st.checkbox(
+        "Pipeline section writing",
+        value=parallelism["pipelined_writing"],
+        help="Write the lead section while the remaining sections are still "
+        "being written",
+        key="storm_parallelism.pipelined_writing_input",
+        on_change=update_llm_setting,
+        args=("storm_parallelism.pipelined_writing", llm_settings),
+    )
+
+
+def ollama_residency_settings(llm_settings):
+    residency = {
+        **OLLAMA_RESIDENCY_DEFAULTS,
+        **llm_settings.get("ollama_residency", {}),
+    }
+    llm_settings["ollama_residency"] = residency
+
+    with st.expander("Ollama Residency"):
+        st.number_input(
+            "Keep-alive (minutes)",
+            min_value=-1,
+            value=int(residency["keep_alive_minutes"]),
+            step=5,
+            help="How long Ollama keeps the model loaded after a run; -1 keeps it "
+            "loaded until Ollama stops",
+            key="ollama_residency.keep_alive_minutes_input",
+            on_change=update_llm_setting,
+            args=("ollama_residency.keep_alive_minutes", llm_settings),
+        )
+        st.checkbox(
+            "Warm up models at start and before runs",
+            value=residency["warm_up"],
+            key="ollama_residency.warm_up_input",
+            on_change=update_llm_setting,
+            args=("ollama_residency.warm_up", llm_settings),
+        )
+
+        configured = configured_ollama_models(llm_settings)
+        resident = get_resident_models()
+        if resident is None:
+            st.warning("Ollama is not reachable.")
+            return
+        resident_names = {model["model"] for model in resident}
+        for model in configured:
+            if model in resident_names:
+                st.success(f"{model} is loaded")
+            else:
+                st.info(f"{model} is not loaded")
+        if resident:
+            st.dataframe(resident, use_container_width=True)
+
+        if configured and st.button("Warm up now", key="ollama_warm_up_button"):
+            with st.spinner("Loading models..."):
+                for model in configured:
+                    warm_up_model(model, residency["keep_alive_minutes"])
+            st.rerun()
+
 
 def list_downloaded_models():
-    try:
-        output = subprocess.check_output(["ollama", "list"], stderr=subprocess.STDOUT)
-        models_list = []
-        for line in output.decode("utf-8").splitlines():
-            model_name = line.split()[0]
-            models_list.append(model_name)
-        return models_list
-    except Exception as e:
-        print(f"Error executing command: {e}")
-        return []
+    return ollama_models.models()
 
 
 def settings_page(selected_setting=None):
@@ -197,6 +411,10 @@ def update_llm_setting(key, llm_settings):
     keys = key.split(".")
     if len(keys) == 1:
         llm_settings[key] = st.session_state[f"{key}_input"]
+    elif len(keys) == 2:
+        llm_settings.setdefault(keys[0], {})[keys[1]] = st.session_state[
+            f"{key}_input"
+        ]
     elif len(keys) == 3:
         if keys[0] not in llm_settings:
             llm_settings[keys[0]] = {}
@@ -267,7 +485,8 @@ def theme_settings():
         save_theme(custom_theme)
         st.session_state.current_theme = custom_theme
         st.session_state.option_menu_style = get_option_menu_style(custom_theme)
-        st.session_state.theme_updated = True  # Set this flag to True
+        # Remounts this session's menus so they pick up the new theme.
+        st.session_state.menu_version = st.session_state.get("menu_version", 0) + 1
         st.success("Theme applied successfully!")
         st.rerun()
 
@@ -377,9 +596,17 @@ def general_settings():
 
     def update_general_setting(key):
         general_settings[key] = st.session_state[f"{key}_input"]
-        save_setting("general_settings", general_settings)
         if key == "num_columns":
+            # My Articles reads its column count from its own key.
+            save_settings(
+                {
+                    "general_settings": general_settings,
+                    "num_columns": general_settings[key],
+                }
+            )
             st.session_state.num_columns = general_settings[key]
+        else:
+            save_setting("general_settings", general_settings)
 
     st.number_input(
         "Number of columns in article list",
@@ -394,19 +621,15 @@ def general_settings():
     )
 
     st.subheader("Phoenix Settings")
-    phoenix_settings = load_setting(
-        "phoenix_settings",
-        {
-            "project_name": "storm-wiki",
-            "enabled": False,
-            "collector_endpoint": "localhost:6006",
-        },
-    )
+    phoenix_settings = load_phoenix_settings()
 
     def update_phoenix_setting(key):
         phoenix_settings[key] = st.session_state[f"phoenix_{key}_input"]
-        save_setting("phoenix_settings", phoenix_settings)
-        st.session_state.phoenix_settings_updated = True
+        # Tracing is set up again by its settings subscriber.
+        try:
+            save_phoenix_settings(phoenix_settings)
+        except ValueError as e:
+            st.error(f"Phoenix setting not saved: {e}")
 
     toggle_label = (
         "Enable Phoenix Tracing"
@@ -440,6 +663,42 @@ def general_settings():
         args=("collector_endpoint",),
     )
 
+    st.caption(
+        "Spans are exported in batches by a background thread, so traced LLM "
+        "calls never wait for the collector. When the queue is full, the "
+        "oldest spans are dropped."
+    )
+    columns = st.columns(4)
+    with columns[0]:
+        st.number_input(
+            "Sample ratio",
+            min_value=0.0,
+            max_value=1.0,
+            value=float(phoenix_settings["sample_ratio"]),
+            step=0.05,
+            help="Fraction of traces that is recorded and exported.",
+            key="phoenix_sample_ratio_input",
+            on_change=update_phoenix_setting,
+            args=("sample_ratio",),
+        )
+    fields = [
+        ("schedule_delay_ms", "Flush interval (ms)", 500, "Time between exports"),
+        ("max_queue_size", "Queue size", 256, "Spans kept while waiting for export"),
+        ("max_export_batch_size", "Batch size", 64, "Spans sent per export"),
+    ]
+    for column, (name, label, step, help_text) in zip(columns[1:], fields):
+        with column:
+            st.number_input(
+                label,
+                min_value=1,
+                value=int(phoenix_settings[name]),
+                step=step,
+                help=help_text,
+                key=f"phoenix_{name}_input",
+                on_change=update_phoenix_setting,
+                args=(name,),
+            )
+
 
 def category_settings():
     st.header("Category Management")
@@ -521,6 +780,7 @@ def update_category(old_name, new_name):
         categories[categories.index(old_name)] = new_name
         save_categories(categories)
         rename_category_folder(old_name, new_name)
+        article_catalog.reconcile(force=True)
         st.success(f"Category updated from {old_name} to {new_name}")
     else:
         st.error("Category not found")
@@ -532,6 +792,7 @@ def delete_category(category, target_category):
         categories.remove(category)
         save_categories(categories)
         move_category_contents(category, target_category)
+        article_catalog.reconcile(force=True)
         st.success(
             f"Category {category} deleted and contents moved to {target_category}"
         )
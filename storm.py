@@ -1,13 +1,16 @@
 import streamlit as st
 import os
 from dotenv import load_dotenv
-from db.db_operations import init_db
-from util.phoenix_setup import setup_phoenix
+from db.db_operations import load_llm_settings
+from db.settings_store import settings_events
+from util.phoenix_setup import watch_phoenix_settings
+from util.ollama_residency import warm_up_models
 from streamlit_option_menu import option_menu
-from util.theme_manager import load_and_apply_theme, get_option_menu_style
-from pages_util.MyArticles import my_articles_page
-from pages_util.CreateNewArticle import create_new_article_page
-from pages_util.Settings import settings_page
+from util.theme_manager import (
+    load_and_apply_theme,
+    load_theme_from_db,
+    get_option_menu_style,
+)
 
 load_dotenv()
 
@@ -50,16 +53,15 @@ def clear_other_page_session_state(page_index: int):
 
 
 def main():
-    init_db()
-    setup_phoenix()
+    watch_phoenix_settings()
+    # Notifies subscribers of settings changed by other sessions or processes.
+    settings_events.poll()
+    # Skips models that are already warm, so this is cheap on reruns.
+    warm_up_models(load_llm_settings())
 
     if "first_run" not in st.session_state:
         st.session_state["first_run"] = True
 
-    # Initialize theme_updated state
-    if "theme_updated" not in st.session_state:
-        st.session_state.theme_updated = False
-
     # set api keys from secrets
     if st.session_state["first_run"]:
         for key, value in st.secrets.items():
@@ -75,35 +77,31 @@ def main():
         st.session_state["rerun_requested"] = False
         st.rerun()
 
-    # Load theme from database
+    # Reload the theme when it was changed, by this or any other session
+    theme_version = settings_events.version("theme")
+    if st.session_state.get("theme_version") != theme_version:
+        st.session_state.current_theme = load_theme_from_db()
+        st.session_state.theme_version = theme_version
     current_theme = load_and_apply_theme()
     st.session_state.current_theme = current_theme
     st.session_state.option_menu_style = get_option_menu_style(current_theme)
 
-    # Check if Phoenix settings have been updated
-    if st.session_state.get("phoenix_settings_updated", False):
-        setup_phoenix()
-        st.session_state.phoenix_settings_updated = False
-
-    # Check if a force rerun is requested
-    if st.session_state.get("force_rerun", False):
-        st.session_state.force_rerun = False
-        st.rerun()
-
     # Create the sidebar menu
     with st.sidebar:
         st.title("Storm wiki")
-        pages = ["My Articles", "Create New Article", "Settings"]
+        pages = ["My Articles", "Create New Article", "Run Stats", "Settings"]
 
-        # Use a unique key for the menu when the theme is updated
-        menu_key = f"menu_selection_{st.session_state.get('theme_updated', False)}"
+        # Theme changes restyle the menus through styles. Only the session
+        # that applied a theme remounts them, on the page it was showing.
+        menu_version = st.session_state.get("menu_version", 0)
+        menu_key = f"menu_selection_{menu_version}"
 
         menu_selection = option_menu(
             menu_title=None,
             options=pages,
-            icons=["house", "pencil-square", "gear"],
+            icons=["house", "pencil-square", "bar-chart", "gear"],
             menu_icon="cast",
-            default_index=0,
+            default_index=st.session_state["selected_page"],
             styles=st.session_state.option_menu_style,
             key=menu_key,
         )
@@ -115,35 +113,40 @@ def main():
             settings_options = ["General", "Search", "Theme", "LLM", "Categories"]
             icons = ["gear", "search", "brush", "robot", "tags"]
 
-            # Use a unique key for the submenu when the theme is updated
-            submenu_key = (
-                f"settings_submenu_{st.session_state.get('theme_updated', False)}"
-            )
+            submenu_key = f"settings_submenu_{menu_version}"
+            selected_setting = st.session_state.get("selected_setting", "General")
 
             selected_setting = option_menu(
                 menu_title=None,
                 options=settings_options,
                 icons=icons,
                 menu_icon=None,
-                default_index=0,
+                default_index=settings_options.index(selected_setting),
                 styles=st.session_state.option_menu_style,
                 key=submenu_key,
             )
             # Store the selected setting in session state
             st.session_state.selected_setting = selected_setting
 
-    # Reset the theme_updated flag
-    if st.session_state.get("theme_updated", False):
-        st.session_state.theme_updated = False
-
-    # Display the selected page
+    # Display the selected page. Pages are imported when first opened, so
+    # STORM and the LLM SDKs load only once Create New Article needs them.
     if menu_selection == "My Articles":
+        from pages_util.MyArticles import my_articles_page
+
         clear_other_page_session_state(page_index=2)
         my_articles_page()
     elif menu_selection == "Create New Article":
+        from pages_util.CreateNewArticle import create_new_article_page
+
         clear_other_page_session_state(page_index=3)
         create_new_article_page()
+    elif menu_selection == "Run Stats":
+        from pages_util.RunStats import run_stats_page
+
+        run_stats_page()
     elif menu_selection == "Settings":
+        from pages_util.Settings import settings_page
+
         settings_page(st.session_state.selected_setting)
 
     # Update selected_page in session state
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+
+import pytest
+
+from util import article_catalog
+from util.file_io import FileIOHelper
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "settings.db"))
+    output_dir = tmp_path / "output"
+    FileIOHelper.save_output_base_dir(str(output_dir))
+    FileIOHelper.save_categories(["Default", "Science"])
+    return output_dir
+
+
+def write_article(output_dir, category, topic, body, citations=0, mtime=None):
+    topic_dir = output_dir / category / topic
+    topic_dir.mkdir(parents=True, exist_ok=True)
+    article_path = topic_dir / f"{topic}.md"
+    article_path.write_text(f"# summary\n{body}\n", encoding="utf-8")
+    url_to_info = {
+        "url_to_unified_index": {
+            f"https://example.com/{i}": i for i in range(citations)
+        }
+    }
+    (topic_dir / "url_to_info.json").write_text(json.dumps(url_to_info))
+    if mtime is not None:
+        os.utime(article_path, (mtime, mtime))
+    return topic_dir
+
+
+def test_index_article_stores_card_data(library):
+    topic_dir = write_article(
+        library, "Default", "Solar_power", "Solar power is energy.", citations=2
+    )
+
+    assert article_catalog.index_article("Default", "Solar_power") is True
+
+    [article] = article_catalog.list_articles()
+    assert article["title"] == "Solar power"
+    assert article["short_text"].startswith("Solar power is energy.")
+    assert article["word_count"] == 4
+    assert article["citation_count"] == 2
+    files = article_catalog.get_article_files("Default", "Solar_power")
+    assert files["Solar_power.md"] == str(topic_dir / "Solar_power.md")
+
+
+def test_reconcile_only_rereads_changed_articles(library, monkeypatch):
+    now = time.time()
+    write_article(library, "Default", "Old", "Old text.", mtime=now - 100)
+    write_article(library, "Science", "New", "New text.", mtime=now)
+
+    assert article_catalog.reconcile(force=True) == 2
+    assert [a["topic"] for a in article_catalog.list_articles()] == ["New", "Old"]
+    assert article_catalog.count_articles("Science") == 1
+
+    summarized = []
+    summarize_article = article_catalog.summarize_article
+    monkeypatch.setattr(
+        article_catalog,
+        "summarize_article",
+        lambda topic, files: summarized.append(topic)
+        or summarize_article(topic, files),
+    )
+    assert article_catalog.reconcile(force=True) == 0
+    assert summarized == []
+
+    write_article(library, "Default", "Old", "Old text, now longer.")
+    assert article_catalog.reconcile(force=True) == 1
+    assert summarized == ["Old"]
+
+
+def test_reconcile_removes_deleted_articles_and_categories(library):
+    write_article(library, "Default", "Gone", "Text.")
+    write_article(library, "Science", "Moved", "Text.")
+    article_catalog.reconcile(force=True)
+
+    os.remove(library / "Default" / "Gone" / "Gone.md")
+    FileIOHelper.save_categories(["Default"])
+    assert article_catalog.reconcile(force=True) == 2
+    assert article_catalog.count_articles() == 0
+
+
+def test_reconcile_is_throttled(library):
+    article_catalog.reconcile(force=True)
+    write_article(library, "Default", "Later", "Text.")
+    assert article_catalog.reconcile() == 0
+    assert article_catalog.reconcile(force=True) == 1
+
+
+def test_search_ranks_and_highlights_matches(library):
+    write_article(library, "Default", "Solar_power", "Panels convert sunlight.")
+    write_article(
+        library, "Science", "Wind_power", "Turbines are sometimes paired with solar."
+    )
+    article_catalog.reconcile(force=True)
+
+    results = article_catalog.search_articles("solar")
+    assert [r["topic"] for r in results] == ["Solar_power", "Wind_power"]
+    assert results[0]["title_highlight"] == "**Solar** power"
+    assert "**solar**" in results[1]["snippet"]
+
+    assert article_catalog.search_articles("sol", category="Science")[0]["topic"] == (
+        "Wind_power"
+    )
+    assert article_catalog.search_articles('title:"(') == []
+
+
+def test_search_index_follows_moves_and_deletes(library):
+    write_article(library, "Default", "Solar_power", "Panels convert sunlight.")
+    article_catalog.reconcile(force=True)
+
+    (library / "Science").mkdir()
+    os.rename(library / "Default" / "Solar_power", library / "Science" / "Solar_power")
+    article_catalog.reconcile(force=True)
+    [result] = article_catalog.search_articles("sunlight")
+    assert result["category"] == "Science"
+
+    article_catalog.remove_article("Science", "Solar_power")
+    assert article_catalog.search_articles("sunlight") == []
+
+
+def test_search_rows_are_keyed_by_article_rowid(library):
+    write_article(library, "Default", "Solar_power", "Panels convert sunlight.")
+    article_catalog.index_article("Default", "Solar_power")
+    write_article(library, "Default", "Solar_power", "Panels convert daylight.")
+    article_catalog.index_article("Default", "Solar_power")
+
+    conn = article_catalog.get_connection(article_catalog._db_path())
+    assert conn.execute("SELECT rowid FROM article_search").fetchall() == (
+        conn.execute("SELECT rowid FROM articles").fetchall()
+    )
+    assert article_catalog.search_articles("sunlight") == []
+    assert len(article_catalog.search_articles("daylight")) == 1
@@ -0,0 +1,134 @@
+import json
+import time
+import queue
+import multiprocessing
+import pytest
+from util import batch_runner
+from util.batch_runner import load_topics, run_batch
+
+
+def fast_worker(topic, category, purpose):
+    return f"/tmp/{category}/{topic}.md"
+
+
+def failing_worker(topic, category, purpose):
+    raise RuntimeError(f"cannot write {topic}")
+
+
+def slow_worker(topic, category, purpose):
+    if topic == "slow":
+        time.sleep(30)
+    return f"/tmp/{category}/{topic}.md"
+
+
+def test_load_topics_csv(tmp_path):
+    topics_file = tmp_path / "topics.csv"
+    topics_file.write_text(
+        "topic,category,purpose\n"
+        "Quantum computing,Science,overview\n"
+        "Jazz,,\n"
+        ",Science,missing topic\n"
+    )
+
+    topics = load_topics(str(topics_file))
+
+    assert topics == [
+        {"topic": "Quantum computing", "category": "Science", "purpose": "overview"},
+        {"topic": "Jazz", "category": "Default", "purpose": ""},
+    ]
+
+
+def test_load_topics_jsonl(tmp_path):
+    topics_file = tmp_path / "topics.jsonl"
+    topics_file.write_text(
+        json.dumps({"topic": "Jazz", "category": "Music"}) + "\n\n"
+        + json.dumps({"topic": "Blues"}) + "\n"
+    )
+
+    topics = load_topics(str(topics_file))
+
+    assert [t["topic"] for t in topics] == ["Jazz", "Blues"]
+    assert topics[1]["category"] == "Default"
+
+
+def test_run_batch_writes_report(tmp_path):
+    report_path = tmp_path / "report.jsonl"
+    tasks = [
+        {"topic": f"topic{i}", "category": "Default", "purpose": ""}
+        for i in range(3)
+    ]
+
+    records = run_batch(
+        tasks, workers=2, report_path=str(report_path), worker=fast_worker,
+        poll_interval=0.05,
+    )
+
+    assert sorted(r["topic"] for r in records) == ["topic0", "topic1", "topic2"]
+    assert all(r["status"] == "completed" for r in records)
+    lines = [json.loads(line) for line in report_path.read_text().splitlines()]
+    assert len(lines) == 3
+    assert all("duration_s" in line and "started_at" in line for line in lines)
+
+
+def test_run_batch_records_failures():
+    tasks = [{"topic": "broken", "category": "Default", "purpose": ""}]
+
+    records = run_batch(tasks, workers=1, worker=failing_worker, poll_interval=0.05)
+
+    assert records[0]["status"] == "failed"
+    assert "cannot write broken" in records[0]["error"]
+
+
+def test_run_batch_kills_topics_over_timeout():
+    tasks = [
+        {"topic": "slow", "category": "Default", "purpose": ""},
+        {"topic": "fast", "category": "Default", "purpose": ""},
+    ]
+
+    started = time.time()
+    records = run_batch(
+        tasks, workers=2, timeout=1, worker=slow_worker, poll_interval=0.05
+    )
+
+    assert time.time() - started < 10
+    statuses = {r["topic"]: r["status"] for r in records}
+    assert statuses == {"slow": "timeout", "fast": "completed"}
+
+
+class LateQueue:
+    """A results queue whose first wait ends just before the result arrives."""
+
+    new_queue = multiprocessing.Queue
+
+    def __init__(self):
+        self.queue = LateQueue.new_queue()
+        self.waited = False
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def get(self, timeout=None):
+        if not self.waited:
+            self.waited = True
+            time.sleep(timeout)
+            raise queue.Empty
+        return self.queue.get(timeout=timeout)
+
+    def get_nowait(self):
+        return self.queue.get_nowait()
+
+
+def test_run_batch_keeps_results_that_arrive_before_the_timeout(monkeypatch):
+    monkeypatch.setattr(batch_runner.multiprocessing, "Queue", LateQueue)
+    tasks = [{"topic": "quick", "category": "Default", "purpose": ""}]
+
+    records = run_batch(
+        tasks, workers=1, timeout=0.2, worker=fast_worker, poll_interval=0.5
+    )
+
+    assert records[0]["status"] == "completed"
+
+
+def test_run_batch_rejects_invalid_worker_count():
+    with pytest.raises(ValueError):
+        run_batch([], workers=0)
@@ -0,0 +1,57 @@
+import threading
+
+from db.connection import close_connections, get_connection, transaction
+
+
+def test_connections_are_pooled_per_thread(tmp_path):
+    db_path = str(tmp_path / "settings.db")
+    conn = get_connection(db_path)
+    assert get_connection(db_path) is conn
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(get_connection(db_path)))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+    close_connections()
+    assert get_connection(db_path) is not conn
+    close_connections()
+
+
+def test_connections_use_wal_and_busy_timeout(tmp_path):
+    conn = get_connection(str(tmp_path / "settings.db"))
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] > 0
+    close_connections()
+
+
+def test_concurrent_writers_do_not_fail(tmp_path):
+    db_path = str(tmp_path / "settings.db")
+    with transaction(db_path) as conn:
+        conn.execute("CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT)")
+    errors = []
+
+    def write(worker):
+        try:
+            for i in range(50):
+                with transaction(db_path) as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                        (f"{worker}-{i}", str(i)),
+                    )
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close_connections()
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    count = get_connection(db_path).execute("SELECT COUNT(*) FROM settings")
+    assert count.fetchone()[0] == 200
+    close_connections()
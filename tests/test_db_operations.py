@@ -1,7 +1,5 @@
 import pytest
-import os
 from db.db_operations import (
-    DB_PATH,
     init_db,
     save_setting,
     load_setting,
@@ -11,26 +9,21 @@ from db.db_operations import (
     load_llm_settings,
     save_llm_settings,
     update_llm_setting,
+    save_phoenix_settings,
 )
+from db.settings_store import save_settings
+from util.consts import PHOENIX_SETTINGS_DEFAULTS
 
 
 @pytest.fixture(scope="function")
-def test_db():
+def test_db(tmp_path, monkeypatch):
     # Use a temporary database for testing
-    test_db_path = "test_settings.db"
-    original_db_path = DB_PATH
-
-    # Temporarily change the DB_PATH
-    globals()["DB_PATH"] = test_db_path
+    test_db_path = str(tmp_path / "settings.db")
+    monkeypatch.setenv("DB_PATH", test_db_path)
 
     init_db()
 
-    yield
-
-    # Clean up: remove the test database and restore the original DB_PATH
-    if os.path.exists(test_db_path):
-        os.remove(test_db_path)
-    globals()["DB_PATH"] = original_db_path
+    yield test_db_path
 
 
 @pytest.fixture
@@ -79,13 +72,13 @@ def test_load_setting_default(test_db):
     assert loaded_value == default_value
 
 
-def test_save_and_load_search_options(default_search_options):
+def test_save_and_load_search_options(test_db, default_search_options):
     save_search_options(default_search_options)
     loaded_options = load_search_options()
     assert loaded_options == default_search_options
 
 
-def test_update_search_option_valid(default_search_options):
+def test_update_search_option_valid(test_db, default_search_options):
     save_search_options(default_search_options)
     update_search_option("primary_engine", "bing")
     loaded_options = load_search_options()
@@ -150,20 +143,20 @@ def test_load_search_options_default(test_db):
     assert "engine_settings" in default_options
 
 
-def test_save_and_load_llm_settings(default_llm_settings):
+def test_save_and_load_llm_settings(test_db, default_llm_settings):
     save_llm_settings(default_llm_settings)
     loaded_settings = load_llm_settings()
     assert loaded_settings == default_llm_settings
 
 
-def test_update_llm_setting_valid(default_llm_settings):
+def test_update_llm_setting_valid(test_db, default_llm_settings):
     save_llm_settings(default_llm_settings)
     update_llm_setting("primary_model", "openai")
     loaded_settings = load_llm_settings()
     assert loaded_settings["primary_model"] == "openai"
 
 
-def test_update_llm_setting_invalid_key():
+def test_update_llm_setting_invalid_key(test_db):
     with pytest.raises(ValueError):
         update_llm_setting("invalid_key", "value")
 
@@ -180,7 +173,7 @@ def test_update_llm_setting_invalid_value(test_db):
         update_llm_setting("model_settings.ollama.max_tokens", "not_a_number")
 
 
-def test_update_nested_llm_setting(default_llm_settings):
+def test_update_nested_llm_setting(test_db, default_llm_settings):
     save_llm_settings(default_llm_settings)
     update_llm_setting("model_settings.ollama.model", "llama2")
     loaded_settings = load_llm_settings()
@@ -199,3 +192,212 @@ def test_overwrite_setting(test_db):
     save_setting(key, value2)
     loaded_value2 = load_setting(key)
     assert loaded_value2 == value2
+
+
+def test_update_llm_retry_setting(test_db, default_llm_settings):
+    save_llm_settings(default_llm_settings)
+    update_llm_setting("model_settings.ollama.max_retries", 5)
+    update_llm_setting("model_settings.ollama.retry_base_delay", 0.5)
+    loaded_settings = load_llm_settings()
+    assert loaded_settings["model_settings"]["ollama"]["max_retries"] == 5
+    assert loaded_settings["model_settings"]["ollama"]["retry_base_delay"] == 0.5
+
+
+def test_invalid_llm_retry_settings(test_db, default_llm_settings):
+    with pytest.raises(ValueError):
+        update_llm_setting("model_settings.ollama.max_retries", -1)
+    with pytest.raises(ValueError):
+        update_llm_setting("model_settings.ollama.retry_budget", 0)
+    default_llm_settings["model_settings"]["openai"]["max_retries"] = "3"
+    with pytest.raises(ValueError):
+        save_llm_settings(default_llm_settings)
+
+
+def test_update_run_budget_setting(test_db, default_llm_settings):
+    save_llm_settings(default_llm_settings)
+    update_llm_setting("run_budgets.max_total_tokens", 50000)
+    update_llm_setting("run_budgets.on_exceed", "downgrade")
+    loaded_settings = load_llm_settings()
+    assert loaded_settings["run_budgets"] == {
+        "max_total_tokens": 50000,
+        "on_exceed": "downgrade",
+    }
+
+
+def test_invalid_run_budgets(test_db, default_llm_settings):
+    with pytest.raises(ValueError):
+        update_llm_setting("run_budgets.max_llm_calls", -1)
+    with pytest.raises(ValueError):
+        update_llm_setting("run_budgets.on_exceed", "ignore")
+    default_llm_settings["run_budgets"] = {"max_cost": 1}
+    with pytest.raises(ValueError):
+        save_llm_settings(default_llm_settings)
+
+
+def test_update_storm_parallelism_setting(test_db, default_llm_settings):
+    save_llm_settings(default_llm_settings)
+    update_llm_setting("storm_parallelism.max_thread_num", 6)
+    update_llm_setting("storm_parallelism.auto_tune", False)
+    loaded_settings = load_llm_settings()
+    assert loaded_settings["storm_parallelism"] == {
+        "max_thread_num": 6,
+        "auto_tune": False,
+    }
+    with pytest.raises(ValueError):
+        update_llm_setting("storm_parallelism.max_conv_turn", 0)
+
+
+def test_invalid_ollama_residency(test_db, default_llm_settings):
+    default_llm_settings["ollama_residency"] = {"keep_alive_minutes": "30m"}
+    with pytest.raises(ValueError):
+        save_llm_settings(default_llm_settings)
+    default_llm_settings["ollama_residency"] = {"warm_up": "yes"}
+    with pytest.raises(ValueError):
+        save_llm_settings(default_llm_settings)
+
+
+def test_settings_cache_sees_writes_from_other_connections(test_db):
+    import sqlite3
+    import db.settings_store as settings_store
+
+    save_setting("theme", {"primaryColor": "#000000"})
+    assert load_setting("theme") == {"primaryColor": "#000000"}
+
+    # Another process writing to the same file.
+    conn = sqlite3.connect(test_db)
+    conn.execute(
+        "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+        ("theme", '{"primaryColor": "#ffffff"}'),
+    )
+    conn.commit()
+    conn.close()
+
+    assert load_setting("theme") == {"primaryColor": "#ffffff"}
+    assert settings_store.settings_cache.get_text("missing") is None
+
+
+def test_settings_cache_reads_through_each_threads_connection(test_db, monkeypatch):
+    import threading
+    import db.settings_store as settings_store
+    from db.connection import close_connections, get_connection
+
+    used = []
+
+    def pooled_connection(db_path):
+        conn = get_connection(db_path)
+        used.append((threading.get_ident(), conn))
+        return conn
+
+    monkeypatch.setattr(settings_store, "get_connection", pooled_connection)
+    save_setting("num_columns", 3)
+    assert load_setting("num_columns") == 3
+
+    seen = []
+
+    def other_thread():
+        seen.append(load_setting("num_columns"))
+        save_setting("num_columns", 4)
+        close_connections()
+
+    thread = threading.Thread(target=other_thread)
+    thread.start()
+    thread.join()
+
+    assert seen == [3]
+    assert load_setting("num_columns") == 4
+    # One pooled connection per thread.
+    assert len({ident for ident, _ in used}) == 2
+    assert len({id(conn) for _, conn in used}) == 2
+
+
+def test_settings_cache_returns_private_copies(test_db):
+    save_setting("categories", ["Default"])
+    categories = load_setting("categories")
+    categories.append("Science")
+    assert load_setting("categories") == ["Default"]
+
+
+def test_unchanged_settings_are_not_written(test_db):
+    assert save_setting("num_columns", 3) is True
+    assert save_setting("num_columns", 3) is False
+    assert save_setting("num_columns", 4) is True
+    assert load_setting("num_columns") == 4
+
+
+def test_save_settings_writes_changed_keys_in_one_batch(test_db):
+    save_setting("num_columns", 3)
+    written = save_settings({"num_columns": 3, "categories": ["Default", "Science"]})
+    assert written == ["categories"]
+    assert load_setting("categories") == ["Default", "Science"]
+    assert load_setting("num_columns") == 3
+
+
+def test_settings_store_follows_db_path(tmp_path, monkeypatch):
+    import sqlite3
+    from db.settings_store import MIGRATIONS
+
+    first = str(tmp_path / "first" / "settings.db")
+    second = str(tmp_path / "second" / "settings.db")
+    monkeypatch.setenv("DB_PATH", first)
+    save_setting("num_columns", 2)
+    monkeypatch.setenv("DB_PATH", second)
+    assert load_setting("num_columns", 3) == 3
+
+    conn = sqlite3.connect(first)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+    assert conn.execute("SELECT value FROM settings").fetchone()[0] == "2"
+    conn.close()
+
+
+def test_settings_events_notify_changed_keys(test_db):
+    import sqlite3
+    from db.settings_store import settings_events
+
+    notified = []
+    unsubscribe = settings_events.subscribe("theme", notified.append)
+    version = settings_events.version("theme")
+
+    save_setting("theme", {"primaryColor": "#000000"})
+    save_setting("theme", {"primaryColor": "#000000"})
+    save_setting("num_columns", 2)
+    assert notified == ["theme"]
+    assert settings_events.version("theme") == version + 1
+
+    # Written by another process: noticed on the next poll.
+    conn = sqlite3.connect(test_db)
+    conn.execute(
+        "UPDATE settings SET value='{}', version=version + 1 WHERE key='theme'"
+    )
+    conn.commit()
+    conn.close()
+    assert settings_events.poll() == ["theme"]
+    assert settings_events.poll() == []
+    assert notified == ["theme", "theme"]
+
+    unsubscribe()
+    save_setting("theme", {"primaryColor": "#ffffff"})
+    assert notified == ["theme", "theme"]
+
+
+def test_save_phoenix_settings(test_db):
+    settings = {**PHOENIX_SETTINGS_DEFAULTS, "enabled": True, "sample_ratio": 0.1}
+    assert save_phoenix_settings(settings) is True
+    assert load_setting("phoenix_settings") == settings
+
+
+@pytest.mark.parametrize(
+    "invalid",
+    [
+        {"sample_ratio": 1.5},
+        {"sample_ratio": "all"},
+        {"schedule_delay_ms": 0},
+        {"max_queue_size": 2.5},
+        {"max_queue_size": 100, "max_export_batch_size": 200},
+        {"collector_endpoint": " "},
+        {"exporter": "grpc"},
+    ],
+)
+def test_invalid_phoenix_settings(test_db, invalid):
+    with pytest.raises(ValueError):
+        save_phoenix_settings({**PHOENIX_SETTINGS_DEFAULTS, **invalid})
+    assert load_setting("phoenix_settings") is None
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only imported once an article is generated or tracing is enabled.
+HEAVY_MODULES = (
+    "knowledge_storm",
+    "dspy",
+    "openai",
+    "anthropic",
+    "langchain_community",
+    "phoenix",
+    "opentelemetry",
+)
+
+
+def import_time_report(module):
+    """
+    Imports module in a fresh interpreter with -X importtime.
+
+    Returns:
+        dict: Top-level package to cumulative import time in microseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        packages[package] = max(packages.get(package, 0), int(cumulative))
+    return packages
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["storm", "pages_util.MyArticles", "pages_util.RunStats", "pages_util.Settings"],
+)
+def test_startup_does_not_import_heavy_dependencies(module):
+    packages = import_time_report(module)
+    slowest = sorted(packages.items(), key=lambda item: -item[1])[:10]
+    summary = ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in slowest)
+    heavy = [name for name in HEAVY_MODULES if name in packages]
+    assert heavy == [], f"{module} imports {heavy}; slowest imports: {summary}"
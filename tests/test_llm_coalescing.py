@@ -0,0 +1,132 @@
+import threading
+from unittest.mock import MagicMock
+from util.llm_coalescing import CoalescingLM, SingleFlight, request_key
+from util.run_control import RunCancelledError
+
+
+class SlowLM:
+    def __init__(self):
+        self.kwargs = {"model": "test-model", "temperature": 0.0}
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, prompt, **kwargs):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return [f"answer to {prompt}"]
+
+
+def test_request_key_depends_on_model_prompt_and_params():
+    lm = SlowLM()
+    key = request_key(lm, "prompt", {})
+    assert key == request_key(lm, "prompt", {})
+    assert key != request_key(lm, "other prompt", {})
+    assert key != request_key(lm, "prompt", {"temperature": 0.7})
+
+
+def test_identical_in_flight_requests_share_one_call():
+    lm = SlowLM()
+    group = SingleFlight("test")
+    coalescing = CoalescingLM(lm, group)
+    results = []
+
+    def request():
+        results.append(coalescing("prompt"))
+
+    leader = threading.Thread(target=request)
+    leader.start()
+    lm.started.wait(5)
+    followers = [threading.Thread(target=request) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    while group.snapshot()["coalesced"] < 3:
+        threading.Event().wait(0.01)
+    lm.release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert lm.calls == 1
+    assert results == [["answer to prompt"]] * 4
+    assert len({id(result) for result in results}) == 4
+    assert group.snapshot() == {
+        "backend": "test",
+        "requests": 4,
+        "coalesced": 3,
+        "in_flight": 0,
+    }
+
+
+def test_finished_requests_are_not_reused():
+    lm = SlowLM()
+    lm.release.set()
+    coalescing = CoalescingLM(lm, SingleFlight("test"))
+    coalescing("prompt")
+    coalescing("prompt")
+    assert lm.calls == 2
+
+
+def test_errors_are_shared_with_waiting_callers():
+    group = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing_call():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("backend down")
+
+    errors = []
+
+    def request(fn):
+        try:
+            group.do("key", fn)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=request, args=(failing_call,))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=request, args=(MagicMock(),))
+    follower.start()
+    while group.snapshot()["coalesced"] < 1:
+        threading.Event().wait(0.01)
+    release.set()
+    leader.join()
+    follower.join()
+    assert errors == ["backend down", "backend down"]
+
+
+def test_waiting_callers_send_again_when_the_leaders_run_is_cancelled():
+    group = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    errors, results = [], []
+
+    def cancelled_call():
+        started.set()
+        release.wait(5)
+        raise RunCancelledError("Run was cancelled")
+
+    def lead():
+        try:
+            group.do("key", cancelled_call)
+        except RunCancelledError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(
+        target=lambda: results.append(group.do("key", lambda: "answer"))
+    )
+    follower.start()
+    while group.snapshot()["coalesced"] < 1:
+        threading.Event().wait(0.01)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(errors) == 1
+    assert results == [("answer", False)]
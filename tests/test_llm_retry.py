@@ -0,0 +1,120 @@
+import pytest
+from unittest.mock import MagicMock
+from requests.exceptions import ReadTimeout
+from util.llm_retry import (
+    RetryingLM,
+    is_retryable_error,
+    get_retry_settings,
+    request_timeout,
+    apply_request_timeout,
+    disable_client_retries,
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_is_retryable_error():
+    assert is_retryable_error(ReadTimeout("read timeout=120"))
+    assert is_retryable_error(StatusError(429))
+    assert is_retryable_error(StatusError(502))
+    assert is_retryable_error(ConnectionError("reset"))
+    assert not is_retryable_error(StatusError(401))
+    assert not is_retryable_error(StatusError(404))
+    assert not is_retryable_error(ValueError("bad prompt"))
+
+
+def test_retrying_lm_recovers_from_transient_errors():
+    lm = MagicMock(side_effect=[ReadTimeout("stall"), StatusError(503), ["text"]])
+    sleep = MagicMock()
+    retrying = RetryingLM(lm, max_retries=3, retry_base_delay=1.0, sleep=sleep)
+
+    assert retrying("prompt", temperature=0) == ["text"]
+    assert lm.call_count == 3
+    delays = [c.args[0] for c in sleep.call_args_list]
+    assert 0.5 <= delays[0] <= 1.0
+    assert 1.0 <= delays[1] <= 2.0
+
+
+def test_retrying_lm_does_not_retry_client_errors():
+    lm = MagicMock(side_effect=StatusError(400))
+    sleep = MagicMock()
+
+    with pytest.raises(StatusError):
+        RetryingLM(lm, sleep=sleep)("prompt")
+    assert lm.call_count == 1
+    sleep.assert_not_called()
+
+
+def test_retrying_lm_gives_up_after_max_retries():
+    lm = MagicMock(side_effect=ReadTimeout("stall"))
+
+    with pytest.raises(ReadTimeout):
+        RetryingLM(lm, max_retries=2, sleep=MagicMock())("prompt")
+    assert lm.call_count == 3
+
+
+def test_retrying_lm_respects_budget():
+    lm = MagicMock(side_effect=ReadTimeout("stall"))
+
+    with pytest.raises(ReadTimeout):
+        RetryingLM(
+            lm, max_retries=5, retry_base_delay=10, retry_budget=1, sleep=MagicMock()
+        )("prompt")
+    assert lm.call_count == 1
+
+
+def test_retry_settings_live_next_to_each_model():
+    model_settings = {
+        "ollama": {"model": "llama3", "max_tokens": 1000, "max_retries": 5},
+    }
+
+    settings = get_retry_settings("ollama", model_settings)
+    assert settings["max_retries"] == 5
+    assert settings["retry_budget"] == 600.0
+    assert request_timeout("ollama", model_settings) == 30.0 + 1000 * 0.2
+
+
+def test_apply_request_timeout():
+    ollama = MagicMock()
+    apply_request_timeout(ollama, "ollama", 90)
+    assert ollama.timeout_s == 90
+
+    openai_client = MagicMock()
+    openai_client.kwargs = {}
+    apply_request_timeout(openai_client, "openai", 45)
+    assert openai_client.kwargs["timeout"] == 45
+
+    claude = MagicMock()
+    sdk_client = claude.client
+    apply_request_timeout(claude, "anthropic", 45)
+    sdk_client.with_options.assert_called_once_with(timeout=45)
+    assert claude.client is sdk_client.with_options.return_value
+
+
+def test_disable_client_retries_leaves_retrying_lm_as_only_layer(monkeypatch):
+    import httpx
+    import openai
+    from knowledge_storm.lm import ClaudeModel, OpenAIModel
+
+    monkeypatch.setattr(openai, "max_retries", 2)
+    monkeypatch.setattr(openai, "api_key", None)
+    response = httpx.Response(429, request=httpx.Request("POST", "http://test"))
+    error = openai.RateLimitError("Rate limited", response=response, body=None)
+
+    openai_client = OpenAIModel(model="gpt-4o-mini", api_key="test")
+    disable_client_retries(openai_client, "openai")
+    assert openai.max_retries == 0
+    openai_client.basic_request = MagicMock(side_effect=error)
+    with pytest.raises(openai.RateLimitError):
+        openai_client.request("Hello", model_type="chat")
+    openai_client.basic_request.assert_called_once_with("Hello")
+
+    claude = ClaudeModel(model="claude-3-haiku-20240307", api_key="test")
+    disable_client_retries(claude, "anthropic")
+    assert claude.client.max_retries == 0
+    claude.basic_request = MagicMock(return_value="response")
+    assert claude.request("Hello") == "response"
@@ -0,0 +1,171 @@
+import time
+import threading
+import pytest
+from unittest.mock import MagicMock
+from util.llm_scheduler import (
+    AdaptiveConcurrencyLimiter,
+    ScheduledLM,
+    is_overload_error,
+    latency_class,
+)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def test_is_overload_error():
+    assert is_overload_error(RateLimitError())
+    assert is_overload_error(type("ReadTimeout", (Exception,), {})())
+    assert not is_overload_error(ValueError("bad prompt"))
+
+
+def test_limiter_grows_on_success_and_halves_on_overload():
+    limiter = AdaptiveConcurrencyLimiter(
+        "test", initial_limit=4, max_limit=8, cooldown=0
+    )
+
+    for _ in range(20):
+        limiter.record_success()
+    assert limiter.limit > 4
+
+    grown = limiter.limit
+    limiter.record_overload()
+    assert limiter.limit == grown // 2
+
+
+def test_limiter_backs_off_once_per_burst():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=8, max_limit=8)
+
+    for _ in range(5):
+        limiter.record_overload()
+
+    assert limiter.limit == 4
+    assert limiter.snapshot()["overloads"] == 5
+
+
+def test_limiter_caps_requests_in_flight():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=2, max_limit=2)
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def request():
+        with limiter.slot("run"):
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(0.05)
+            with lock:
+                in_flight.pop()
+
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+    snapshot = limiter.snapshot()
+    assert snapshot["in_flight"] == 0
+    assert snapshot["max_wait_s"] > 0
+
+
+def test_limiter_serves_runs_round_robin():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=1, max_limit=1)
+    order = []
+    limiter.acquire("blocker")
+
+    def request(run_id):
+        with limiter.slot(run_id):
+            order.append(run_id)
+
+    threads = []
+    for run_id in ["a", "a", "a", "b"]:
+        thread = threading.Thread(target=request, args=(run_id,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.02)
+
+    limiter.release()
+    for thread in threads:
+        thread.join()
+
+    assert order.index("b") < 3
+
+
+def test_scheduled_lm_records_outcomes_and_delegates_attributes():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=2, cooldown=0)
+    lm = MagicMock(return_value=["ok"])
+    lm.kwargs = {"temperature": 0.0}
+    lm.history = ["entry"]
+    scheduled = ScheduledLM(lm, limiter, "run")
+
+    assert scheduled("prompt", n=1) == ["ok"]
+    lm.assert_called_once_with("prompt", n=1)
+    assert scheduled.kwargs == {"temperature": 0.0}
+    scheduled.history = []
+    assert lm.history == []
+    assert scheduled.unwrap() is lm
+
+    lm.side_effect = RateLimitError()
+    with pytest.raises(RateLimitError):
+        scheduled("prompt")
+    snapshot = limiter.snapshot()
+    assert snapshot["successes"] == 1
+    assert snapshot["overloads"] == 1
+    assert snapshot["in_flight"] == 0
+
+
+def test_suggested_concurrency_halves_while_backend_queues():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=4, max_limit=4)
+    assert limiter.suggested_concurrency() == 4
+
+    limiter.record_success(1.0)
+    assert limiter.suggested_concurrency() == 4
+    for _ in range(10):
+        limiter.record_success(5.0)
+    assert limiter.snapshot()["avg_latency_s"] > 2.0
+    assert limiter.suggested_concurrency() == 2
+
+
+def test_latency_class_follows_completion_length():
+    assert latency_class(["Yes."]) == 0
+    assert latency_class(["x" * 2000]) == latency_class("x" * 2000) == 3
+    assert latency_class(None) == 0
+
+
+def test_mixed_short_and_long_calls_are_not_mistaken_for_queueing():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=4, max_limit=4)
+    limiter.record_success(0.001, call_class=3)  # answered from the cache
+    for _ in range(10):
+        limiter.record_success(0.2, call_class=0)
+        limiter.record_success(4.0, call_class=3)
+    assert limiter.suggested_concurrency() == 4
+
+
+def test_one_fast_call_is_forgotten():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=4, max_limit=4)
+    limiter.record_success(0.1)
+    for _ in range(10):
+        limiter.record_success(1.0)
+    assert limiter.suggested_concurrency() == 2
+    for _ in range(100):
+        limiter.record_success(1.0)
+    assert limiter.suggested_concurrency() == 4
+
+
+def test_latency_baseline_resets_when_the_limit_changes():
+    limiter = AdaptiveConcurrencyLimiter(
+        "test", initial_limit=4, max_limit=4, cooldown=0
+    )
+    limiter.record_success(1.0)
+    for _ in range(10):
+        limiter.record_success(5.0)
+    assert limiter.suggested_concurrency() == 2
+
+    # Measured at limit 4; at limit 2 the backend is no longer assumed
+    # to be queueing until new measurements show it.
+    limiter.record_overload()
+    assert limiter.limit == 2
+    assert limiter.suggested_concurrency() == 2
@@ -0,0 +1,128 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from requests.exceptions import ReadTimeout
+from knowledge_storm.lm import OllamaClient
+from util.lm_proxy import LMProxy
+from util.llm_retry import RetryingLM
+from util.llm_scheduler import AdaptiveConcurrencyLimiter, ScheduledLM
+from util.llm_streaming import stream_completion, stream_to_file, supports_streaming
+from util.storm_runner import use_fallback_llm
+
+
+class FakeStreamingLM(LMProxy):
+    def __init__(self, chunks, failures=()):
+        super().__init__(make_ollama_client())
+        self._chunks = chunks
+        self._failures = list(failures)
+
+    def stream(self, prompt, **kwargs):
+        for index, chunk in enumerate(self._chunks):
+            if self._failures and self._failures[0] == index:
+                self._failures.pop(0)
+                raise ReadTimeout("stall")
+            yield chunk
+
+
+def make_ollama_client():
+    return OllamaClient(model="llama3", port=11434, max_tokens=100)
+
+
+def test_supports_streaming():
+    assert supports_streaming(make_ollama_client())
+    assert supports_streaming(LMProxy(make_ollama_client()))
+    assert not supports_streaming(MagicMock())
+
+
+def test_stream_ollama_chunks():
+    client = make_ollama_client()
+    lines = [
+        json.dumps({"response": "Hello", "done": False}).encode(),
+        b"",
+        json.dumps({"response": " world", "done": False}).encode(),
+        json.dumps({"response": "", "done": True}).encode(),
+    ]
+    response = MagicMock()
+    response.iter_lines.return_value = lines
+    with patch("util.llm_streaming.requests.post") as mock_post:
+        mock_post.return_value.__enter__.return_value = response
+        chunks = list(stream_completion(client, "prompt"))
+
+    assert chunks == ["Hello", " world"]
+    payload = mock_post.call_args.kwargs["json"]
+    assert payload["stream"] is True
+    assert payload["prompt"] == "prompt"
+    assert mock_post.call_args.kwargs["timeout"] == client.timeout_s
+
+
+def test_stream_to_file_writes_incrementally(tmp_path):
+    output_path = tmp_path / "article.md"
+    seen = []
+
+    content = stream_to_file(
+        FakeStreamingLM(["# Title\n", "Body"]),
+        "prompt",
+        output_path=str(output_path),
+        on_chunk=seen.append,
+        update_interval=0,
+    )
+
+    assert content == "# Title\nBody"
+    assert output_path.read_text() == "# Title\nBody"
+    assert seen[0] == "# Title\n"
+    assert seen[-1] == "# Title\nBody"
+
+
+def test_stream_keeps_partial_output_on_failure(tmp_path):
+    output_path = tmp_path / "article.md"
+
+    with pytest.raises(ReadTimeout):
+        stream_to_file(
+            FakeStreamingLM(["partial", "rest"], failures=[1]),
+            "prompt",
+            output_path=str(output_path),
+        )
+
+    assert output_path.read_text() == "partial"
+
+
+def test_retrying_stream_only_retries_before_first_chunk():
+    retrying = RetryingLM(
+        FakeStreamingLM(["a", "b"], failures=[0]), sleep=MagicMock()
+    )
+    assert list(retrying.stream("prompt")) == ["a", "b"]
+
+    retrying = RetryingLM(
+        FakeStreamingLM(["a", "b"], failures=[1]), sleep=MagicMock()
+    )
+    with pytest.raises(ReadTimeout):
+        list(retrying.stream("prompt"))
+
+
+def test_scheduled_stream_releases_slot():
+    limiter = AdaptiveConcurrencyLimiter("test", initial_limit=1, max_limit=1)
+    scheduled = ScheduledLM(FakeStreamingLM(["a", "b"]), limiter, "run")
+
+    stream = scheduled.stream("prompt")
+    assert next(stream) == "a"
+    assert limiter.snapshot()["in_flight"] == 1
+    stream.close()
+
+    assert limiter.snapshot()["in_flight"] == 0
+
+
+def test_use_fallback_llm_streams_when_supported(tmp_path):
+    output_path = tmp_path / "Topic.md"
+    seen = []
+
+    result = use_fallback_llm(
+        "Topic",
+        {"research": "notes"},
+        FakeStreamingLM(["Full ", "article"]),
+        output_path=str(output_path),
+        on_chunk=seen.append,
+    )
+
+    assert result == "Full article"
+    assert output_path.read_text() == "Full article"
+    assert seen[-1] == "Full article"
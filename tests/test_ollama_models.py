@@ -0,0 +1,55 @@
+import threading
+import requests
+from unittest.mock import MagicMock, patch
+from util.ollama_models import OllamaModelDiscovery, fetch_ollama_models
+
+
+@patch("util.ollama_models.requests.get")
+def test_fetch_ollama_models(mock_get):
+    mock_get.return_value = MagicMock(
+        json=lambda: {"models": [{"name": "llama3:latest"}, {"name": "qwen2:7b"}]}
+    )
+    assert fetch_ollama_models("http://ollama:11434") == ["llama3:latest", "qwen2:7b"]
+    mock_get.assert_called_once_with("http://ollama:11434/api/tags", timeout=2)
+
+
+def test_models_are_cached_within_ttl():
+    fetch = MagicMock(return_value=["llama3:latest"])
+    discovery = OllamaModelDiscovery(ttl=60, fetch=fetch)
+    assert discovery.models() == ["llama3:latest"]
+    assert discovery.models() == ["llama3:latest"]
+    assert fetch.call_count == 1
+
+
+def test_stale_models_are_refreshed_in_background():
+    fetch = MagicMock(return_value=["llama3:latest"])
+    discovery = OllamaModelDiscovery(ttl=0, fetch=fetch)
+    discovery.models()
+
+    refreshed = threading.Event()
+
+    def slow_fetch():
+        refreshed.wait(1)
+        return ["llama3:latest", "qwen2:7b"]
+
+    fetch.side_effect = slow_fetch
+    # The stale list is returned immediately while the refresh runs.
+    assert discovery.models() == ["llama3:latest"]
+    refreshed.set()
+    for thread in threading.enumerate():
+        if thread.name == "ollama-model-discovery":
+            thread.join()
+    assert discovery.models()[:2] == ["llama3:latest", "qwen2:7b"]
+
+
+def test_unreachable_ollama_keeps_previous_list():
+    fetch = MagicMock(return_value=["llama3:latest"])
+    discovery = OllamaModelDiscovery(ttl=60, fetch=fetch)
+    discovery.refresh()
+    fetch.side_effect = requests.ConnectionError("refused")
+    assert discovery.refresh() == ["llama3:latest"]
+
+    empty = OllamaModelDiscovery(ttl=60, fetch=fetch)
+    assert empty.models() == []
+    assert empty.models() == []
+    assert fetch.call_count == 3
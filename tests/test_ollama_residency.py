@@ -0,0 +1,97 @@
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from util import ollama_residency
+from util.ollama_residency import (
+    configured_ollama_models,
+    get_resident_models,
+    keep_alive_value,
+    warm_up_model,
+    warm_up_models,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_warm_state():
+    ollama_residency._warmed_at.clear()
+    ollama_residency._warming.clear()
+    yield
+    ollama_residency._warmed_at.clear()
+    ollama_residency._warming.clear()
+
+
+@pytest.fixture
+def llm_settings():
+    return {
+        "primary_model": "ollama",
+        "fallback_model": "openai",
+        "model_settings": {
+            "ollama": {"model": "llama3:latest", "max_tokens": 500},
+            "openai": {"model": "gpt-4o-mini", "max_tokens": 500},
+        },
+        "ollama_residency": {"keep_alive_minutes": 20, "warm_up": True},
+    }
+
+
+def test_keep_alive_value():
+    assert keep_alive_value(30) == "30m"
+    assert keep_alive_value(-1) == -1
+
+
+def test_configured_ollama_models(llm_settings):
+    assert configured_ollama_models(llm_settings) == ["llama3:latest"]
+    llm_settings["primary_model"] = "anthropic"
+    assert configured_ollama_models(llm_settings) == []
+
+
+@patch("util.ollama_residency.requests.post")
+def test_warm_up_model_sends_keep_alive(mock_post):
+    assert warm_up_model("llama3:latest", 20, base_url="http://ollama:11434")
+    mock_post.assert_called_once_with(
+        "http://ollama:11434/api/generate",
+        json={"model": "llama3:latest", "keep_alive": "20m"},
+        timeout=600,
+    )
+
+    mock_post.side_effect = requests.ConnectionError("refused")
+    assert not warm_up_model("llama3:latest", 20)
+
+
+@patch("util.ollama_residency.warm_up_model", return_value=True)
+def test_warm_up_models_skips_recently_warmed(mock_warm_up_model, llm_settings):
+    warm_up_models(llm_settings, wait=True)
+    warm_up_models(llm_settings, wait=True)
+    assert mock_warm_up_model.call_count == 1
+
+    warm_up_models(llm_settings, force=True, wait=True)
+    assert mock_warm_up_model.call_count == 2
+
+    llm_settings["ollama_residency"]["warm_up"] = False
+    assert warm_up_models(llm_settings, force=True) == []
+
+
+@patch("util.ollama_residency.requests.get")
+def test_get_resident_models(mock_get):
+    mock_get.return_value = MagicMock(
+        json=lambda: {
+            "models": [
+                {
+                    "name": "llama3:latest",
+                    "size": 5_000_000_000,
+                    "size_vram": 4_000_000_000,
+                    "expires_at": "2024-07-01T12:00:00Z",
+                }
+            ]
+        }
+    )
+    assert get_resident_models() == [
+        {
+            "model": "llama3:latest",
+            "size_gb": 5.0,
+            "vram_gb": 4.0,
+            "expires_at": "2024-07-01T12:00:00Z",
+        }
+    ]
+
+    mock_get.side_effect = requests.ConnectionError("refused")
+    assert get_resident_models() is None
@@ -0,0 +1,166 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import MagicMock
+
+import pytest
+
+from db.settings_store import save_setting
+from util import phoenix_setup
+from util.consts import PHOENIX_SETTINGS_DEFAULTS
+
+
+@pytest.fixture
+def started(tmp_path, monkeypatch):
+    """Records tracing set-ups instead of importing Phoenix."""
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "settings.db"))
+    started = []
+
+    def start_tracing(*config):
+        provider, instrumentor = MagicMock(), MagicMock()
+        started.append((*config[:2], provider, instrumentor, config))
+        return provider, instrumentor
+
+    monkeypatch.setattr(phoenix_setup, "_start_tracing", start_tracing)
+    yield started
+    phoenix_setup.shutdown_phoenix()
+
+
+def save_phoenix_settings(**settings):
+    save_setting("phoenix_settings", {**PHOENIX_SETTINGS_DEFAULTS, **settings})
+
+
+def test_tracing_is_not_set_up_when_disabled(started):
+    assert phoenix_setup.setup_phoenix() is None
+    assert started == []
+
+
+def test_tracing_is_set_up_once(started):
+    save_phoenix_settings(enabled=True)
+
+    provider = phoenix_setup.setup_phoenix()
+    assert phoenix_setup.setup_phoenix() is provider
+    assert [s[:2] for s in started] == [("storm-wiki", "localhost:6006")]
+
+
+def test_changed_settings_replace_the_previous_provider(started):
+    save_phoenix_settings(enabled=True)
+    phoenix_setup.setup_phoenix()
+    _, _, old_provider, old_instrumentor, _ = started[0]
+
+    save_phoenix_settings(enabled=True, collector_endpoint="phoenix:6006")
+    provider = phoenix_setup.setup_phoenix()
+
+    old_instrumentor.uninstrument.assert_called_once()
+    old_provider.force_flush.assert_called_once()
+    old_provider.shutdown.assert_called_once()
+    assert started[1][1] == "phoenix:6006"
+    assert provider is started[1][2]
+
+
+def test_disabling_tracing_shuts_down_the_provider(started):
+    save_phoenix_settings(enabled=True)
+    phoenix_setup.setup_phoenix()
+    _, _, provider, instrumentor, _ = started[0]
+
+    save_phoenix_settings(enabled=False)
+    assert phoenix_setup.setup_phoenix() is None
+    instrumentor.uninstrument.assert_called_once()
+    provider.shutdown.assert_called_once()
+    assert len(started) == 1
+
+
+def test_batching_and_sampling_settings_reconfigure_tracing(started):
+    save_phoenix_settings(enabled=True)
+    phoenix_setup.setup_phoenix()
+    assert started[0][4] == ("storm-wiki", "localhost:6006", 1.0, 5000, 2048, 512)
+
+    save_phoenix_settings(enabled=True, sample_ratio=0.25, schedule_delay_ms=1000)
+    phoenix_setup.setup_phoenix()
+    assert started[1][4] == ("storm-wiki", "localhost:6006", 0.25, 1000, 2048, 512)
+    started[0][2].shutdown.assert_called_once()
+
+
+def test_failed_set_up_leaves_tracing_disabled(started, monkeypatch, caplog):
+    def start_tracing(*config):
+        raise AttributeError("module 'openai.types' has no attribute 'responses'")
+
+    monkeypatch.setattr(phoenix_setup, "_start_tracing", start_tracing)
+    save_phoenix_settings(enabled=True)
+
+    assert phoenix_setup.setup_phoenix() is None
+    assert "Could not set up Phoenix tracing" in caplog.text
+    # Not retried on every rerun, only when the settings change.
+    monkeypatch.setattr(phoenix_setup, "_start_tracing", MagicMock())
+    assert phoenix_setup.setup_phoenix() is None
+    phoenix_setup._start_tracing.assert_not_called()
+
+
+class StubOpenAIAndCollectorHandler(BaseHTTPRequestHandler):
+    paths = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        StubOpenAIAndCollectorHandler.paths.append(self.path)
+        payload = json.dumps(
+            {
+                "id": "chatcmpl-1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "Hi."},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 3,
+                    "completion_tokens": 2,
+                    "total_tokens": 5,
+                },
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubOpenAIAndCollectorHandler.paths = []
+    server = HTTPServer(("127.0.0.1", 0), StubOpenAIAndCollectorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_openai_calls_are_exported_to_the_collector(stub_server):
+    from openai import OpenAI
+
+    provider, instrumentor = phoenix_setup._start_tracing(
+        "storm-wiki", stub_server, 1.0, 5000, 2048, 512
+    )
+    try:
+        client = OpenAI(api_key="test", base_url=f"http://{stub_server}/v1")
+        client.chat.completions.create(
+            model="gpt-4o-mini", messages=[{"role": "user", "content": "Hello"}]
+        )
+        # Spans are exported in the background, not during the call.
+        assert StubOpenAIAndCollectorHandler.paths == ["/v1/chat/completions"]
+        assert provider.force_flush(5000)
+    finally:
+        instrumentor.uninstrument()
+        provider.shutdown()
+    assert StubOpenAIAndCollectorHandler.paths == [
+        "/v1/chat/completions",
+        "/v1/traces",
+    ]
@@ -0,0 +1,151 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import dspy
+import pytest
+from anthropic import Anthropic
+from dspy.signatures.signature import signature_to_template
+from knowledge_storm.lm import ClaudeModel
+from knowledge_storm.storm_wiki.modules.article_generation import WriteSection
+
+from util.prompt_caching import (
+    CachingAnthropicClient,
+    enable_prompt_caching,
+    split_prompt,
+    with_cache_control,
+)
+from util.token_accounting import AccountingLM, RunAccounting, extract_usage
+
+
+def render_write_section(topic):
+    template = signature_to_template(WriteSection)
+    demo = dspy.Example(
+        info="[1] Example info",
+        topic="Example topic",
+        section="Example section",
+        output="# Example section\nExample text [1].",
+    )
+    example = dspy.Example(
+        info="[1] Some info", topic=topic, section="History", demos=[demo]
+    )
+    return template(example)
+
+
+def test_split_prompt_keeps_static_prefix_stable():
+    first_prefix, first_query = split_prompt(render_write_section("Solar power"))
+    second_prefix, second_query = split_prompt(render_write_section("Wind power"))
+
+    assert first_prefix == second_prefix
+    assert "Example section" in first_prefix
+    assert "Solar power" in first_query
+    assert "Wind power" in second_query
+
+
+def test_split_prompt_without_separator():
+    assert split_prompt("Just a question") == ("", "Just a question")
+
+
+def test_with_cache_control_skips_short_prefixes():
+    request = {"messages": [{"role": "user", "content": "short\n\n---\n\nquery"}]}
+    assert with_cache_control(request) is request
+
+
+def test_with_cache_control_marks_long_prefix():
+    prefix = "instructions " * 1000 + "\n\n---\n\n"
+    request = {
+        "model": "claude",
+        "messages": [{"role": "user", "content": prefix + "query"}],
+    }
+
+    content = with_cache_control(request)["messages"][0]["content"]
+
+    assert content == [
+        {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": "query"},
+    ]
+    assert request["messages"][0]["content"] == prefix + "query"
+
+
+def test_extract_usage_reads_openai_cached_tokens():
+    prompt = "What is STORM?"
+    entry = {
+        "prompt": prompt,
+        "response": {
+            "usage": {
+                "prompt_tokens": 2000,
+                "completion_tokens": 10,
+                "prompt_tokens_details": {"cached_tokens": 1536},
+            }
+        },
+    }
+    assert extract_usage(entry, prompt, ["x"]) == {
+        "prompt_tokens": 2000,
+        "completion_tokens": 10,
+        "cache_read_tokens": 1536,
+    }
+
+
+class StubAnthropicHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        StubAnthropicHandler.requests.append(json.loads(body))
+        payload = json.dumps(
+            {
+                "id": "msg_1",
+                "type": "message",
+                "role": "assistant",
+                "model": "claude-3-haiku-20240307",
+                "content": [{"type": "text", "text": "A section."}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {
+                    "input_tokens": 20,
+                    "output_tokens": 5,
+                    "cache_read_input_tokens": 1500,
+                    "cache_creation_input_tokens": 0,
+                },
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_anthropic():
+    StubAnthropicHandler.requests = []
+    server = HTTPServer(("127.0.0.1", 0), StubAnthropicHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_claude_requests_are_cached_and_hits_recorded(stub_anthropic):
+    lm = ClaudeModel(model="claude-3-haiku-20240307", api_key="test")
+    lm.client = Anthropic(api_key="test", base_url=stub_anthropic, max_retries=0)
+    enable_prompt_caching(lm, "anthropic")
+    enable_prompt_caching(lm, "anthropic")
+    assert isinstance(lm.client, CachingAnthropicClient)
+    assert not isinstance(lm.client._client, CachingAnthropicClient)
+
+    accounting = RunAccounting("run")
+    prompt = "guidelines " * 1000 + "\n\n---\n\nTopic: Solar power"
+    completions = AccountingLM(lm, accounting, "anthropic")(prompt)
+
+    assert completions == ["A section."]
+    content = StubAnthropicHandler.requests[0]["messages"][0]["content"]
+    assert content[0]["cache_control"] == {"type": "ephemeral"}
+    assert content[1]["text"] == "Topic: Solar power"
+    totals = accounting.totals()
+    assert totals["cache_read_tokens"] == 1500
+    assert totals["prompt_tokens"] == 1520
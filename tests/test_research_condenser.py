@@ -0,0 +1,122 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from util.research_condenser import (
+    chunk_text,
+    condense_research,
+    estimate_tokens,
+    load_research_from_disk,
+    research_token_budget,
+)
+from util.run_control import RunCancelledError
+from util.storm_runner import collect_existing_information, use_fallback_llm
+from util.token_accounting import BudgetExceededError
+
+
+def test_chunk_text_respects_size_and_keeps_text():
+    paragraphs = [f"paragraph {i} " + "x" * 300 for i in range(10)]
+    text = "\n\n".join(paragraphs)
+
+    chunks = chunk_text(text, chunk_tokens=200)
+
+    assert all(len(chunk) <= 800 for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+
+
+def test_chunk_text_splits_oversized_paragraphs():
+    chunks = chunk_text("y" * 2000, chunk_tokens=100)
+    assert [len(chunk) for chunk in chunks] == [400] * 5
+
+
+def test_short_research_is_not_condensed():
+    lm = MagicMock()
+    assert condense_research("Topic", "short notes", lm, token_budget=100) == (
+        "short notes"
+    )
+    lm.assert_not_called()
+
+
+def test_condense_research_summarizes_chunks_in_parallel():
+    lm = MagicMock(return_value=["summary"])
+    research = "\n\n".join("fact " * 100 for _ in range(8))
+
+    brief = condense_research(
+        "Topic", research, lm, token_budget=200, chunk_tokens=200, max_workers=4
+    )
+
+    assert lm.call_count == 8
+    assert brief.count("summary") == 8
+    assert estimate_tokens(brief) <= 200
+
+
+def test_condense_research_truncates_when_summaries_fail():
+    lm = MagicMock(side_effect=RuntimeError("backend down"))
+    research = "z" * 10000
+
+    brief = condense_research("Topic", research, lm, token_budget=100)
+
+    assert len(brief) <= 400
+
+
+@pytest.mark.parametrize(
+    "error", [BudgetExceededError("max_llm_calls"), RunCancelledError("cancelled")]
+)
+def test_condense_research_stops_on_exceeded_budget_or_cancel(error):
+    lm = MagicMock(side_effect=error)
+    research = "\n\n".join("fact " * 100 for _ in range(8))
+
+    with pytest.raises(type(error)):
+        condense_research(
+            "Topic", research, lm, token_budget=200, chunk_tokens=200, max_workers=1
+        )
+    assert lm.call_count == 1
+
+
+def test_research_token_budget_uses_context_window():
+    lm = MagicMock()
+    lm.kwargs = {"num_ctx": 2048, "max_tokens": 500}
+    assert research_token_budget(lm) == 2048 - 500 - 512
+    assert research_token_budget(MagicMock()) == 3000
+
+
+def test_load_research_from_disk(tmp_path):
+    (tmp_path / "conversation_log.json").write_text(
+        json.dumps(
+            [
+                {
+                    "perspective": "Historian",
+                    "dlg_turns": [
+                        {"user_utterance": "When?", "agent_utterance": "In 1900."}
+                    ],
+                }
+            ]
+        )
+    )
+
+    research = load_research_from_disk(str(tmp_path))
+
+    assert "Perspective: Historian" in research
+    assert "Q: When?\nA: In 1900." in research
+    assert load_research_from_disk(str(tmp_path / "missing")) is None
+
+
+def test_collect_existing_information_reads_research_from_disk(tmp_path):
+    (tmp_path / "conversation_log.json").write_text(
+        json.dumps([{"perspective": "P", "dlg_turns": [{"agent_utterance": "A"}]}])
+    )
+    runner = MagicMock(spec=["article_output_dir"])
+    runner.article_output_dir = str(tmp_path)
+
+    assert "A: A" in collect_existing_information(runner)["research"]
+
+
+def test_use_fallback_llm_prompt_fits_budget():
+    lm = MagicMock(return_value=["condensed"])
+    lm.kwargs = {"num_ctx": 2048, "max_tokens": 500}
+
+    use_fallback_llm("Topic", {"research": "fact " * 20000}, lm)
+
+    final_prompt = lm.call_args_list[-1].args[0]
+    assert estimate_tokens(final_prompt) < 2048 - 500
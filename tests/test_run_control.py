@@ -0,0 +1,160 @@
+import time
+import threading
+import pytest
+from unittest.mock import Mock, patch
+from util.run_control import (
+    RunCancelledError,
+    CancellationToken,
+    CancellableCallbackHandler,
+    install_cancellation_checks,
+    abortable_lm,
+    bind_cancellation_token,
+    start_background_run,
+    cancel_run,
+    finish_background_run,
+)
+from util.storm_runner import run_storm_with_fallback
+from util.token_accounting import report_history_entry, take_history_entry
+
+
+def test_token_raises_once_cancelled():
+    token = CancellationToken()
+    token.raise_if_cancelled()
+
+    token.cancel()
+
+    assert token.cancelled
+    with pytest.raises(RunCancelledError):
+        token.raise_if_cancelled()
+
+
+def test_callback_handler_forwards_until_cancelled():
+    token = CancellationToken()
+    inner = Mock()
+    handler = CancellableCallbackHandler(token, inner)
+
+    handler.on_dialogue_turn_end(dlg_turn="turn")
+    inner.on_dialogue_turn_end.assert_called_once_with(dlg_turn="turn")
+
+    token.cancel()
+    with pytest.raises(RunCancelledError):
+        handler.on_information_gathering_end()
+    inner.on_information_gathering_end.assert_not_called()
+
+
+def test_install_cancellation_checks_stops_sections_and_stages():
+    token = CancellationToken()
+    runner = Mock()
+    generate_section = runner.storm_article_generation.generate_section
+    polish = runner.run_article_polishing_module
+
+    install_cancellation_checks(runner, token)
+    runner.storm_article_generation.generate_section("topic", "section")
+    generate_section.assert_called_once_with("topic", "section")
+
+    token.cancel()
+    with pytest.raises(RunCancelledError):
+        runner.storm_article_generation.generate_section("topic", "section")
+    with pytest.raises(RunCancelledError):
+        runner.run_article_polishing_module()
+    polish.assert_not_called()
+
+
+def test_install_cancellation_checks_again_only_replaces_the_token():
+    first, second = CancellationToken(), CancellationToken()
+    runner = Mock()
+    polish = runner.run_article_polishing_module
+
+    install_cancellation_checks(runner, first)
+    checked_polish = runner.run_article_polishing_module
+    first.cancel()
+    install_cancellation_checks(runner, second)
+
+    assert runner.run_article_polishing_module is checked_polish
+    runner.run_article_polishing_module()
+    polish.assert_called_once_with()
+    second.cancel()
+    with pytest.raises(RunCancelledError):
+        runner.run_article_polishing_module()
+
+
+def test_abortable_lm_returns_once_the_run_is_cancelled():
+    release = threading.Event()
+    client = Mock(side_effect=lambda prompt: release.wait(5) and ["answer"])
+    token = CancellationToken()
+    bind_cancellation_token("abort-run", token)
+    lm = abortable_lm(client, "abort-run")
+    errors = []
+
+    def call():
+        try:
+            lm("prompt")
+        except RunCancelledError as e:
+            errors.append(e)
+
+    caller = threading.Thread(target=call)
+    caller.start()
+    while not client.called:
+        time.sleep(0.01)
+    token.cancel()
+    caller.join(1)
+
+    assert not caller.is_alive()
+    assert len(errors) == 1
+    release.set()
+
+
+def test_abortable_lm_passes_the_outcome_of_the_call_through():
+    token = CancellationToken()
+    bind_cancellation_token("passing-run", token)
+
+    def client(prompt):
+        report_history_entry({"prompt": prompt})
+        return ["answer"]
+
+    lm = abortable_lm(client, "passing-run")
+    assert lm("prompt") == ["answer"]
+    # The entry reported by the client's thread reaches the caller's.
+    assert take_history_entry() == ({"prompt": "prompt"}, False)
+
+    lm = abortable_lm(Mock(side_effect=ValueError("bad request")), "passing-run")
+    with pytest.raises(ValueError):
+        lm("prompt")
+    assert not token.cancelled
+
+
+def test_background_run_cancel():
+    def target(cancellation_token):
+        while True:
+            cancellation_token.raise_if_cancelled()
+            time.sleep(0.01)
+
+    run = start_background_run("test-run", target)
+    assert start_background_run("test-run", target) is run
+
+    assert cancel_run("test-run")
+    assert run.wait(5)
+    assert run.status == "cancelled"
+    assert finish_background_run("test-run") is run
+    assert not cancel_run("test-run")
+
+
+@patch("util.storm_runner.collect_existing_information")
+def test_run_storm_with_fallback_skips_fallback_when_cancelled(mock_collect):
+    token = CancellationToken()
+    token.cancel()
+    runner = Mock()
+    runner.run.side_effect = lambda **kwargs: kwargs[
+        "callback_handler"
+    ].on_identify_perspective_start()
+
+    with pytest.raises(RunCancelledError):
+        run_storm_with_fallback(
+            "topic",
+            "/tmp/test_dir",
+            runner=runner,
+            fallback_lm=Mock(),
+            cancellation_token=token,
+        )
+
+    mock_collect.assert_not_called()
@@ -0,0 +1,88 @@
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from util.runner_registry import ComponentRegistry, registry, settings_fingerprint
+from util.storm_runner import get_lm_client, get_retriever
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    registry.clear()
+    yield
+    registry.clear()
+
+
+def test_fingerprint_ignores_key_order():
+    assert settings_fingerprint({"a": 1, "b": 2}) == settings_fingerprint(
+        {"b": 2, "a": 1}
+    )
+    assert settings_fingerprint({"a": 1}) != settings_fingerprint({"a": 2})
+
+
+def test_registry_reuses_until_fingerprint_changes():
+    components = ComponentRegistry()
+    factory = MagicMock(side_effect=[object(), object()])
+
+    first = components.get_or_create("lm:openai", "fp1", factory)
+    again = components.get_or_create("lm:openai", "fp1", factory)
+    rebuilt = components.get_or_create("lm:openai", "fp2", factory)
+
+    assert first is again
+    assert rebuilt is not first
+    assert factory.call_count == 2
+    assert components.slots() == ["lm:openai"]
+
+
+def test_registry_does_not_cache_failed_builds():
+    components = ComponentRegistry()
+
+    with pytest.raises(RuntimeError):
+        components.get_or_create(
+            "retriever", "fp", MagicMock(side_effect=RuntimeError("boom"))
+        )
+
+    assert components.get_or_create("retriever", "fp", lambda: "ok") == "ok"
+
+
+def test_registry_builds_once_under_concurrency():
+    components = ComponentRegistry()
+    factory = MagicMock(return_value=object())
+    results = []
+
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(
+                components.get_or_create("slot", "fp", factory)
+            )
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert factory.call_count == 1
+    assert len(set(map(id, results))) == 1
+
+
+@patch("util.storm_runner.create_lm_client")
+def test_get_lm_client_rebuilds_on_settings_change(mock_create_lm_client):
+    mock_create_lm_client.side_effect = lambda model_type, **kwargs: MagicMock()
+    settings = {"openai": {"model": "gpt-4o-mini", "max_tokens": 500}}
+
+    first = get_lm_client("openai", settings)
+    assert get_lm_client("openai", dict(settings)) is first
+    assert mock_create_lm_client.call_count == 1
+
+    changed = {"openai": {"model": "gpt-4o-mini", "max_tokens": 1000}}
+    assert get_lm_client("openai", changed) is not first
+    assert mock_create_lm_client.call_count == 2
+
+
+@patch("util.storm_runner.CombinedSearchAPI")
+def test_get_retriever_is_shared(mock_search_api):
+    options = {"primary_engine": "duckduckgo", "search_top_k": 3}
+
+    assert get_retriever(options, 3) is get_retriever(options, 3)
+    mock_search_api.assert_called_once_with(max_results=3)
@@ -0,0 +1,192 @@
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from util.storm_pipeline import install_speculative_outline
+
+
+def make_runner(draft_page_outline):
+    write_outline = SimpleNamespace(
+        engine=MagicMock(),
+        draft_page_outline=draft_page_outline,
+        forward=MagicMock(return_value="refined"),
+    )
+    return SimpleNamespace(
+        topic="Test Topic",
+        run_knowledge_curation_module=MagicMock(return_value="information table"),
+        storm_outline_generation_module=SimpleNamespace(write_outline=write_outline),
+    )
+
+
+def test_direct_outline_is_drafted_during_research():
+    draft_started = threading.Event()
+
+    def draft_page_outline(topic):
+        draft_started.set()
+        return SimpleNamespace(outline="# History\n# Impact")
+
+    runner = make_runner(draft_page_outline)
+    original_forward = runner.storm_outline_generation_module.write_outline.forward
+    # Research only finishes once the draft has started next to it.
+    runner.run_knowledge_curation_module.side_effect = (
+        lambda *args, **kwargs: draft_started.wait(5) and "information table"
+    )
+    install_speculative_outline(runner)
+
+    assert runner.run_knowledge_curation_module() == "information table"
+
+    callback_handler = MagicMock()
+    write_outline = runner.storm_outline_generation_module.write_outline
+    assert (
+        write_outline.forward(
+            topic="Test Topic", dlg_history=[], callback_handler=callback_handler
+        )
+        == "refined"
+    )
+    original_forward.assert_called_once_with(
+        topic="Test Topic",
+        dlg_history=[],
+        old_outline="# History\n# Impact",
+        callback_handler=callback_handler,
+    )
+    callback_handler.on_direct_outline_generation_end.assert_called_once_with(
+        outline="# History\n# Impact"
+    )
+
+
+def test_failed_draft_falls_back_to_inline_outline():
+    runner = make_runner(MagicMock(side_effect=RuntimeError("model unavailable")))
+    original_forward = runner.storm_outline_generation_module.write_outline.forward
+    install_speculative_outline(runner)
+
+    runner.run_knowledge_curation_module()
+    runner.storm_outline_generation_module.write_outline.forward(
+        topic="Test Topic", dlg_history=[]
+    )
+    original_forward.assert_called_once_with(
+        topic="Test Topic", dlg_history=[], old_outline=None, callback_handler=None
+    )
+
+
+def make_writing_runner(tmp_path, write_lead):
+    from knowledge_storm.storm_wiki.modules.storm_dataclass import StormArticle
+
+    outline = StormArticle.from_outline_str(
+        topic="Test Topic",
+        outline_str="# Introduction\n# History\n# Impact\n## Economy\n# Legacy\n# Conclusion",
+    )
+
+    def generate_section(topic, title, information_table, section_outline, queries):
+        return {
+            "section_name": title,
+            "section_content": f"# {title}\n{title} text.",
+            "collected_info": [],
+        }
+
+    runner = SimpleNamespace(
+        topic="Test Topic",
+        article_output_dir=str(tmp_path),
+        storm_article_generation=SimpleNamespace(
+            generate_section=MagicMock(side_effect=generate_section),
+            max_thread_num=2,
+        ),
+        storm_article_polishing_module=SimpleNamespace(
+            polish_page=SimpleNamespace(
+                write_lead_engine=MagicMock(),
+                polish_engine=MagicMock(),
+                write_lead=write_lead,
+                polish_page=MagicMock(),
+            )
+        ),
+        run_article_generation_module=MagicMock(),
+        run_article_polishing_module=MagicMock(),
+    )
+    return runner, outline
+
+
+def test_sections_to_write_skips_introduction_and_conclusion(tmp_path):
+    from util.storm_pipeline import sections_to_write
+
+    _, outline = make_writing_runner(tmp_path, MagicMock())
+    sections = sections_to_write(outline)
+    assert [title for title, _, _ in sections] == ["History", "Impact", "Legacy"]
+    assert sections[1][1] == "# Impact\n## Economy"
+
+
+def test_pipelined_writing_overlaps_lead_with_sections(tmp_path):
+    from util.storm_pipeline import install_pipelined_writing
+
+    write_lead = MagicMock(return_value=SimpleNamespace(lead_section="Lead text."))
+    runner, outline = make_writing_runner(tmp_path, write_lead)
+    original_polishing = runner.run_article_polishing_module
+    install_pipelined_writing(runner)
+
+    callback_handler = MagicMock()
+    information_table = MagicMock()
+    draft = runner.run_article_generation_module(
+        outline=outline,
+        information_table=information_table,
+        callback_handler=callback_handler,
+    )
+
+    assert runner.storm_article_generation.generate_section.call_count == 3
+    progress = [
+        call.kwargs["completed"]
+        for call in callback_handler.on_section_written.call_args_list
+    ]
+    assert progress == [1, 2, 3]
+    assert "Legacy text." in draft.to_string()
+    assert (tmp_path / "storm_gen_article.txt").exists()
+
+    polished = runner.run_article_polishing_module(draft_article=draft)
+    write_lead.assert_called_once()
+    original_polishing.assert_not_called()
+    assert "Lead text." in polished.to_string()
+    assert (tmp_path / "storm_gen_article_polished.txt").exists()
+
+
+def test_pipelined_polishing_falls_back_without_lead(tmp_path):
+    from util.storm_pipeline import install_pipelined_writing
+
+    write_lead = MagicMock(side_effect=RuntimeError("model unavailable"))
+    runner, outline = make_writing_runner(tmp_path, write_lead)
+    original_polishing = runner.run_article_polishing_module
+    install_pipelined_writing(runner)
+
+    draft = runner.run_article_generation_module(
+        outline=outline, information_table=MagicMock()
+    )
+    runner.run_article_polishing_module(draft_article=draft)
+    original_polishing.assert_called_once_with(
+        draft_article=draft, remove_duplicate=False
+    )
+
+
+def test_lead_and_sections_record_their_own_stage(tmp_path):
+    from util.storm_pipeline import install_pipelined_writing
+    from util.token_accounting import AccountingLM, RunAccounting
+
+    accounting = RunAccounting("run-1")
+    lm = AccountingLM(MagicMock(return_value=["text"]), accounting, "ollama")
+
+    def write_lead(**kwargs):
+        lm("lead")
+        return SimpleNamespace(lead_section="Lead text.")
+
+    runner, outline = make_writing_runner(tmp_path, write_lead)
+    generate_section = runner.storm_article_generation.generate_section.side_effect
+    runner.storm_article_generation.generate_section.side_effect = (
+        lambda *args: lm("section") and generate_section(*args)
+    )
+    install_pipelined_writing(runner)
+
+    accounting.stage = "article"
+    draft = runner.run_article_generation_module(
+        outline=outline, information_table=MagicMock()
+    )
+    runner.run_article_polishing_module(draft_article=draft)
+
+    by_stage = accounting.summary()["by_stage"]
+    assert {stage: group["calls"] for stage, group in by_stage.items()} == {
+        "article": 3,
+        "polish": 1,
+    }
@@ -9,10 +9,19 @@ from util.storm_runner import (
     collect_existing_information,
     use_fallback_llm,
     write_fallback_result,
+    resolve_storm_parallelism,
 )
+from util.runner_registry import registry
 from openai import NotFoundError
 
 
+@pytest.fixture(autouse=True)
+def clear_registry():
+    registry.clear()
+    yield
+    registry.clear()
+
+
 @pytest.fixture(autouse=True)
 def mock_gpu_dependencies():
     with patch("knowledge_storm.STORMWikiRunner"), patch(
@@ -92,6 +101,7 @@ class TestStormRunner(unittest.TestCase):
             callback_handler=None,
             runner=mock_runner,
             fallback_lm=ANY,
+            cancellation_token=None,
         )
         mock_load_llm_settings.assert_called_once()
         mock_load_search_options.assert_called_once()
@@ -167,6 +177,7 @@ class TestRunStormWithFallback:
             do_generate_outline=True,
             do_generate_article=True,
             do_polish_article=True,
+            callback_handler=ANY,
         )
         mock_runner_instance.post_run.assert_called_once()
         mock_collect_existing_information.assert_not_called()
@@ -436,3 +447,20 @@ def test_run_storm_with_fallback_model_not_found(
     mock_collect_existing_information.assert_called_once_with(mock_runner)
     mock_fallback_lm.assert_called_once()
     mock_runner.post_run.assert_called_once()
+
+
+@patch("util.storm_runner.suggest_concurrency", return_value=2)
+def test_resolve_storm_parallelism(mock_suggest_concurrency):
+    llm_settings = {
+        "primary_model": "ollama",
+        "storm_parallelism": {"max_conv_turn": 5, "max_thread_num": 8},
+    }
+    assert resolve_storm_parallelism(llm_settings) == {
+        "max_conv_turn": 5,
+        "max_perspective": 3,
+        "max_thread_num": 2,
+    }
+    mock_suggest_concurrency.assert_called_once_with("ollama")
+
+    llm_settings["storm_parallelism"]["auto_tune"] = False
+    assert resolve_storm_parallelism(llm_settings)["max_thread_num"] == 8
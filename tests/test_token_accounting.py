@@ -0,0 +1,250 @@
+import os
+import pytest
+from unittest.mock import MagicMock
+from util.token_accounting import (
+    AccountingLM,
+    BudgetExceededError,
+    RunAccounting,
+    extract_usage,
+    install_stage_tracking,
+    load_all_run_metrics,
+    write_run_metrics,
+)
+
+
+class FakeLM:
+    def __init__(self, usage=None, text="completion text"):
+        self.kwargs = {"model": "fake-model"}
+        self.history = []
+        self.usage = usage
+        self.text = text
+
+    def __call__(self, prompt, **kwargs):
+        response = {"usage": self.usage} if self.usage else {}
+        self.history.append({"prompt": prompt, "response": response})
+        return [self.text]
+
+
+def test_extract_usage_reads_backend_usage():
+    lm = FakeLM(usage={"prompt_tokens": 12, "completion_tokens": 34})
+    prompt = "What is STORM?"
+    completions = lm(prompt)
+    assert extract_usage(lm.history[-1], prompt, completions) == {
+        "prompt_tokens": 12,
+        "completion_tokens": 34,
+    }
+
+
+def test_extract_usage_reads_anthropic_usage():
+    lm = FakeLM()
+    prompt = "What is STORM?"
+    lm.history.append(
+        {
+            "prompt": prompt,
+            "response": MagicMock(usage=MagicMock(input_tokens=5, output_tokens=7)),
+        }
+    )
+    assert extract_usage(lm.history[-1], prompt, ["x"]) == {
+        "prompt_tokens": 5,
+        "completion_tokens": 7,
+    }
+
+
+def test_extract_usage_estimates_without_usage():
+    lm = FakeLM()
+    prompt = "a" * 40
+    lm(prompt)
+    usage = extract_usage(lm.history[-1], prompt, ["b" * 80])
+    assert usage == {"prompt_tokens": 10, "completion_tokens": 20}
+
+
+def test_accounting_lm_records_calls_by_stage_and_backend():
+    accounting = RunAccounting("run-1")
+    lm = AccountingLM(
+        FakeLM(usage={"prompt_tokens": 10, "completion_tokens": 5}),
+        accounting,
+        "ollama",
+    )
+    accounting.stage = "research"
+    lm("first")
+    accounting.stage = "outline"
+    lm("second")
+
+    totals = accounting.totals()
+    assert totals["calls"] == 2
+    assert totals["total_tokens"] == 30
+    summary = accounting.summary()
+    assert summary["by_stage"]["research"]["calls"] == 1
+    assert summary["by_stage"]["outline"]["prompt_tokens"] == 10
+    assert summary["by_backend"]["ollama"]["completion_tokens"] == 10
+
+
+def test_runs_sharing_a_client_keep_their_own_history_and_usage():
+    from knowledge_storm import STORMWikiLMConfigs
+
+    client = FakeLM(usage={"prompt_tokens": 10, "completion_tokens": 5})
+    configs = []
+    for run_id in ("run-1", "run-2"):
+        lm = AccountingLM(client, RunAccounting(run_id), "ollama")
+        lm_configs = STORMWikiLMConfigs()
+        lm_configs.set_conv_simulator_lm(lm)
+        lm_configs.set_article_gen_lm(lm)
+        configs.append((lm, lm_configs))
+    (lm1, configs1), (lm2, configs2) = configs
+
+    lm1("run 1, first")
+    lm2("run 2, first")
+    lm1("run 1, second")
+
+    history = configs1.collect_and_reset_lm_history()
+    assert [call["prompt"] for call in history] == ["run 1, first", "run 1, second"]
+    assert configs1.collect_and_reset_lm_usage() == {
+        "fake-model": {"prompt_tokens": 20, "completion_tokens": 10}
+    }
+    # Collecting run 1 leaves run 2 and the shared client alone.
+    assert [call["prompt"] for call in lm2.history] == ["run 2, first"]
+    assert len(client.history) == 3
+    assert lm1.history == []
+    assert configs1.collect_and_reset_lm_usage() == {}
+
+
+def test_coalesced_callers_get_the_history_entry_of_the_shared_request():
+    import threading
+    from util.llm_coalescing import CoalescingLM, SingleFlight
+
+    release = threading.Event()
+
+    class SlowLM(FakeLM):
+        def __call__(self, prompt, **kwargs):
+            release.wait(5)
+            return super().__call__(prompt, **kwargs)
+
+    client = SlowLM(usage={"prompt_tokens": 10, "completion_tokens": 5})
+    group = SingleFlight("ollama")
+    runs = [RunAccounting(run_id) for run_id in ("run-1", "run-2")]
+    lms = [AccountingLM(CoalescingLM(client, group), run, "ollama") for run in runs]
+
+    threads = [threading.Thread(target=lm, args=("same prompt",)) for lm in lms]
+    threads[0].start()
+    while group.snapshot()["in_flight"] == 0:
+        pass
+    threads[1].start()
+    while group.snapshot()["coalesced"] == 0:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(client.history) == 1
+    assert [lm.history for lm in lms] == [client.history, client.history]
+    # The tokens are counted once, on the run that sent the request.
+    assert sorted(run.totals()["total_tokens"] for run in runs) == [0, 15]
+
+
+def test_trimming_the_shared_history_keeps_each_runs_entries():
+    from util.token_accounting import SHARED_HISTORY_LIMIT
+
+    client = FakeLM()
+    lm1 = AccountingLM(client, RunAccounting("run-1"), "ollama")
+    lm2 = AccountingLM(client, RunAccounting("run-2"), "ollama")
+    lm1("run 1")
+    for i in range(SHARED_HISTORY_LIMIT):
+        lm2(f"run 2, call {i}")
+
+    assert len(client.history) == SHARED_HISTORY_LIMIT
+    assert [call["prompt"] for call in lm1.history] == ["run 1"]
+    assert len(lm2.history) == SHARED_HISTORY_LIMIT
+
+
+def test_accounting_lm_records_failed_calls():
+    accounting = RunAccounting("run-1")
+    failing = MagicMock(side_effect=RuntimeError("boom"))
+    lm = AccountingLM(failing, accounting, "openai")
+    with pytest.raises(RuntimeError):
+        lm("prompt")
+    assert accounting.totals()["calls"] == 1
+    assert accounting.summary()["by_backend"]["openai"]["completion_tokens"] == 0
+
+
+def test_budget_abort():
+    accounting = RunAccounting("run-1", {"max_llm_calls": 2, "on_exceed": "abort"})
+    lm = AccountingLM(FakeLM(), accounting, "ollama")
+    lm("one")
+    lm("two")
+    with pytest.raises(BudgetExceededError):
+        lm("three")
+
+
+def test_budget_downgrade_switches_to_fallback():
+    accounting = RunAccounting(
+        "run-1", {"max_total_tokens": 10, "on_exceed": "downgrade"}
+    )
+    primary = FakeLM(usage={"prompt_tokens": 10, "completion_tokens": 5})
+    fallback = FakeLM(text="fallback text")
+    primary_lm = AccountingLM(primary, accounting, "openai")
+    accounting.downgrade_lm = AccountingLM(fallback, accounting, "ollama")
+
+    assert primary_lm("one") == ["completion text"]
+    assert primary_lm("two") == ["fallback text"]
+    assert accounting.downgraded
+    assert len(primary.history) == 1
+    assert accounting.summary()["by_backend"]["ollama"]["calls"] == 1
+
+
+def test_install_stage_tracking_labels_stages():
+    accounting = RunAccounting("run-1")
+    runner = MagicMock()
+    seen = []
+    runner.run_outline_generation_module = lambda: seen.append(accounting.stage)
+    install_stage_tracking(runner, accounting)
+    runner.run_outline_generation_module()
+    assert seen == ["outline"]
+
+
+def test_overlapping_stages_label_their_own_calls():
+    import threading
+    from util.token_accounting import stage_scope
+
+    accounting = RunAccounting("run-1")
+    lm = AccountingLM(FakeLM(), accounting, "ollama")
+    runner = MagicMock()
+
+    def research():
+        # A worker of the stage and a draft of the next stage, side by side.
+        worker = threading.Thread(target=lm, args=("search",))
+
+        def draft():
+            with stage_scope("outline"):
+                lm("draft")
+
+        drafter = threading.Thread(target=draft)
+        drafter.start()
+        worker.start()
+        drafter.join()
+        worker.join()
+        lm("research")
+
+    runner.run_knowledge_curation_module = research
+    install_stage_tracking(runner, accounting)
+    runner.run_knowledge_curation_module()
+
+    by_stage = accounting.summary()["by_stage"]
+    assert {stage: group["calls"] for stage, group in by_stage.items()} == {
+        "research": 2,
+        "outline": 1,
+    }
+
+
+def test_write_and_load_run_metrics(tmp_path):
+    accounting = RunAccounting("run-1")
+    AccountingLM(FakeLM(), accounting, "ollama")("prompt")
+    article_dir = tmp_path / "Default" / "Some_Topic"
+    path = write_run_metrics(accounting, str(article_dir))
+    assert os.path.exists(path)
+
+    runs = load_all_run_metrics(str(tmp_path))
+    assert len(runs) == 1
+    assert runs[0]["run_id"] == "run-1"
+    assert runs[0]["category"] == "Default"
+    assert runs[0]["article"] == "Some_Topic"
+    assert runs[0]["totals"]["calls"] == 1
@@ -1 +0,0 @@
-from . import storm_runner
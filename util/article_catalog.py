@@ -0,0 +1,355 @@
+"""
+Catalog of the generated articles.
+
+My Articles used to list every topic directory of every category and read
+each article's markdown and JSON files to render its card. The catalog keeps
+one row per article in the settings database with what a card needs, so a
+page of the list is a single indexed query.
+
+Rows are written when an article is finished (index_article) and kept in
+sync with changes made outside the app by reconcile(), which only stats the
+files of each topic directory and re-reads an article when its newest
+modification time or its total size changed.
+
+Every catalog write also updates an FTS5 index of the article title,
+headings, body and reference titles, so search_articles() stays current as
+articles are created, changed, moved between categories or deleted.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from db.connection import get_connection, transaction
+from db.settings_store import ensure_schema, get_db_path
+from .file_io import FileIOHelper
+from .shared_utils import parse
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between two reconciliations of the same output directory.
+RECONCILE_INTERVAL = 30
+SHORT_TEXT_LENGTH = 100
+# Relative weight of title, headings, body and reference title matches.
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+SNIPPET_TOKENS = 24
+
+ARTICLE_COLUMNS = (
+    "category",
+    "topic",
+    "title",
+    "short_text",
+    "word_count",
+    "citation_count",
+    "mtime",
+    "size",
+)
+
+_last_reconcile: Dict[str, float] = {}
+_reconcile_lock = threading.Lock()
+
+
+def _db_path() -> str:
+    db_path = get_db_path()
+    ensure_schema(db_path)
+    return db_path
+
+
+def scan_topic_dir(topic_dir: str) -> Tuple[Dict[str, str], float, int]:
+    """
+    Lists the files of a topic directory without reading them.
+
+    Returns:
+        tuple: The files (name to absolute path), the newest modification
+            time of the directory and its files, and their total size.
+    """
+    files = {}
+    mtime = os.stat(topic_dir).st_mtime
+    size = 0
+    with os.scandir(topic_dir) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = os.path.abspath(entry.path)
+                mtime = max(mtime, stat.st_mtime)
+                size += stat.st_size
+    return files, mtime, size
+
+
+def article_file(topic: str, files: Dict[str, str]) -> Optional[str]:
+    """Returns the name of the markdown file holding the article."""
+    if f"{topic}.md" in files:
+        return f"{topic}.md"
+    return next((name for name in sorted(files) if name.endswith(".md")), None)
+
+
+def summarize_article(topic: str, files: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """
+    Reads what an article card shows and what is searched from the article
+    files.
+
+    Returns:
+        dict: title, short_text, word_count, citation_count, and the
+            headings, body and reference_titles text for the search index,
+            or None if the directory holds no article.
+    """
+    name = article_file(topic, files)
+    if name is None:
+        return None
+    content = parse(FileIOHelper.read_txt_file(files[name]))
+    headings = re.findall(r"^#+\s*(.*)$", content, flags=re.MULTILINE)
+    body = re.sub(r"^#{1,3}[^\n]*\n?", "", content, flags=re.MULTILINE)
+
+    citation_count = 0
+    reference_titles = []
+    if "url_to_info.json" in files:
+        try:
+            url_to_info = FileIOHelper.read_json_file(files["url_to_info.json"])
+            citation_count = len(url_to_info.get("url_to_unified_index", {}))
+            reference_titles = [
+                info.get("title", "")
+                for info in url_to_info.get("url_to_info", {}).values()
+            ]
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Could not read citations of {topic}: {e}")
+
+    return {
+        "title": topic.replace("_", " "),
+        "short_text": body[:SHORT_TEXT_LENGTH],
+        "word_count": len(body.split()),
+        "citation_count": citation_count,
+        "headings": "\n".join(headings),
+        "body": body,
+        "reference_titles": "\n".join(reference_titles),
+    }
+
+
+def _article_row(category, topic, files, mtime, size) -> Optional[Tuple]:
+    try:
+        summary = summarize_article(topic, files)
+    except OSError as e:
+        logger.warning(f"Could not index article {category}/{topic}: {e}")
+        return None
+    if summary is None:
+        return None
+    return (
+        category,
+        topic,
+        json.dumps(files),
+        summary["title"],
+        summary["short_text"],
+        summary["word_count"],
+        summary["citation_count"],
+        mtime,
+        size,
+        summary["headings"],
+        summary["body"],
+        summary["reference_titles"],
+    )
+
+
+_ARTICLE_ROWID = "(SELECT rowid FROM articles WHERE category=? AND topic=?)"
+
+
+def _write(conn, rows: List[Tuple], removed: List[Tuple[str, str]]):
+    # Replaced and removed articles leave the search index first. Search rows
+    # have the rowid of their article.
+    conn.executemany(
+        f"DELETE FROM article_search WHERE rowid = {_ARTICLE_ROWID}",
+        [row[:2] for row in rows] + removed,
+    )
+    conn.executemany("DELETE FROM articles WHERE category=? AND topic=?", removed)
+    # An upsert keeps the rowid of an existing article, unlike REPLACE.
+    conn.executemany(
+        """INSERT INTO articles
+           (category, topic, files, title, short_text, word_count,
+            citation_count, mtime, size)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT (category, topic) DO UPDATE SET
+            files=excluded.files, title=excluded.title,
+            short_text=excluded.short_text, word_count=excluded.word_count,
+            citation_count=excluded.citation_count, mtime=excluded.mtime,
+            size=excluded.size""",
+        [row[:9] for row in rows],
+    )
+    conn.executemany(
+        f"""INSERT INTO article_search
+            (rowid, title, headings, body, reference_titles)
+            VALUES ({_ARTICLE_ROWID}, ?, ?, ?, ?)""",
+        [row[:2] + (row[3],) + row[9:] for row in rows],
+    )
+
+
+def index_article(category: str, topic: str, topic_dir: Optional[str] = None) -> bool:
+    """
+    Adds or refreshes one article in the catalog, e.g. right after it was
+    written. If the directory holds no article, the entry is removed.
+
+    Returns:
+        bool: Whether the article is in the catalog.
+    """
+    if topic_dir is None:
+        topic_dir = os.path.join(FileIOHelper.load_output_base_dir(), category, topic)
+    row = None
+    if os.path.isdir(topic_dir):
+        row = _article_row(category, topic, *scan_topic_dir(topic_dir))
+    with transaction(_db_path()) as conn:
+        _write(conn, [row] if row else [], [] if row else [(category, topic)])
+    return row is not None
+
+
+def remove_article(category: str, topic: str):
+    with transaction(_db_path()) as conn:
+        _write(conn, [], [(category, topic)])
+
+
+def reconcile(categories: Optional[List[str]] = None, force: bool = False) -> int:
+    """
+    Brings the catalog in line with the article directories. Only articles
+    whose newest modification time or total size changed are read again.
+
+    Args:
+        categories (list, optional): Categories to scan. Defaults to all
+            configured categories, in which case entries of categories that
+            no longer exist are removed as well.
+        force (bool): Scan even if the last scan is more recent than
+            RECONCILE_INTERVAL.
+
+    Returns:
+        int: The number of entries added, updated or removed.
+    """
+    base_dir = FileIOHelper.load_output_base_dir()
+    full_scan = categories is None
+    if full_scan:
+        with _reconcile_lock:
+            last = _last_reconcile.get(base_dir)
+            if not force and last and time.monotonic() - last < RECONCILE_INTERVAL:
+                return 0
+            _last_reconcile[base_dir] = time.monotonic()
+        categories = FileIOHelper.load_categories()
+
+    db_path = _db_path()
+    known = {
+        (category, topic): (mtime, size)
+        for category, topic, mtime, size in get_connection(db_path).execute(
+            "SELECT category, topic, mtime, size FROM articles"
+        )
+    }
+
+    rows, seen = [], set()
+    for category in categories:
+        category_dir = os.path.join(base_dir, category)
+        if not os.path.isdir(category_dir):
+            continue
+        with os.scandir(category_dir) as entries:
+            topic_dirs = [entry for entry in entries if entry.is_dir()]
+        for entry in topic_dirs:
+            key = (category, entry.name)
+            files, mtime, size = scan_topic_dir(entry.path)
+            if article_file(entry.name, files) is None:
+                continue
+            seen.add(key)
+            if known.get(key) != (mtime, size):
+                row = _article_row(category, entry.name, files, mtime, size)
+                if row is None:
+                    seen.discard(key)
+                else:
+                    rows.append(row)
+
+    removed = [
+        key for key in known if key not in seen and (full_scan or key[0] in categories)
+    ]
+    if rows or removed:
+        with transaction(db_path) as conn:
+            _write(conn, rows, removed)
+        logger.info(f"Article catalog: {len(rows)} updated, {len(removed)} removed")
+    return len(rows) + len(removed)
+
+
+def count_articles(category: Optional[str] = None) -> int:
+    conn = get_connection(_db_path())
+    if category is None:
+        return conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    return conn.execute(
+        "SELECT COUNT(*) FROM articles WHERE category=?", (category,)
+    ).fetchone()[0]
+
+
+def list_articles(
+    category: Optional[str] = None, limit: int = -1, offset: int = 0
+) -> List[Dict[str, Any]]:
+    """Returns catalog entries, most recently modified first."""
+    columns = ", ".join(ARTICLE_COLUMNS)
+    where, params = ("WHERE category=?", [category]) if category else ("", [])
+    cursor = get_connection(_db_path()).execute(
+        f"""SELECT {columns} FROM articles {where}
+            ORDER BY mtime DESC, topic LIMIT ? OFFSET ?""",
+        (*params, limit, offset),
+    )
+    return [dict(zip(ARTICLE_COLUMNS, row)) for row in cursor]
+
+
+def get_article_files(category: str, topic: str) -> Optional[Dict[str, str]]:
+    """Returns the files of a cataloged article, as read_structure_to_dict does."""
+    row = (
+        get_connection(_db_path())
+        .execute(
+            "SELECT files FROM articles WHERE category=? AND topic=?",
+            (category, topic),
+        )
+        .fetchone()
+    )
+    return json.loads(row[0]) if row else None
+
+
+def match_expression(query: str) -> str:
+    """
+    Turns free text into an FTS5 query matching articles that contain every
+    word, the last one as a prefix so results update while typing.
+    """
+    words = re.findall(r"\w+", query)
+    terms = [f'"{word}"' for word in words]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_articles(
+    query: str, category: Optional[str] = None, limit: int = 50
+) -> List[Dict[str, Any]]:
+    """
+    Full-text search over the cataloged articles, best matches first.
+
+    Returns:
+        list: Catalog entries with the matches in the title and a snippet of
+            the best matching text wrapped in ** (markdown bold).
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    columns = ", ".join(f"a.{column}" for column in ARTICLE_COLUMNS)
+    where, params = ("AND a.category=?", [category]) if category else ("", [])
+    weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+    cursor = get_connection(_db_path()).execute(
+        f"""SELECT {columns},
+                   highlight(article_search, 0, '**', '**'),
+                   snippet(article_search, -1, '**', '**', '...', {SNIPPET_TOKENS})
+            FROM article_search AS s
+            JOIN articles AS a ON a.rowid = s.rowid
+            WHERE article_search MATCH ? {where}
+            ORDER BY bm25(article_search, {weights})
+            LIMIT ?""",
+        (expression, *params, limit),
+    )
+    return [
+        {
+            **dict(zip(ARTICLE_COLUMNS, row)),
+            "title_highlight": row[-2],
+            "snippet": row[-1],
+        }
+        for row in cursor
+    ]
@@ -0,0 +1,330 @@
+"""
+Headless batch generation of articles.
+
+Usage:
+    python -m util.batch_runner topics.csv --workers 4 --timeout 1800 \\
+        --report batch_report.jsonl
+
+The topics file is either a CSV with a ``topic,category,purpose`` header or a
+JSONL file with one ``{"topic": ..., "category": ..., "purpose": ...}`` object
+per line. Only ``topic`` is required; ``category`` defaults to "Default".
+"""
+
+import os
+import csv
+import json
+import time
+import queue
+import argparse
+import logging
+import multiprocessing
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from .file_io import FileIOHelper
+from .article_catalog import index_article
+from .artifact_helpers import convert_txt_to_md
+from .run_control import stop_process
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORY = "Default"
+
+
+def load_topics(topics_path: str) -> List[Dict[str, str]]:
+    """
+    Reads the topics to generate from a CSV or JSONL file.
+
+    Args:
+        topics_path (str): Path to a .csv or .jsonl topics file.
+
+    Returns:
+        list: One dict per topic with "topic", "category" and "purpose" keys.
+    """
+    if topics_path.endswith(".jsonl"):
+        with open(topics_path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(topics_path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    topics = []
+    for line_number, row in enumerate(rows, start=1):
+        topic = (row.get("topic") or "").strip()
+        if not topic:
+            logger.warning(f"Skipping entry {line_number}: topic is empty")
+            continue
+        topics.append(
+            {
+                "topic": topic,
+                "category": (row.get("category") or "").strip() or DEFAULT_CATEGORY,
+                "purpose": (row.get("purpose") or "").strip(),
+            }
+        )
+    return topics
+
+
+def article_path_for(category: str, topic: str) -> str:
+    """Returns the path the finished markdown article is written to."""
+    from pages_util.CreateNewArticle import sanitize_title
+
+    topic_name = sanitize_title(topic)
+    return os.path.join(
+        FileIOHelper.get_output_dir(category), topic_name, f"{topic_name}.md"
+    )
+
+
+def generate_article(topic: str, category: str, purpose: str = "") -> str:
+    """
+    Runs the full STORM pipeline for a single topic without the Streamlit UI.
+
+    Runners are built from the same stored settings as run_storm_with_config,
+    and the result files are post-processed like the Create New Article page
+    does (citations, .md conversion, rename and date).
+
+    Returns:
+        str: Path of the generated markdown article.
+    """
+    from pages_util.CreateNewArticle import sanitize_title, add_date_to_file
+    from .storm_runner import (
+        build_storm_runner,
+        run_storm_with_fallback,
+        process_search_results,
+        load_llm_settings,
+        load_search_options,
+    )
+
+    current_working_dir = FileIOHelper.get_output_dir(category)
+    runner, fallback_lm = build_storm_runner(
+        current_working_dir, load_llm_settings(), load_search_options()
+    )
+    run_storm_with_fallback(
+        topic=topic,
+        current_working_dir=current_working_dir,
+        runner=runner,
+        fallback_lm=fallback_lm,
+    )
+    process_search_results(runner, current_working_dir, topic)
+    convert_txt_to_md(current_working_dir)
+
+    topic_name = sanitize_title(topic)
+    topic_dir = os.path.join(current_working_dir, topic_name)
+    polished_path = os.path.join(topic_dir, "storm_gen_article_polished.md")
+    article_path = os.path.join(topic_dir, f"{topic_name}.md")
+    if os.path.exists(polished_path):
+        os.replace(polished_path, article_path)
+        add_date_to_file(article_path)
+        FileIOHelper.delete_file(os.path.join(topic_dir, "storm_gen_article.md"))
+
+    if not os.path.exists(article_path):
+        # The fallback LLM writes its result next to the topic directory.
+        fallback_path = os.path.join(
+            current_working_dir, f"{topic.replace(' ', '_')}.md"
+        )
+        if os.path.exists(fallback_path):
+            FileIOHelper.create_directory(topic_dir)
+            os.replace(fallback_path, article_path)
+            add_date_to_file(article_path)
+        else:
+            raise FileNotFoundError(f"No article was written for topic: {topic}")
+
+    index_article(category, topic_name, topic_dir)
+    return article_path
+
+
+def _topic_worker(worker: Callable, index: int, task: Dict[str, str], results):
+    try:
+        article_path = worker(task["topic"], task["category"], task["purpose"])
+        results.put({"index": index, "status": "completed", "article": article_path})
+    except Exception as e:
+        logger.error(f"Failed to generate '{task['topic']}': {e}", exc_info=True)
+        results.put({"index": index, "status": "failed", "error": str(e)})
+
+
+def run_batch(
+    tasks: List[Dict[str, str]],
+    workers: int = 2,
+    timeout: Optional[float] = None,
+    report_path: Optional[str] = None,
+    worker: Callable = generate_article,
+    poll_interval: float = 0.5,
+) -> List[Dict[str, Any]]:
+    """
+    Generates articles for the given topics in parallel worker processes.
+
+    Each topic runs in its own process so a topic exceeding its timeout can be
+    killed without affecting the others. One JSON line per topic is appended
+    to report_path as soon as the topic finishes.
+
+    Args:
+        tasks (list): Topics as returned by load_topics().
+        workers (int): Maximum number of topics generated concurrently.
+        timeout (float, optional): Per-topic timeout in seconds.
+        report_path (str, optional): JSONL file receiving one result per topic.
+        worker (callable): Called as worker(topic, category, purpose) in the
+            child process; returns the article path.
+        poll_interval (float): Seconds between checks of running processes.
+
+    Returns:
+        list: The result records, in the order topics finished.
+    """
+    if workers < 1:
+        raise ValueError("workers must be a positive integer")
+
+    results_queue = multiprocessing.Queue()
+    pending = list(enumerate(tasks))
+    pending.reverse()
+    running: Dict[int, Dict[str, Any]] = {}
+    records = []
+
+    report_file = open(report_path, "a", encoding="utf-8") if report_path else None
+
+    def finish(index: int, outcome: Dict[str, Any]):
+        entry = running.pop(index)
+        process = entry["process"]
+        process.join(poll_interval)
+        stop_process(process)
+        finished_at = time.time()
+        task = tasks[index]
+        record = {
+            "topic": task["topic"],
+            "category": task["category"],
+            "purpose": task["purpose"],
+            "status": outcome["status"],
+            "article": outcome.get("article"),
+            "error": outcome.get("error"),
+            "started_at": datetime.fromtimestamp(entry["started_at"]).isoformat(),
+            "finished_at": datetime.fromtimestamp(finished_at).isoformat(),
+            "duration_s": round(finished_at - entry["started_at"], 3),
+        }
+        records.append(record)
+        logger.info(
+            f"[{len(records)}/{len(tasks)}] {record['status']}: {task['topic']} "
+            f"({record['duration_s']}s)"
+        )
+        if report_file:
+            report_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            report_file.flush()
+
+    def receive(wait: Optional[float]) -> bool:
+        # Returns False once no result is waiting (after up to wait seconds).
+        try:
+            if wait is None:
+                outcome = results_queue.get_nowait()
+            else:
+                outcome = results_queue.get(timeout=wait)
+        except queue.Empty:
+            return False
+        if outcome["index"] in running:
+            finish(outcome["index"], outcome)
+        return True
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                index, task = pending.pop()
+                process = multiprocessing.Process(
+                    target=_topic_worker,
+                    args=(worker, index, task, results_queue),
+                    daemon=True,
+                )
+                process.start()
+                running[index] = {"process": process, "started_at": time.time()}
+
+            receive(poll_interval)
+            # Results that arrived in the meantime count before timeouts, so
+            # a topic that finished just before its deadline is kept.
+            while receive(None):
+                pass
+
+            now = time.time()
+            for index, entry in list(running.items()):
+                if index not in running:
+                    # Finished by a result received earlier in this pass.
+                    continue
+                process = entry["process"]
+                if timeout is not None and now - entry["started_at"] > timeout:
+                    stop_process(process)
+                    finish(
+                        index,
+                        {
+                            "status": "timeout",
+                            "error": f"Timed out after {timeout} seconds",
+                        },
+                    )
+                elif not process.is_alive():
+                    # Give the result of a just-exited worker a chance to arrive.
+                    receive(poll_interval)
+                    if index in running:
+                        finish(
+                            index,
+                            {
+                                "status": "failed",
+                                "error": f"Worker exited with code {process.exitcode}",
+                            },
+                        )
+    finally:
+        for entry in running.values():
+            stop_process(entry["process"])
+        if report_file:
+            report_file.close()
+
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate STORM wiki articles for a list of topics."
+    )
+    parser.add_argument("topics", help="CSV or JSONL file with topic,category,purpose")
+    parser.add_argument(
+        "--workers", type=int, default=2, help="Number of topics generated in parallel"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="Per-topic timeout in seconds"
+    )
+    parser.add_argument(
+        "--report",
+        default="batch_report.jsonl",
+        help="JSONL file receiving one result and timing record per topic",
+    )
+    parser.add_argument(
+        "--skip-existing",
+        action="store_true",
+        help="Skip topics whose article already exists in the output directory",
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+
+    tasks = load_topics(args.topics)
+    if args.skip_existing:
+        tasks = [
+            task
+            for task in tasks
+            if not os.path.exists(article_path_for(task["category"], task["topic"]))
+        ]
+    logger.info(f"Generating {len(tasks)} articles with {args.workers} workers")
+
+    started_at = time.time()
+    records = run_batch(
+        tasks,
+        workers=args.workers,
+        timeout=args.timeout,
+        report_path=args.report,
+    )
+    completed = sum(1 for record in records if record["status"] == "completed")
+    logger.info(
+        f"Batch finished in {time.time() - started_at:.1f}s: "
+        f"{completed}/{len(records)} articles generated. Report: {args.report}"
+    )
+    return 0 if completed == len(records) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,3 @@
-import os
-
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "db", "settings.db")
-
 SEARCH_ENGINES = {
     "searxng": {
         "env_var": "SEARXNG_BASE_URL",
@@ -40,6 +36,97 @@ LLM_MODELS = {
     "anthropic": "ANTHROPIC_API_KEY",
 }
 
+# Concurrent request limits per LLM backend. The scheduler starts at
+# initial_limit and adapts between min_limit and max_limit. For Ollama the
+# OLLAMA_NUM_PARALLEL environment variable overrides max_limit.
+LLM_CONCURRENCY_LIMITS = {
+    "ollama": {"initial_limit": 2, "min_limit": 1, "max_limit": 4},
+    "openai": {"initial_limit": 8, "min_limit": 1, "max_limit": 32},
+    "anthropic": {"initial_limit": 4, "min_limit": 1, "max_limit": 16},
+}
+
+# Per-run budgets, stored under "run_budgets" in llm_settings. A limit of 0
+# means unlimited. on_exceed is "abort" (stop the run) or "downgrade" (send
+# the remaining calls to the fallback LLM).
+RUN_BUDGET_DEFAULTS = {
+    "max_total_tokens": 0,
+    "max_llm_calls": 0,
+    "max_duration_s": 0,
+    "on_exceed": "abort",
+}
+
+# STORM pipeline parallelism, stored under "storm_parallelism" in
+# llm_settings. With auto_tune, max_thread_num is picked per run from the
+# primary backend's concurrency limit and measured latency (see
+# util.llm_scheduler.suggest_concurrency) instead of the stored value.
+# speculative_outline drafts the direct outline while research runs, and
+# pipelined_writing writes the lead section next to the article sections (see
+# util.storm_pipeline).
+STORM_PARALLELISM_DEFAULTS = {
+    "max_conv_turn": 3,
+    "max_perspective": 3,
+    "max_thread_num": 4,
+    "auto_tune": True,
+    "speculative_outline": True,
+    "pipelined_writing": True,
+}
+
+# Ollama model residency, stored under "ollama_residency" in llm_settings.
+# With warm_up, the configured Ollama models are preloaded at app start and
+# before every run and kept loaded for keep_alive_minutes (negative: until
+# Ollama stops).
+OLLAMA_RESIDENCY_DEFAULTS = {
+    "keep_alive_minutes": 30,
+    "warm_up": True,
+}
+
+# Phoenix tracing, stored under "phoenix_settings". Spans are exported in
+# batches by a background thread every schedule_delay_ms or once
+# max_export_batch_size spans are queued, so instrumented calls never wait on
+# the collector. At most max_queue_size spans are queued; when the queue is
+# full the oldest are dropped. sample_ratio is the fraction of traces that is
+# recorded at all.
+PHOENIX_SETTINGS_DEFAULTS = {
+    "enabled": False,
+    "project_name": "storm-wiki",
+    "collector_endpoint": "localhost:6006",
+    "sample_ratio": 1.0,
+    "schedule_delay_ms": 5000,
+    "max_queue_size": 2048,
+    "max_export_batch_size": 512,
+}
+
+# Retry and timeout settings used when a model in llm_settings does not set
+# its own. The per-request timeout is timeout_base + max_tokens *
+# timeout_per_token seconds; retry_budget caps the total time of one call
+# including all retries.
+LLM_RETRY_DEFAULTS = {
+    "ollama": {
+        "max_retries": 3,
+        "retry_base_delay": 2.0,
+        "retry_max_delay": 30.0,
+        "timeout_base": 30.0,
+        "timeout_per_token": 0.2,
+        "retry_budget": 600.0,
+    },
+    "openai": {
+        "max_retries": 3,
+        "retry_base_delay": 1.0,
+        "retry_max_delay": 20.0,
+        "timeout_base": 20.0,
+        "timeout_per_token": 0.05,
+        "retry_budget": 300.0,
+    },
+    "anthropic": {
+        "max_retries": 3,
+        "retry_base_delay": 1.0,
+        "retry_max_delay": 20.0,
+        "timeout_base": 20.0,
+        "timeout_per_token": 0.05,
+        "retry_budget": 300.0,
+    },
+}
+
 
 DRACULA_SOFT_DARK = {
     "primaryColor": "#bf96f9",
@@ -4,10 +4,9 @@ import json
 import base64
 import datetime
 import pytz
-import sqlite3
 from typing import Dict, Any, Optional, List
 from .shared_utils import parse
-from .consts import DB_PATH
+from db.settings_store import load_setting, save_setting, settings_cache
 
 
 class FileIOHelper:
@@ -20,56 +19,25 @@ class FileIOHelper:
 
     @staticmethod
     def load_output_base_dir() -> str:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("SELECT value FROM settings WHERE key='output_dir'")
-        result = c.fetchone()
-        conn.close()
+        # Stored as plain text rather than JSON.
+        output_dir = settings_cache.get_text("output_dir")
         return (
-            result[0]
-            if result
+            output_dir
+            if output_dir
             else os.path.join(os.path.dirname(os.path.dirname(__file__)), "output")
         )
 
     @staticmethod
     def save_output_base_dir(output_dir: str) -> None:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute(
-            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
-            ("output_dir", output_dir),
-        )
-        conn.commit()
-        conn.close()
+        settings_cache.set_text("output_dir", output_dir)
 
     @staticmethod
     def load_categories() -> List[str]:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-
-        # Create the table if it doesn't exist
-        c.execute("""CREATE TABLE IF NOT EXISTS settings
-                 (key TEXT PRIMARY KEY, value TEXT)""")
-
-        c.execute("SELECT value FROM settings WHERE key='categories'")
-        result = c.fetchone()
-        conn.close()
-
-        if result:
-            return json.loads(result[0])
-
-        return ["Default"]
+        return load_setting("categories", ["Default"])
 
     @staticmethod
     def save_categories(categories: List[str]) -> None:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute(
-            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
-            ("categories", json.dumps(categories)),
-        )
-        conn.commit()
-        conn.close()
+        save_setting("categories", categories)
 
     @staticmethod
     def read_structure_to_dict(articles_root_path: str) -> Dict[str, Dict[str, str]]:
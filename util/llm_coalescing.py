@@ -0,0 +1,144 @@
+"""
+Single-flight coalescing of identical LLM requests.
+
+When the same prompt is sent to the same model with the same parameters
+while an identical request is still in flight (concurrent runs on
+overlapping topics, a rerun while the first run is still waiting), the later
+callers wait for the first request and share its completions instead of
+sending their own. Only in-flight requests are shared; nothing is cached
+once a request finishes.
+"""
+
+import json
+import threading
+import logging
+from typing import Any, Callable, Dict, Tuple
+
+from .lm_proxy import LMProxy
+from .run_control import RunCancelledError
+from .token_accounting import report_history_entry, take_history_entry
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Runs fn, unless a call with the same key is in flight, in which case
+        its outcome is awaited instead. A call aborted because its own run was
+        cancelled is not shared; the callers that waited for it run fn again.
+
+        Returns:
+            tuple: The result and whether it was shared from another call.
+        """
+        while True:
+            with self._lock:
+                self._requests += 1
+                call = self._calls.get(key)
+                if call is not None:
+                    self._coalesced += 1
+                    leader = False
+                else:
+                    call = _Call()
+                    self._calls[key] = call
+                    leader = True
+
+            if leader:
+                break
+            call.done.wait()
+            if isinstance(call.error, RunCancelledError):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "requests": self._requests,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+def request_key(client, prompt: str, kwargs: Dict[str, Any]) -> str:
+    """Identifies a request by model, prompt and effective parameters."""
+    client_kwargs = getattr(client, "kwargs", None)
+    params = {**(client_kwargs if isinstance(client_kwargs, dict) else {}), **kwargs}
+    model = params.get("model") or getattr(client, "model_name", "")
+    return json.dumps(
+        [type(client).__name__, str(model), prompt, params],
+        sort_keys=True,
+        default=str,
+    )
+
+
+class CoalescingLM(LMProxy):
+    """LM wrapper that shares identical in-flight requests between callers."""
+
+    def __init__(self, lm, group: SingleFlight):
+        super().__init__(lm)
+        self._group = group
+
+    def __call__(self, prompt, **kwargs):
+        def send():
+            completions = self._lm(prompt, **kwargs)
+            entry, _ = take_history_entry()
+            return completions, entry
+
+        key = request_key(self.unwrap(), prompt, kwargs)
+        (completions, entry), shared = self._group.do(key, send)
+        # Callers that waited get the history entry of the shared request.
+        report_history_entry(entry, shared=shared)
+        # Every caller gets its own list, the completions themselves are str.
+        return list(completions) if shared else completions
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_single_flight(backend: str) -> SingleFlight:
+    with _groups_lock:
+        group = _groups.get(backend)
+        if group is None:
+            group = SingleFlight(backend)
+            _groups[backend] = group
+        return group
+
+
+def coalesce_lm(lm, backend: str) -> CoalescingLM:
+    """Wraps an LM so identical in-flight requests to backend are sent once."""
+    return CoalescingLM(lm, get_single_flight(backend))
+
+
+def get_coalescing_metrics() -> Dict[str, Dict[str, Any]]:
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.snapshot() for group in groups}
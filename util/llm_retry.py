@@ -0,0 +1,169 @@
+"""
+Retries for LLM calls.
+
+A slow or briefly unavailable backend should cost a few seconds of backoff,
+not the whole STORM pipeline. RetryingLM retries transient failures with
+jittered exponential backoff inside a per-call time budget, and
+apply_request_timeout sizes each client's request timeout from max_tokens so
+long generations are not cut off while hung requests still fail fast.
+disable_client_retries leaves RetryingLM as the only retry layer.
+"""
+
+import time
+import types
+import random
+import logging
+from typing import Dict, Optional
+
+from .consts import LLM_RETRY_DEFAULTS
+from .lm_proxy import LMProxy
+from .llm_scheduler import is_overload_error
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Returns True for errors worth retrying: overload, timeouts, dropped
+    connections and server errors. Client errors such as a bad request, an
+    invalid API key or an unknown model are not retried.
+    """
+    if is_overload_error(error):
+        return True
+
+    status_code = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if status_code is None and response is not None:
+        status_code = getattr(response, "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+
+    name = type(error).__name__
+    return isinstance(error, ConnectionError) or "Connection" in name
+
+
+def get_retry_settings(model_type: str, model_settings: Optional[Dict] = None):
+    """Returns the retry settings of a model, filled in with the defaults."""
+    settings = dict(LLM_RETRY_DEFAULTS.get(model_type, LLM_RETRY_DEFAULTS["openai"]))
+    for key, value in ((model_settings or {}).get(model_type) or {}).items():
+        if key in settings:
+            settings[key] = value
+    return settings
+
+
+def request_timeout(model_type: str, model_settings: Optional[Dict] = None) -> float:
+    """Per-request timeout in seconds, derived from the model's max_tokens."""
+    settings = get_retry_settings(model_type, model_settings)
+    max_tokens = ((model_settings or {}).get(model_type) or {}).get("max_tokens", 500)
+    return settings["timeout_base"] + max_tokens * settings["timeout_per_token"]
+
+
+def apply_request_timeout(client, model_type: str, timeout: float):
+    """Sets the HTTP request timeout on a knowledge_storm LM client."""
+    if model_type == "ollama":
+        client.timeout_s = timeout
+    elif model_type == "openai":
+        client.kwargs["timeout"] = timeout
+    elif model_type == "anthropic":
+        client.client = client.client.with_options(timeout=timeout)
+    return client
+
+
+def disable_client_retries(client, model_type: str):
+    """
+    Turns off the retries below RetryingLM, so they do not multiply its
+    attempts and its retry budget holds: the SDK's own retries and the
+    @backoff decorator knowledge_storm and dspy put on client.request().
+    """
+    if model_type == "openai":
+        import openai
+
+        # dspy sends requests through the module-level client.
+        openai.max_retries = 0
+    elif model_type == "anthropic":
+        client.client = client.client.with_options(max_retries=0)
+    request = getattr(getattr(type(client), "request", None), "__wrapped__", None)
+    if request is not None:
+        client.request = types.MethodType(request, client)
+    return client
+
+
+class RetryingLM(LMProxy):
+    """LM wrapper that retries transient failures with jittered backoff."""
+
+    def __init__(
+        self,
+        lm,
+        max_retries: int = 3,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 20.0,
+        retry_budget: float = 300.0,
+        sleep=time.sleep,
+    ):
+        super().__init__(lm)
+        self._max_retries = max_retries
+        self._base_delay = retry_base_delay
+        self._max_delay = retry_max_delay
+        self._budget = retry_budget
+        self._sleep = sleep
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self._max_delay, self._base_delay * 2**attempt)
+        return random.uniform(delay / 2, delay)
+
+    def _wait_before_retry(self, error, attempt: int, deadline: float) -> bool:
+        """Sleeps before the next attempt; returns False if none is allowed."""
+        if not is_retryable_error(error) or attempt >= self._max_retries:
+            return False
+        delay = self._backoff(attempt)
+        if time.monotonic() + delay > deadline:
+            logger.warning(f"LLM call out of retry budget after: {error}")
+            return False
+        logger.warning(
+            f"LLM call failed ({type(error).__name__}: {error}); "
+            f"retry {attempt + 1}/{self._max_retries} in {delay:.1f}s"
+        )
+        self._sleep(delay)
+        return True
+
+    def __call__(self, prompt, **kwargs):
+        deadline = time.monotonic() + self._budget
+        attempt = 0
+        while True:
+            try:
+                return self._lm(prompt, **kwargs)
+            except Exception as e:
+                if not self._wait_before_retry(e, attempt, deadline):
+                    raise
+                attempt += 1
+
+    def stream(self, prompt, **kwargs):
+        # Only a stream that fails before its first chunk is retried; text
+        # that was already handed out cannot be taken back.
+        deadline = time.monotonic() + self._budget
+        attempt = 0
+        while True:
+            started = False
+            try:
+                for chunk in super().stream(prompt, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or not self._wait_before_retry(e, attempt, deadline):
+                    raise
+                attempt += 1
+
+
+def with_retries(lm, model_type: str, model_settings: Optional[Dict] = None):
+    """Wraps an LM client with the retry policy configured for model_type."""
+    settings = get_retry_settings(model_type, model_settings)
+    return RetryingLM(
+        lm,
+        max_retries=settings["max_retries"],
+        retry_base_delay=settings["retry_base_delay"],
+        retry_max_delay=settings["retry_max_delay"],
+        retry_budget=settings["retry_budget"],
+    )
@@ -0,0 +1,322 @@
+"""
+Per-backend scheduling of LLM requests.
+
+Every LLM backend (Ollama, OpenAI, Anthropic) gets one process-wide limiter
+that caps the number of requests in flight across all runs. The cap adapts
+with AIMD: it grows slowly while requests succeed and is cut in half when the
+backend reports overload (HTTP 429/503/529 or a timeout). Waiting requests are
+granted slots round-robin between runs, so a run with many parallel
+conversations cannot starve a run that was started later.
+"""
+
+import os
+import math
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from .consts import LLM_CONCURRENCY_LIMITS
+from .lm_proxy import LMProxy
+
+logger = logging.getLogger(__name__)
+
+OVERLOAD_STATUS_CODES = {429, 503, 529}
+# Weight of the newest request in the moving average of request latency.
+LATENCY_SMOOTHING = 0.2
+# A backend whose average latency is this many times its baseline latency for
+# calls of the same class is queueing requests internally (Ollama beyond
+# OLLAMA_NUM_PARALLEL).
+QUEUEING_LATENCY_RATIO = 2.0
+# The baseline is the fastest recent latency: it drops to faster requests and
+# drifts this much of the way towards every slower one, so one unusually fast
+# request is forgotten after a few dozen calls.
+BASELINE_DECAY = 0.02
+# Calls of a class are compared once this many were measured.
+MIN_LATENCY_SAMPLES = 5
+# Faster requests were answered from a cache and say nothing about the backend.
+MIN_REQUEST_LATENCY_S = 0.05
+# Calls are classed by completion length, in doubling steps of this many
+# characters, since generating the completion dominates request latency.
+CLASS_COMPLETION_CHARS = 256
+
+
+def latency_class(response) -> int:
+    """Returns the latency class of a call from its completions."""
+    if isinstance(response, str):
+        response = [response]
+    try:
+        chars = sum(len(c) for c in response if isinstance(c, str))
+    except TypeError:
+        chars = 0
+    return int(math.log2(1 + chars / CLASS_COMPLETION_CHARS))
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Returns True if the error means the backend is saturated."""
+    status_code = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if status_code is None and response is not None:
+        status_code = getattr(response, "status_code", None)
+    if status_code in OVERLOAD_STATUS_CODES:
+        return True
+
+    name = type(error).__name__
+    return "Timeout" in name or "RateLimit" in name or "Overloaded" in name
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 2,
+        min_limit: int = 1,
+        max_limit: int = 8,
+        backoff_factor: float = 0.5,
+        cooldown: float = 2.0,
+    ):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= max_limit")
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_factor = backoff_factor
+        self.cooldown = cooldown
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._queues: Dict[Any, deque] = {}
+        self._rotation: deque = deque()
+        self._granted = set()
+        self._cond = threading.Condition()
+        self._last_backoff = 0.0
+        self._successes = 0
+        self._overloads = 0
+        self._waits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._avg_latency: Optional[float] = None
+        # Per latency class: average, baseline and number of samples.
+        self._latency_classes: Dict[int, Dict[str, float]] = {}
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _dispatch(self):
+        granted = False
+        while self._rotation and self._in_flight < int(self._limit):
+            run_id = self._rotation.popleft()
+            queue = self._queues[run_id]
+            self._granted.add(queue.popleft())
+            self._in_flight += 1
+            granted = True
+            if queue:
+                self._rotation.append(run_id)
+            else:
+                del self._queues[run_id]
+        if granted:
+            self._cond.notify_all()
+
+    def acquire(self, run_id: Any = None) -> float:
+        """
+        Blocks until a request slot is free for run_id.
+
+        Returns:
+            float: Seconds spent waiting in the queue.
+        """
+        ticket = object()
+        enqueued_at = time.monotonic()
+        with self._cond:
+            if run_id not in self._queues:
+                self._queues[run_id] = deque()
+                self._rotation.append(run_id)
+            self._queues[run_id].append(ticket)
+            self._dispatch()
+            while ticket not in self._granted:
+                self._cond.wait()
+            self._granted.discard(ticket)
+
+            waited = time.monotonic() - enqueued_at
+            self._waits += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        return waited
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._dispatch()
+
+    def _set_limit(self, limit: float):
+        if int(limit) != int(self._limit):
+            # Latencies measured at another limit are not comparable.
+            self._latency_classes.clear()
+        self._limit = limit
+
+    def record_success(self, latency_s: Optional[float] = None, call_class: int = 0):
+        with self._cond:
+            self._successes += 1
+            if latency_s is not None:
+                self._record_latency(latency_s, call_class)
+            # Additive increase: roughly +1 per window of `limit` successes.
+            self._set_limit(min(self.max_limit, self._limit + 1.0 / self._limit))
+            self._dispatch()
+
+    def _record_latency(self, latency_s: float, call_class: int):
+        if latency_s < MIN_REQUEST_LATENCY_S:
+            return
+        if self._avg_latency is None:
+            self._avg_latency = latency_s
+        else:
+            self._avg_latency += LATENCY_SMOOTHING * (latency_s - self._avg_latency)
+
+        stats = self._latency_classes.get(call_class)
+        if stats is None:
+            self._latency_classes[call_class] = {
+                "avg": latency_s,
+                "baseline": latency_s,
+                "samples": 1,
+            }
+            return
+        stats["avg"] += LATENCY_SMOOTHING * (latency_s - stats["avg"])
+        if latency_s < stats["baseline"]:
+            stats["baseline"] = latency_s
+        else:
+            stats["baseline"] += BASELINE_DECAY * (latency_s - stats["baseline"])
+        stats["samples"] += 1
+
+    def suggested_concurrency(self) -> int:
+        """
+        Returns how many requests a client should keep in flight: the current
+        limit, halved while the measured latency shows the backend is
+        queueing requests it has already accepted. Only calls of the same
+        class, measured at the current limit, are compared.
+        """
+        with self._cond:
+            concurrency = int(self._limit)
+            queueing = any(
+                stats["samples"] >= MIN_LATENCY_SAMPLES
+                and stats["avg"] > QUEUEING_LATENCY_RATIO * stats["baseline"]
+                for stats in self._latency_classes.values()
+            )
+            if queueing:
+                concurrency = max(self.min_limit, concurrency // 2)
+            return concurrency
+
+    def record_overload(self):
+        with self._cond:
+            self._overloads += 1
+            now = time.monotonic()
+            # Requests that were in flight together fail together; back off
+            # once per burst instead of once per failed request.
+            if now - self._last_backoff < self.cooldown:
+                return
+            self._last_backoff = now
+            self._set_limit(max(self.min_limit, self._limit * self.backoff_factor))
+            logger.warning(
+                f"{self.name} is overloaded, concurrency limit lowered to {self.limit}"
+            )
+
+    @contextmanager
+    def slot(self, run_id: Any = None):
+        self.acquire(run_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "backend": self.name,
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "successes": self._successes,
+                "overloads": self._overloads,
+                "avg_wait_s": (
+                    round(self._total_wait / self._waits, 3) if self._waits else 0.0
+                ),
+                "max_wait_s": round(self._max_wait, 3),
+                "avg_latency_s": (
+                    round(self._avg_latency, 3)
+                    if self._avg_latency is not None
+                    else None
+                ),
+            }
+
+
+class ScheduledLM(LMProxy):
+    """LM wrapper that runs every request through a backend limiter."""
+
+    def __init__(self, lm, limiter: AdaptiveConcurrencyLimiter, run_id: Any = None):
+        super().__init__(lm)
+        self._limiter = limiter
+        self._run_id = run_id
+
+    def __call__(self, prompt, **kwargs):
+        with self._limiter.slot(self._run_id):
+            started = time.monotonic()
+            try:
+                response = self._lm(prompt, **kwargs)
+            except Exception as e:
+                if is_overload_error(e):
+                    self._limiter.record_overload()
+                raise
+            self._limiter.record_success(
+                time.monotonic() - started, latency_class(response)
+            )
+            return response
+
+    def stream(self, prompt, **kwargs):
+        # The slot is held until the stream is exhausted or closed.
+        with self._limiter.slot(self._run_id):
+            try:
+                yield from super().stream(prompt, **kwargs)
+            except Exception as e:
+                if is_overload_error(e):
+                    self._limiter.record_overload()
+                raise
+            self._limiter.record_success()
+
+
+_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(backend: str) -> AdaptiveConcurrencyLimiter:
+    """Returns the process-wide limiter for an LLM backend."""
+    with _limiters_lock:
+        limiter = _limiters.get(backend)
+        if limiter is None:
+            limits = dict(LLM_CONCURRENCY_LIMITS.get(backend, {}))
+            if backend == "ollama" and os.getenv("OLLAMA_NUM_PARALLEL"):
+                limits["max_limit"] = int(os.getenv("OLLAMA_NUM_PARALLEL"))
+                limits["initial_limit"] = min(
+                    limits.get("initial_limit", 2), limits["max_limit"]
+                )
+            limiter = AdaptiveConcurrencyLimiter(backend, **limits)
+            _limiters[backend] = limiter
+        return limiter
+
+
+def schedule_lm(lm, backend: str, run_id: Optional[Any] = None) -> ScheduledLM:
+    """Wraps an LM client so its requests go through the backend's limiter."""
+    return ScheduledLM(lm, get_limiter(backend), run_id)
+
+
+def suggest_concurrency(backend: str) -> int:
+    """
+    Returns the number of parallel LLM requests a run should issue against
+    backend, from its current concurrency limit and measured latency.
+    """
+    return get_limiter(backend).suggested_concurrency()
+
+
+def get_scheduler_metrics() -> Dict[str, Dict[str, Any]]:
+    """Returns queue and concurrency metrics for every backend in use."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.snapshot() for limiter in limiters}
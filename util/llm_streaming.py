@@ -0,0 +1,144 @@
+"""
+Token streaming for the LM clients used by STORM.
+
+dspy only exposes blocking calls, so the streaming requests are made here
+directly against each backend (Ollama, OpenAI and Anthropic), reusing the
+settings stored on the dspy client.
+"""
+
+import json
+import time
+import logging
+from typing import Callable, Iterator, Optional
+
+import dspy
+import requests
+from knowledge_storm.lm import ClaudeModel
+
+from .lm_proxy import LMProxy
+
+logger = logging.getLogger(__name__)
+
+STREAMING_CLIENT_TYPES = (dspy.OllamaLocal, dspy.OpenAI, ClaudeModel)
+
+
+def supports_streaming(lm) -> bool:
+    if isinstance(lm, LMProxy):
+        lm = lm.unwrap()
+    return isinstance(lm, STREAMING_CLIENT_TYPES)
+
+
+def stream_completion(lm, prompt: str, **kwargs) -> Iterator[str]:
+    """
+    Yields the completion of prompt in chunks as the backend produces them.
+    LMs that cannot stream yield their whole completion as a single chunk.
+    """
+    if isinstance(lm, LMProxy):
+        yield from lm.stream(prompt, **kwargs)
+    else:
+        yield from stream_client_completion(lm, prompt, **kwargs)
+
+
+def stream_client_completion(client, prompt: str, **kwargs) -> Iterator[str]:
+    if isinstance(client, dspy.OllamaLocal):
+        yield from _stream_ollama(client, prompt, **kwargs)
+    elif isinstance(client, ClaudeModel):
+        yield from _stream_anthropic(client, prompt, **kwargs)
+    elif isinstance(client, dspy.OpenAI):
+        yield from _stream_openai(client, prompt, **kwargs)
+    else:
+        response = client(prompt, **kwargs)
+        yield response[0] if response else ""
+
+
+def _stream_ollama(client, prompt: str, **kwargs) -> Iterator[str]:
+    settings = {**client.kwargs, **kwargs}
+    payload = {
+        "model": client.model_name,
+        "options": {k: v for k, v in settings.items() if k not in ["n", "max_tokens"]},
+        "stream": True,
+    }
+    if client.model_type == "chat":
+        url = f"{client.base_url}/api/chat"
+        payload["messages"] = [{"role": "user", "content": prompt}]
+    else:
+        url = f"{client.base_url}/api/generate"
+        payload["prompt"] = prompt
+
+    with requests.post(
+        url, json=payload, stream=True, timeout=client.timeout_s
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line)
+            if client.model_type == "chat":
+                text = (data.get("message") or {}).get("content")
+            else:
+                text = data.get("response")
+            if text:
+                yield text
+            if data.get("done"):
+                break
+
+
+def _stream_openai(client, prompt: str, **kwargs) -> Iterator[str]:
+    import openai
+
+    settings = {**client.kwargs, **kwargs}
+    settings.pop("n", None)
+    stream = openai.chat.completions.create(
+        messages=[{"role": "user", "content": prompt}], stream=True, **settings
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _stream_anthropic(client, prompt: str, **kwargs) -> Iterator[str]:
+    settings = {**client.kwargs, **kwargs}
+    settings.pop("n", None)
+    with client.client.messages.stream(
+        messages=[{"role": "user", "content": prompt}], **settings
+    ) as stream:
+        for text in stream.text_stream:
+            yield text
+
+
+def stream_to_file(
+    lm,
+    prompt: str,
+    output_path: Optional[str] = None,
+    on_chunk: Optional[Callable[[str], None]] = None,
+    update_interval: float = 0.2,
+) -> str:
+    """
+    Streams a completion, appending every chunk to output_path as it arrives
+    so a crash keeps everything generated so far.
+
+    Args:
+        on_chunk (callable, optional): Called with the text generated so far,
+            at most once per update_interval seconds and once at the end.
+
+    Returns:
+        str: The complete generated text.
+    """
+    content = ""
+    last_update = 0.0
+    output_file = open(output_path, "w") if output_path else None
+    try:
+        for chunk in stream_completion(lm, prompt):
+            content += chunk
+            if output_file:
+                output_file.write(chunk)
+                output_file.flush()
+            if on_chunk and time.monotonic() - last_update >= update_interval:
+                last_update = time.monotonic()
+                on_chunk(content)
+    finally:
+        if output_file:
+            output_file.close()
+    if on_chunk:
+        on_chunk(content)
+    return content
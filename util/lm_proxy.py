@@ -0,0 +1,47 @@
+class LMProxy:
+    """
+    Base class for wrappers around dspy LM clients.
+
+    dspy and knowledge_storm read and assign attributes such as ``kwargs`` and
+    ``history`` on the configured LM, so every attribute that is not private
+    to the wrapper is read from and written to the wrapped client. Subclasses
+    keep their own state in attributes starting with an underscore and
+    override __call__.
+    """
+
+    def __init__(self, lm):
+        self._lm = lm
+
+    @property
+    def lm(self):
+        return self._lm
+
+    def unwrap(self):
+        """Returns the underlying LM client below all wrappers."""
+        lm = self._lm
+        while isinstance(lm, LMProxy):
+            lm = lm.lm
+        return lm
+
+    def __call__(self, prompt, **kwargs):
+        return self._lm(prompt, **kwargs)
+
+    def stream(self, prompt, **kwargs):
+        """Yields the completion in chunks; see util.llm_streaming."""
+        from .llm_streaming import stream_completion
+
+        yield from stream_completion(self._lm, prompt, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._lm, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._lm, name, value)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._lm!r})"
@@ -0,0 +1,84 @@
+"""
+Discovery of the models downloaded to Ollama.
+
+The model list is read from Ollama's HTTP API (/api/tags) and cached for the
+whole process, so every session and rerun shares one list. Once the list is
+older than its TTL the cached list is still returned while a background
+thread fetches a fresh one; only the very first lookup waits for Ollama.
+"""
+
+import time
+import threading
+import logging
+from typing import Callable, List, Optional
+
+import requests
+
+from .ollama_residency import ollama_base_url
+
+logger = logging.getLogger(__name__)
+
+MODEL_LIST_TTL = 30
+
+
+def fetch_ollama_models(
+    base_url: Optional[str] = None, timeout: float = 2
+) -> List[str]:
+    """Returns the names of the models downloaded to Ollama."""
+    response = requests.get(
+        f"{base_url or ollama_base_url()}/api/tags", timeout=timeout
+    )
+    response.raise_for_status()
+    return [model["name"] for model in response.json().get("models", [])]
+
+
+class OllamaModelDiscovery:
+    def __init__(
+        self,
+        ttl: float = MODEL_LIST_TTL,
+        fetch: Callable[[], List[str]] = fetch_ollama_models,
+    ):
+        self.ttl = ttl
+        self._fetch = fetch
+        self._models: List[str] = []
+        self._fetched_at: Optional[float] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def refresh(self) -> List[str]:
+        """
+        Fetches the model list now. If Ollama cannot be reached the previous
+        list is kept and retried after the TTL.
+        """
+        try:
+            models = self._fetch()
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning(f"Could not list Ollama models: {e}")
+            models = None
+        with self._lock:
+            if models is not None:
+                self._models = models
+            self._fetched_at = time.monotonic()
+            self._refreshing = False
+            return list(self._models)
+
+    def models(self) -> List[str]:
+        """Returns the cached model list, refreshing it if it is stale."""
+        with self._lock:
+            fetched_at = self._fetched_at
+            if fetched_at is not None:
+                stale = time.monotonic() - fetched_at >= self.ttl
+                if stale and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(
+                        target=self.refresh, name="ollama-model-discovery", daemon=True
+                    ).start()
+                return list(self._models)
+        return self.refresh()
+
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = None
+
+
+ollama_models = OllamaModelDiscovery()
@@ -0,0 +1,170 @@
+"""
+Warm-up and keep-alive of the Ollama models used by STORM.
+
+Ollama loads a model on its first request and unloads it after its
+keep-alive expires, so the first call of a run can spend seconds to minutes
+loading the model. The models configured as primary or fallback LLM are
+preloaded when the app starts and before every run, with the keep-alive from
+llm_settings["ollama_residency"]. dspy sends every request without a
+keep-alive, which resets it to the server default, so it is set again once a
+run ends.
+"""
+
+import os
+import time
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from .consts import OLLAMA_RESIDENCY_DEFAULTS
+
+logger = logging.getLogger(__name__)
+
+# A model warmed up less than this share of its keep-alive ago is skipped.
+REWARM_FRACTION = 0.5
+
+_warmed_at: Dict[str, float] = {}
+_warming = set()
+_lock = threading.Lock()
+
+
+def ollama_base_url() -> str:
+    return f"http://localhost:{int(os.getenv('OLLAMA_PORT', 11434))}"
+
+
+def get_residency_settings(llm_settings: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **OLLAMA_RESIDENCY_DEFAULTS,
+        **(llm_settings.get("ollama_residency") or {}),
+    }
+
+
+def keep_alive_value(keep_alive_minutes: int):
+    """Converts minutes to Ollama's keep_alive; negative keeps the model loaded."""
+    return -1 if keep_alive_minutes < 0 else f"{keep_alive_minutes}m"
+
+
+def configured_ollama_models(llm_settings: Dict[str, Any]) -> List[str]:
+    """Returns the Ollama models used as primary or fallback LLM."""
+    if "ollama" not in (
+        llm_settings.get("primary_model"),
+        llm_settings.get("fallback_model"),
+    ):
+        return []
+    model = llm_settings.get("model_settings", {}).get("ollama", {}).get("model")
+    return [model] if model else []
+
+
+def warm_up_model(
+    model: str,
+    keep_alive_minutes: int,
+    base_url: Optional[str] = None,
+    timeout: float = 600,
+) -> bool:
+    """
+    Loads model into Ollama and sets its keep-alive. A generate request
+    without a prompt only loads the model.
+
+    Returns:
+        bool: True if the model is loaded.
+    """
+    url = f"{base_url or ollama_base_url()}/api/generate"
+    started = time.monotonic()
+    try:
+        response = requests.post(
+            url,
+            json={"model": model, "keep_alive": keep_alive_value(keep_alive_minutes)},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.warning(f"Could not warm up Ollama model {model}: {e}")
+        return False
+    logger.info(f"Ollama model {model} loaded in {time.monotonic() - started:.1f}s")
+    return True
+
+
+def _warm_up(model: str, keep_alive_minutes: int):
+    try:
+        if warm_up_model(model, keep_alive_minutes):
+            with _lock:
+                _warmed_at[model] = time.monotonic()
+    finally:
+        with _lock:
+            _warming.discard(model)
+
+
+def warm_up_models(
+    llm_settings: Dict[str, Any], force: bool = False, wait: bool = False
+) -> List[threading.Thread]:
+    """
+    Preloads the configured Ollama models in background threads.
+
+    Args:
+        llm_settings (dict): The LLM settings as returned by load_llm_settings().
+        force (bool): Warm up even models that were warmed up recently, to
+            renew their keep-alive.
+        wait (bool): Block until the models are loaded.
+
+    Returns:
+        list: The started warm-up threads.
+    """
+    residency = get_residency_settings(llm_settings)
+    if not residency["warm_up"]:
+        return []
+    keep_alive_minutes = residency["keep_alive_minutes"]
+    rewarm_after = max(keep_alive_minutes, 0) * 60 * REWARM_FRACTION
+
+    threads = []
+    for model in configured_ollama_models(llm_settings):
+        with _lock:
+            if model in _warming:
+                continue
+            warmed_at = _warmed_at.get(model)
+            recently_warmed = warmed_at is not None and (
+                keep_alive_minutes < 0 or time.monotonic() - warmed_at < rewarm_after
+            )
+            if recently_warmed and not force:
+                continue
+            _warming.add(model)
+        thread = threading.Thread(
+            target=_warm_up,
+            args=(model, keep_alive_minutes),
+            name=f"ollama-warm-up-{model}",
+            daemon=True,
+        )
+        thread.start()
+        threads.append(thread)
+
+    if wait:
+        for thread in threads:
+            thread.join()
+    return threads
+
+
+def get_resident_models(
+    base_url: Optional[str] = None, timeout: float = 2
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Returns the models Ollama currently holds in memory, or None if Ollama
+    cannot be reached.
+    """
+    try:
+        response = requests.get(
+            f"{base_url or ollama_base_url()}/api/ps", timeout=timeout
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.debug(f"Could not read Ollama residency: {e}")
+        return None
+    return [
+        {
+            "model": model.get("name", ""),
+            "size_gb": round(model.get("size", 0) / 1e9, 2),
+            "vram_gb": round(model.get("size_vram", 0) / 1e9, 2),
+            "expires_at": model.get("expires_at", ""),
+        }
+        for model in response.json().get("models", [])
+    ]
@@ -1,48 +1,169 @@
-import os
-from phoenix import trace
-from phoenix.trace.openai import OpenAIInstrumentor
-from openinference.semconv.resource import ResourceAttributes
-from opentelemetry import trace as trace_api
-from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
-from opentelemetry.sdk import trace as trace_sdk
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace.export import SimpleSpanProcessor
-from db.db_operations import load_setting
+import atexit
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
 
+from db.settings_store import load_setting, settings_events
+from .consts import PHOENIX_SETTINGS_DEFAULTS
 
-def setup_phoenix():
+logger = logging.getLogger(__name__)
+
+# How long a reconfiguration waits for queued spans to be exported.
+FLUSH_TIMEOUT_MS = 2000
+
+# The settings tracing is set up from, in the order _start_tracing takes them.
+TRACING_SETTING_KEYS = (
+    "project_name",
+    "collector_endpoint",
+    "sample_ratio",
+    "schedule_delay_ms",
+    "max_queue_size",
+    "max_export_batch_size",
+)
+
+_watch_lock = threading.Lock()
+_watching = False
+
+# The tracing state of the process, replaced only when the settings change.
+_tracing_lock = threading.Lock()
+_tracer_provider = None
+_instrumentor = None
+_tracing_config: Optional[Tuple] = None
+
+
+def load_phoenix_settings() -> Dict[str, Any]:
+    """Returns the Phoenix settings with defaults for missing keys."""
+    return {**PHOENIX_SETTINGS_DEFAULTS, **load_setting("phoenix_settings", {})}
+
+
+def tracing_config(phoenix_settings: Dict[str, Any]) -> Optional[Tuple]:
     """
-    Set up Phoenix for tracing and instrumentation.
+    Returns the settings that tracing depends on, or None if tracing is
+    disabled. Tracing is only reconfigured when this value changes.
     """
-    phoenix_settings = load_setting(
-        "phoenix_settings",
-        {
-            "project_name": "storm-wiki",
-            "enabled": False,
-            "collector_endpoint": "localhost:6006",
-        },
-    )
-
     if not phoenix_settings.get("enabled", False):
         return None
-
-    resource = Resource(
-        attributes={
-            ResourceAttributes.PROJECT_NAME: phoenix_settings.get(
-                "project_name", "storm-wiki"
-            )
-        }
+    return tuple(
+        phoenix_settings.get(key, PHOENIX_SETTINGS_DEFAULTS[key])
+        for key in TRACING_SETTING_KEYS
     )
-    tracer_provider = trace_sdk.TracerProvider(resource=resource)
 
-    span_exporter = OTLPSpanExporter(
-        endpoint=f"http://{phoenix_settings.get('collector_endpoint', 'localhost:6006')}/v1/traces"
-    )
 
-    span_processor = SimpleSpanProcessor(span_exporter=span_exporter)
+def _start_tracing(
+    project_name: str,
+    collector_endpoint: str,
+    sample_ratio: float,
+    schedule_delay_ms: int,
+    max_queue_size: int,
+    max_export_batch_size: int,
+):
+    # Phoenix and OpenTelemetry are only imported once tracing is enabled.
+    # phoenix.trace.openai.OpenAIInstrumentor always builds a provider of its
+    # own, so the openinference instrumentor it wraps is used directly.
+    from openinference.instrumentation.openai import OpenAIInstrumentor
+    from openinference.semconv.resource import ResourceAttributes
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk import trace as trace_sdk
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    resource = Resource(attributes={ResourceAttributes.PROJECT_NAME: project_name})
+    # Spans of unsampled traces are not recorded; child spans follow the
+    # decision of their root, so sampled traces stay complete.
+    sampler = ParentBased(TraceIdRatioBased(sample_ratio))
+    tracer_provider = trace_sdk.TracerProvider(resource=resource, sampler=sampler)
+
+    span_exporter = OTLPSpanExporter(endpoint=f"http://{collector_endpoint}/v1/traces")
+
+    # Ended spans are only queued on the calling thread; a background thread
+    # exports them in batches. When the queue is full, spans are dropped
+    # instead of blocking the instrumented call.
+    span_processor = BatchSpanProcessor(
+        span_exporter,
+        max_queue_size=max_queue_size,
+        schedule_delay_millis=schedule_delay_ms,
+        max_export_batch_size=max_export_batch_size,
+    )
     tracer_provider.add_span_processor(span_processor=span_processor)
-    trace_api.set_tracer_provider(tracer_provider=tracer_provider)
 
-    OpenAIInstrumentor().instrument()
+    # The provider is passed to the instrumentor instead of being set as the
+    # global one, which OpenTelemetry only allows once per process.
+    instrumentor = OpenAIInstrumentor()
+    instrumentor.instrument(tracer_provider=tracer_provider)
+    if not instrumentor.is_instrumented_by_opentelemetry:
+        # instrument() only logs when the installed openai does not satisfy
+        # the instrumentor's requirements.
+        tracer_provider.shutdown()
+        raise RuntimeError(
+            "The installed openai package is not supported by "
+            "openinference-instrumentation-openai"
+        )
+    return tracer_provider, instrumentor
+
+
+def _stop_tracing():
+    global _tracer_provider, _instrumentor
+    if _instrumentor is not None:
+        _instrumentor.uninstrument()
+        _instrumentor = None
+    if _tracer_provider is not None:
+        # Exports the spans that are still queued before dropping the provider.
+        _tracer_provider.force_flush(FLUSH_TIMEOUT_MS)
+        _tracer_provider.shutdown()
+        _tracer_provider = None
+
+
+def setup_phoenix():
+    """
+    Set up Phoenix for tracing and instrumentation to match the Phoenix
+    settings. Nothing is done if the settings tracing depends on did not
+    change; otherwise the previous provider is flushed and shut down and
+    OpenAI is uninstrumented before tracing is set up again.
+
+    If tracing cannot be set up, e.g. because the tracing packages are
+    missing or incompatible, the error is logged and tracing stays disabled
+    until the settings change.
 
-    return tracer_provider
+    Returns:
+        TracerProvider: The active tracer provider, or None if tracing is
+            disabled.
+    """
+    global _tracer_provider, _instrumentor, _tracing_config
+    config = tracing_config(load_phoenix_settings())
+    with _tracing_lock:
+        if config == _tracing_config:
+            return _tracer_provider
+        _stop_tracing()
+        _tracing_config = None
+        if config is not None:
+            try:
+                _tracer_provider, _instrumentor = _start_tracing(*config)
+                logger.info(f"Tracing to Phoenix project {config[0]} at {config[1]}")
+            except Exception as e:
+                logger.error(f"Could not set up Phoenix tracing: {e}")
+        _tracing_config = config
+        return _tracer_provider
+
+
+def shutdown_phoenix():
+    """Flushes and shuts down tracing, e.g. when the process exits."""
+    global _tracing_config
+    with _tracing_lock:
+        _stop_tracing()
+        _tracing_config = None
+
+
+def watch_phoenix_settings():
+    """
+    Sets up tracing the first time it is called in a process, and again
+    whenever the Phoenix settings change, instead of on every rerun.
+    """
+    global _watching
+    with _watch_lock:
+        if _watching:
+            return
+        _watching = True
+    settings_events.subscribe("phoenix_settings", lambda key: setup_phoenix())
+    atexit.register(shutdown_phoenix)
+    setup_phoenix()
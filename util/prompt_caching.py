@@ -0,0 +1,103 @@
+"""
+Provider-side caching of the static prompt prefix.
+
+dspy renders every prompt as sections joined by "---" lines: instructions,
+format guidelines, the few-shot demos installed by add_examples_to_runner,
+and finally the query. Everything before the last separator is identical
+for every call of a module, so providers can cache it:
+
+- Anthropic caches a prefix only when asked to: the prompt is sent as two
+  content blocks with cache_control on the prefix.
+- OpenAI caches prefixes of 1024+ tokens automatically and reports the
+  cached tokens in the usage read by util.token_accounting.
+- Ollama reuses the KV cache of a matching prefix as long as the model stays
+  loaded with the same options (see util.ollama_residency); it reports no
+  hit counts.
+
+Cache reads and writes reported by Anthropic are recorded on the run through
+util.token_accounting.report_cache_usage.
+"""
+
+import logging
+from typing import Any, Dict, Tuple
+
+from knowledge_storm.lm import ClaudeModel
+
+from .token_accounting import report_cache_usage
+
+logger = logging.getLogger(__name__)
+
+PROMPT_SECTION_SEPARATOR = "\n\n---\n\n"
+# Anthropic ignores cache_control on prefixes shorter than this.
+MIN_CACHEABLE_TOKENS = 1024
+CHARS_PER_TOKEN = 4
+
+
+def split_prompt(prompt: str) -> Tuple[str, str]:
+    """Splits a dspy prompt into its static prefix and the query."""
+    index = prompt.rfind(PROMPT_SECTION_SEPARATOR)
+    if index < 0:
+        return "", prompt
+    index += len(PROMPT_SECTION_SEPARATOR)
+    return prompt[:index], prompt[index:]
+
+
+def with_cache_control(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the Anthropic request with the static prefix of its single user
+    message marked for caching, if the prefix is long enough to be cached.
+    """
+    messages = request.get("messages") or []
+    if len(messages) != 1 or not isinstance(messages[0].get("content"), str):
+        return request
+    prefix, query = split_prompt(messages[0]["content"])
+    if len(prefix) // CHARS_PER_TOKEN < MIN_CACHEABLE_TOKENS:
+        return request
+    content = [
+        {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": query},
+    ]
+    return {**request, "messages": [{**messages[0], "content": content}]}
+
+
+class _CachingMessages:
+    def __init__(self, messages):
+        self._messages = messages
+
+    def create(self, **kwargs):
+        response = self._messages.create(**with_cache_control(kwargs))
+        usage = getattr(response, "usage", None)
+        report_cache_usage(
+            getattr(usage, "cache_read_input_tokens", 0) or 0,
+            getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        )
+        return response
+
+    def stream(self, **kwargs):
+        return self._messages.stream(**with_cache_control(kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._messages, name)
+
+
+class CachingAnthropicClient:
+    """Anthropic SDK client that marks the static prompt prefix for caching."""
+
+    def __init__(self, client):
+        self._client = client
+        self.messages = _CachingMessages(client.messages)
+
+    def with_options(self, **kwargs):
+        return CachingAnthropicClient(self._client.with_options(**kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def enable_prompt_caching(client, model_type: str):
+    """Enables prefix caching on an LM client where the provider needs it."""
+    if isinstance(client, ClaudeModel) and not isinstance(
+        client.client, CachingAnthropicClient
+    ):
+        client.client = CachingAnthropicClient(client.client)
+    return client
@@ -0,0 +1,176 @@
+"""
+Map-reduce condensation of STORM research for the fallback prompt.
+
+The research collected before a failed run can be far larger than the context
+window of the fallback model. condense_research splits it into chunks,
+summarizes the chunks in parallel (map), joins the summaries and repeats on
+the result until it fits the token budget (reduce).
+"""
+
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from .run_control import RunCancelledError
+from .token_accounting import BudgetExceededError
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+DEFAULT_RESEARCH_TOKEN_BUDGET = 3000
+# Tokens kept free in the context window for the rest of the fallback prompt.
+PROMPT_OVERHEAD_TOKENS = 512
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def research_token_budget(lm) -> int:
+    """
+    Returns how many tokens of research fit in the fallback prompt: the
+    default budget, shrunk to the model's context window (num_ctx) minus its
+    completion length when the LM reports one.
+    """
+    kwargs = getattr(lm, "kwargs", None)
+    if not isinstance(kwargs, dict) or not isinstance(kwargs.get("num_ctx"), int):
+        return DEFAULT_RESEARCH_TOKEN_BUDGET
+    available = kwargs["num_ctx"] - kwargs.get("max_tokens", 0) - PROMPT_OVERHEAD_TOKENS
+    return max(256, min(DEFAULT_RESEARCH_TOKEN_BUDGET, available))
+
+
+def chunk_text(text: str, chunk_tokens: int) -> List[str]:
+    """Splits text into chunks of about chunk_tokens, on paragraph boundaries."""
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def summarize_chunk(lm, topic: str, chunk: str, max_tokens: int) -> str:
+    prompt = f"""
+    Topic: {topic}
+
+    Research notes:
+    {chunk}
+
+    Condense these research notes into at most {max_tokens * 3 // 4} words.
+    Keep every fact, figure, name and date that is relevant to the topic,
+    and keep the source URLs next to the facts they support.
+    """
+    try:
+        response = lm(prompt)
+        summary = response[0] if response else ""
+    except (BudgetExceededError, RunCancelledError):
+        raise
+    except Exception as e:
+        logger.warning(f"Could not summarize research chunk: {e}")
+        summary = ""
+    # A chunk that could not be summarized is truncated instead of dropped.
+    return summary or chunk[: max_tokens * CHARS_PER_TOKEN]
+
+
+def condense_research(
+    topic: str,
+    research: str,
+    lm,
+    token_budget: Optional[int] = None,
+    chunk_tokens: int = 1500,
+    max_workers: int = 4,
+    max_rounds: int = 3,
+) -> str:
+    """
+    Condenses research into a brief of at most token_budget tokens.
+
+    Args:
+        topic (str): The article topic, to keep summaries focused.
+        research (str): The collected research.
+        lm: The LM used to summarize chunks. Errors of single chunks are
+            logged and the chunk is truncated, except for exceeded run
+            budgets and cancelled runs, which are raised.
+        token_budget (int, optional): Defaults to research_token_budget(lm).
+        chunk_tokens (int): Size of the chunks summarized in one call.
+        max_workers (int): Chunks summarized in parallel.
+        max_rounds (int): Reduce rounds before the brief is truncated.
+
+    Returns:
+        str: The research unchanged if it already fits, otherwise the brief.
+    """
+    if token_budget is None:
+        token_budget = research_token_budget(lm)
+    chunk_tokens = min(chunk_tokens, max(token_budget, 256))
+
+    for round_number in range(1, max_rounds + 1):
+        if estimate_tokens(research) <= token_budget:
+            return research
+
+        chunks = chunk_text(research, chunk_tokens)
+        summary_tokens = max(64, token_budget // len(chunks))
+        logger.info(
+            f"Condensing research for '{topic}' (round {round_number}): "
+            f"{estimate_tokens(research)} tokens in {len(chunks)} chunks"
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                summaries = list(
+                    executor.map(
+                        lambda chunk: summarize_chunk(
+                            lm, topic, chunk, summary_tokens
+                        ),
+                        chunks,
+                    )
+                )
+            except (BudgetExceededError, RunCancelledError):
+                # Chunks that have not started yet are not summarized.
+                executor.shutdown(cancel_futures=True)
+                raise
+        condensed = "\n\n".join(summaries)
+        if len(condensed) >= len(research):
+            break
+        research = condensed
+
+    return research[: token_budget * CHARS_PER_TOKEN]
+
+
+def load_research_from_disk(article_output_dir: str) -> Optional[str]:
+    """
+    Rebuilds the research text from the conversation_log.json STORM writes
+    after the research stage.
+    """
+    log_path = os.path.join(article_output_dir, "conversation_log.json")
+    if not os.path.exists(log_path):
+        return None
+    try:
+        with open(log_path, "r", encoding="utf-8") as f:
+            conversations = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not read {log_path}: {e}")
+        return None
+
+    sections = []
+    for conversation in conversations:
+        turns = [
+            f"Q: {turn.get('user_utterance', '')}\nA: {turn.get('agent_utterance', '')}"
+            for turn in conversation.get("dlg_turns", [])
+        ]
+        if turns:
+            sections.append(
+                f"Perspective: {conversation.get('perspective', '')}\n"
+                + "\n\n".join(turns)
+            )
+    return "\n\n".join(sections) or None
@@ -0,0 +1,298 @@
+"""
+Cancellation support for STORM runs.
+
+A run gets a CancellationToken, which the run checks cooperatively (between
+dialogue turns, sections, pipeline stages and streamed chunks) and stops by
+raising RunCancelledError. LLM calls of a run are aborted as soon as its
+token is cancelled (see AbortableLM), so a run blocked on a slow request
+stops at once and frees its slot of the backend scheduler. A run blocked
+inside a search call stops once that call returns or times out. Batch topics
+run in their own processes and are killed outright by util.batch_runner (see
+stop_process).
+"""
+
+import time
+import threading
+import weakref
+import logging
+from typing import Callable, Dict, Optional
+
+from knowledge_storm.storm_wiki.modules.callback import BaseCallbackHandler
+
+from .lm_proxy import LMProxy
+from .token_accounting import report_history_entry, take_history_entry
+
+logger = logging.getLogger(__name__)
+
+
+class RunCancelledError(Exception):
+    """Raised inside a run once its cancellation token has been cancelled."""
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise RunCancelledError("Run was cancelled")
+
+
+# Seconds between two checks of the token while an LLM call is in flight.
+ABORT_POLL_INTERVAL = 0.1
+
+# The token of each run, by the run_id its LMs were built with. Entries go
+# away with the token once its run is finished.
+_run_tokens = weakref.WeakValueDictionary()
+
+
+def bind_cancellation_token(run_id: str, token: CancellationToken):
+    """Makes the LLM calls of run_id abort once token is cancelled."""
+    _run_tokens[run_id] = token
+
+
+def get_cancellation_token(run_id: str) -> Optional[CancellationToken]:
+    return _run_tokens.get(run_id)
+
+
+class AbortableLM(LMProxy):
+    """
+    LM wrapper that returns control as soon as the run is cancelled.
+
+    The request is sent from a worker thread while the caller waits for it or
+    for the token bound to run_id, whichever comes first. On cancellation the
+    caller raises RunCancelledError and releases its scheduler slot right
+    away; the abandoned request ends within the request timeout and its
+    outcome is discarded.
+    """
+
+    def __init__(self, lm, run_id: str):
+        super().__init__(lm)
+        self._run_id = run_id
+
+    def __call__(self, prompt, **kwargs):
+        token = get_cancellation_token(self._run_id)
+        if token is None:
+            return self._lm(prompt, **kwargs)
+        token.raise_if_cancelled()
+
+        outcome = {}
+        done = threading.Event()
+
+        def send():
+            try:
+                outcome["result"] = self._lm(prompt, **kwargs)
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                # The client reports the history entry on the thread that
+                # sent the request.
+                outcome["entry"] = take_history_entry()
+                done.set()
+
+        threading.Thread(
+            target=send, name=f"llm-call-{self._run_id}", daemon=True
+        ).start()
+        while not done.wait(ABORT_POLL_INTERVAL):
+            token = get_cancellation_token(self._run_id) or token
+            token.raise_if_cancelled()
+
+        report_history_entry(*outcome["entry"])
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+
+def abortable_lm(lm, run_id: str) -> AbortableLM:
+    """Wraps an LM so the calls of run_id abort once the run is cancelled."""
+    return AbortableLM(lm, run_id)
+
+
+def stop_process(process, grace_period: float = 5.0):
+    """Terminates a process, escalating to SIGKILL if it does not exit in time."""
+    if not process.is_alive():
+        return
+    process.terminate()
+    process.join(grace_period)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+
+class CancellableCallbackHandler(BaseCallbackHandler):
+    """Callback handler that checks a cancellation token at every STORM hook."""
+
+    def __init__(self, token: CancellationToken, callback_handler=None):
+        self.token = token
+        self.callback_handler = callback_handler or BaseCallbackHandler()
+
+    def _dispatch(self, hook: str, **kwargs):
+        self.token.raise_if_cancelled()
+        getattr(self.callback_handler, hook)(**kwargs)
+
+    def on_identify_perspective_start(self, **kwargs):
+        self._dispatch("on_identify_perspective_start", **kwargs)
+
+    def on_identify_perspective_end(self, perspectives: list[str], **kwargs):
+        self._dispatch(
+            "on_identify_perspective_end", perspectives=perspectives, **kwargs
+        )
+
+    def on_information_gathering_start(self, **kwargs):
+        self._dispatch("on_information_gathering_start", **kwargs)
+
+    def on_dialogue_turn_end(self, dlg_turn, **kwargs):
+        self._dispatch("on_dialogue_turn_end", dlg_turn=dlg_turn, **kwargs)
+
+    def on_information_gathering_end(self, **kwargs):
+        self._dispatch("on_information_gathering_end", **kwargs)
+
+    def on_information_organization_start(self, **kwargs):
+        self._dispatch("on_information_organization_start", **kwargs)
+
+    def on_direct_outline_generation_end(self, outline: str, **kwargs):
+        self._dispatch("on_direct_outline_generation_end", outline=outline, **kwargs)
+
+    def on_outline_refinement_end(self, outline: str, **kwargs):
+        self._dispatch("on_outline_refinement_end", outline=outline, **kwargs)
+
+    def on_section_written(self, **kwargs):
+        # Not a STORM hook: only forwarded to handlers that implement it.
+        self.token.raise_if_cancelled()
+        on_section_written = getattr(self.callback_handler, "on_section_written", None)
+        if on_section_written is not None:
+            on_section_written(**kwargs)
+
+
+def _checked(method, runner):
+    if getattr(method, "_cancellation_checked", False) is True:
+        return method
+
+    def checked(*args, **kwargs):
+        runner._cancellation_token.raise_if_cancelled()
+        return method(*args, **kwargs)
+
+    checked._cancellation_checked = True
+    return checked
+
+
+def install_cancellation_checks(runner, token: CancellationToken):
+    """
+    Makes a STORM runner check the token before writing each article section
+    and before each pipeline stage, and abort the in-flight LLM calls of its
+    run_id once the token is cancelled.
+
+    Installing again, e.g. for the next step of a runner kept in the session,
+    only replaces the token; the methods are wrapped once.
+    """
+    runner._cancellation_token = token
+    run_id = getattr(runner, "run_id", None)
+    if run_id is not None:
+        bind_cancellation_token(run_id, token)
+
+    article_generation = runner.storm_article_generation
+    article_generation.generate_section = _checked(
+        article_generation.generate_section, runner
+    )
+
+    for method_name in [
+        "run_knowledge_curation_module",
+        "run_outline_generation_module",
+        "run_article_generation_module",
+        "run_article_polishing_module",
+    ]:
+        setattr(runner, method_name, _checked(getattr(runner, method_name), runner))
+
+
+class BackgroundRun:
+    """A run executing on a worker thread, so it survives Streamlit reruns."""
+
+    def __init__(self, run_id: str, target: Callable, **kwargs):
+        self.run_id = run_id
+        self.token = CancellationToken()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.status = "running"
+        self.started_at = time.time()
+        self._target = target
+        self._kwargs = kwargs
+        self.thread = threading.Thread(
+            target=self._run, name=f"storm-run-{run_id}", daemon=True
+        )
+
+    def _run(self):
+        try:
+            self.result = self._target(cancellation_token=self.token, **self._kwargs)
+            self.status = "cancelled" if self.token.cancelled else "completed"
+        except RunCancelledError as e:
+            self.error = e
+            self.status = "cancelled"
+        except Exception as e:
+            logger.error(f"Run {self.run_id} failed: {e}", exc_info=True)
+            self.error = e
+            self.status = "cancelled" if self.token.cancelled else "failed"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the run to finish; returns True once it has."""
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
+
+    def cancel(self):
+        self.token.cancel()
+
+
+_runs: Dict[str, BackgroundRun] = {}
+_runs_lock = threading.Lock()
+
+
+def start_background_run(
+    run_id: str, target: Callable, thread_setup: Optional[Callable] = None, **kwargs
+) -> BackgroundRun:
+    """
+    Starts target(cancellation_token=..., **kwargs) on a worker thread, or
+    returns the run already registered under run_id.
+
+    Args:
+        thread_setup (callable, optional): Called with the worker thread before
+            it starts, e.g. to attach a Streamlit script run context.
+    """
+    with _runs_lock:
+        run = _runs.get(run_id)
+        if run is None:
+            run = BackgroundRun(run_id, target, **kwargs)
+            if thread_setup:
+                thread_setup(run.thread)
+            _runs[run_id] = run.start()
+        return run
+
+
+def get_background_run(run_id: str) -> Optional[BackgroundRun]:
+    with _runs_lock:
+        return _runs.get(run_id)
+
+
+def cancel_run(run_id: str) -> bool:
+    """Cancels the run registered under run_id; returns False if there is none."""
+    run = get_background_run(run_id)
+    if run is None:
+        return False
+    logger.info(f"Cancelling run {run_id}")
+    run.cancel()
+    return True
+
+
+def finish_background_run(run_id: str) -> Optional[BackgroundRun]:
+    """Removes a run from the registry once its result has been consumed."""
+    with _runs_lock:
+        return _runs.pop(run_id, None)
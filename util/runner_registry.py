@@ -0,0 +1,83 @@
+"""
+Process-level registry of reusable STORM components.
+
+LM clients and search retrievers are expensive to build (client setup, HTTP
+connection pools, parsing the perennial sources list), so they are built once
+per settings fingerprint and shared by every run in the process. A component
+is rebuilt only when the settings it was built from change.
+"""
+
+import json
+import hashlib
+import threading
+import logging
+from typing import Any, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def settings_fingerprint(*parts: Any) -> str:
+    """
+    Returns a stable hash of the given settings.
+
+    Dict key order does not affect the result, so settings loaded from the
+    database in a different order produce the same fingerprint.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ComponentRegistry:
+    """
+    Holds one component per slot together with the fingerprint it was built
+    from. Building happens under a per-slot lock so concurrent runs asking for
+    the same component share a single build.
+    """
+
+    def __init__(self):
+        self._components: Dict[str, Tuple[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._slot_locks: Dict[str, threading.Lock] = {}
+
+    def _slot_lock(self, slot: str) -> threading.Lock:
+        with self._lock:
+            return self._slot_locks.setdefault(slot, threading.Lock())
+
+    def get_or_create(self, slot: str, fingerprint: str, factory: Callable[[], Any]):
+        """
+        Returns the component stored in slot if it was built from the same
+        fingerprint, otherwise builds it with factory() and replaces it.
+
+        Args:
+            slot (str): Name of the component, e.g. "lm:openai".
+            fingerprint (str): Fingerprint of the settings the component uses.
+            factory (callable): Builds the component; exceptions propagate and
+                nothing is cached.
+        """
+        with self._slot_lock(slot):
+            cached = self._components.get(slot)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+
+            if cached is not None:
+                logger.info(f"Settings for {slot} changed, rebuilding")
+            else:
+                logger.info(f"Building {slot}")
+            component = factory()
+            self._components[slot] = (fingerprint, component)
+            return component
+
+    def invalidate(self, slot: str):
+        with self._slot_lock(slot):
+            self._components.pop(slot, None)
+
+    def clear(self):
+        with self._lock:
+            self._components.clear()
+
+    def slots(self):
+        with self._lock:
+            return sorted(self._components)
+
+
+registry = ComponentRegistry()
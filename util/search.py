@@ -9,7 +9,7 @@ import dspy
 import streamlit as st
 from langchain_community.utilities.duckduckgo_search import DuckDuckGoSearchAPIWrapper
 
-from pages_util.Settings import load_search_options
+from db.db_operations import load_search_options
 
 import logging
 
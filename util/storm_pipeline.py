@@ -0,0 +1,252 @@
+"""
+Overlapping of the STORM pipeline stages.
+
+STORMWikiRunner runs research, outline, article and polish strictly one after
+another. The hooks installed here start work as soon as its inputs exist:
+
+- The direct outline only needs the topic, so it is drafted from the model's
+  own knowledge while research runs, and the outline stage only refines it.
+- Sections are written on a bounded pool as soon as the outline exists, and
+  the lead section is written once half of them are done, overlapping the
+  remaining sections instead of waiting for the polish stage.
+"""
+
+import os
+import copy
+import math
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+import dspy
+from knowledge_storm.utils import ArticleTextProcessing
+
+from .token_accounting import stage_scope
+
+logger = logging.getLogger(__name__)
+
+# Share of the sections that must be written before the lead section is.
+LEAD_SECTION_START_FRACTION = 0.5
+
+
+def _run_in_thread(name: str, target, *args) -> Future:
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(target(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+
+def install_speculative_outline(runner):
+    """
+    Makes the runner draft the direct outline concurrently with the research
+    stage. The outline stage then waits for the draft and only runs the
+    refinement from the research conversations. If drafting fails, the
+    outline stage drafts it again itself.
+    """
+    write_outline = runner.storm_outline_generation_module.write_outline
+    forward = write_outline.forward
+    run_knowledge_curation_module = runner.run_knowledge_curation_module
+    drafts = {}
+
+    def draft_outline(topic):
+        with stage_scope("outline"), dspy.settings.context(lm=write_outline.engine):
+            outline = write_outline.draft_page_outline(topic=topic).outline
+        return ArticleTextProcessing.clean_up_outline(outline)
+
+    def speculative_curation(*args, **kwargs):
+        drafts[runner.topic] = _run_in_thread(
+            "speculative-outline", draft_outline, runner.topic
+        )
+        return run_knowledge_curation_module(*args, **kwargs)
+
+    def speculative_forward(
+        topic, dlg_history, old_outline=None, callback_handler=None
+    ):
+        draft = drafts.pop(topic, None)
+        if old_outline is None and draft is not None:
+            try:
+                old_outline = draft.result()
+            except Exception as e:
+                logger.warning(f"Speculative outline for '{topic}' failed: {e}")
+            else:
+                if callback_handler:
+                    callback_handler.on_direct_outline_generation_end(
+                        outline=old_outline
+                    )
+        return forward(
+            topic=topic,
+            dlg_history=dlg_history,
+            old_outline=old_outline,
+            callback_handler=callback_handler,
+        )
+
+    runner.run_knowledge_curation_module = speculative_curation
+    write_outline.forward = speculative_forward
+
+
+def sections_to_write(article_with_outline):
+    """
+    Returns (title, outline, queries) of every first-level section STORM
+    writes; introductions and conclusions are covered by the lead section.
+    """
+    sections = []
+    for title in article_with_outline.get_first_level_section_names():
+        name = title.lower().strip()
+        if name == "introduction" or name.startswith(("conclusion", "summary")):
+            continue
+        queries = article_with_outline.get_outline_as_list(
+            root_section_name=title, add_hashtags=False
+        )
+        outline = "\n".join(
+            article_with_outline.get_outline_as_list(
+                root_section_name=title, add_hashtags=True
+            )
+        )
+        sections.append((title, outline, queries))
+    return sections
+
+
+def _assemble_article(topic, article_with_outline, written_sections):
+    article = copy.deepcopy(article_with_outline)
+    for section in written_sections:
+        article.update_section(
+            parent_section_name=topic,
+            current_section_content=section["section_content"],
+            current_section_info_list=section["collected_info"],
+        )
+    article.post_processing()
+    return article
+
+
+def install_pipelined_writing(runner, max_workers=None):
+    """
+    Replaces the article and polish stages of the runner with a pipelined
+    version: sections are written max_workers at a time and reported to
+    callback_handler.on_section_written(section_name, completed, total) as
+    they finish, and the lead section is written next to the remaining
+    sections. The polish stage then only assembles the polished article
+    (and removes duplicates when asked to, which needs the whole page).
+    """
+    article_generation = runner.storm_article_generation
+    polish_page = runner.storm_article_polishing_module.polish_page
+    run_article_generation_module = runner.run_article_generation_module
+    run_article_polishing_module = runner.run_article_polishing_module
+    leads = {}
+
+    def write_lead(topic, draft_page):
+        with stage_scope("polish"), dspy.settings.context(
+            lm=polish_page.write_lead_engine
+        ):
+            lead = polish_page.write_lead(topic=topic, draft_page=draft_page)
+        lead_section = lead.lead_section
+        if "The lead section:" in lead_section:
+            lead_section = lead_section.split("The lead section:")[1].strip()
+        return lead_section
+
+    def write_section(*args):
+        # Pool threads also write the lead, which belongs to the polish stage.
+        with stage_scope("article"):
+            return article_generation.generate_section(*args)
+
+    def pipelined_generation(outline, information_table, callback_handler=None):
+        topic = runner.topic
+        sections = sections_to_write(outline) if outline is not None else []
+        if not sections:
+            return run_article_generation_module(
+                outline=outline,
+                information_table=information_table,
+                callback_handler=callback_handler,
+            )
+
+        information_table.prepare_table_for_retrieval()
+        on_section_written = getattr(callback_handler, "on_section_written", None)
+        lead_after = max(1, math.ceil(len(sections) * LEAD_SECTION_START_FRACTION))
+        executor = ThreadPoolExecutor(
+            max_workers=max_workers or article_generation.max_thread_num,
+            thread_name_prefix="storm-section",
+        )
+        written = []
+        futures = {}
+        try:
+            futures = {
+                executor.submit(
+                    write_section,
+                    topic,
+                    title,
+                    information_table,
+                    section_outline,
+                    queries,
+                ): title
+                for title, section_outline, queries in sections
+            }
+            for future in as_completed(futures):
+                written.append(future.result())
+                if on_section_written is not None:
+                    on_section_written(
+                        section_name=futures[future],
+                        completed=len(written),
+                        total=len(sections),
+                    )
+                if len(written) == lead_after:
+                    draft_page = _assemble_article(topic, outline, written).to_string()
+                    leads[topic] = executor.submit(write_lead, topic, draft_page)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            # The lead keeps running; the polish stage waits for it.
+            executor.shutdown(wait=False)
+
+        draft_article = _assemble_article(topic, outline, written)
+        draft_article.dump_article_as_plain_text(
+            os.path.join(runner.article_output_dir, "storm_gen_article.txt")
+        )
+        draft_article.dump_reference_to_file(
+            os.path.join(runner.article_output_dir, "url_to_info.json")
+        )
+        return draft_article
+
+    def pipelined_polishing(draft_article, remove_duplicate=False):
+        lead = leads.pop(runner.topic, None)
+        if lead is None:
+            return run_article_polishing_module(
+                draft_article=draft_article, remove_duplicate=remove_duplicate
+            )
+        try:
+            lead_section = lead.result()
+        except Exception as e:
+            logger.warning(f"Lead section for '{runner.topic}' failed: {e}")
+            return run_article_polishing_module(
+                draft_article=draft_article, remove_duplicate=remove_duplicate
+            )
+
+        page = draft_article.to_string()
+        if remove_duplicate:
+            with dspy.settings.context(lm=polish_page.polish_engine):
+                page = polish_page.polish_page(draft_page=page).page
+        polished_article = copy.deepcopy(draft_article)
+        polished_article.insert_or_create_section(
+            article_dict=ArticleTextProcessing.parse_article_into_dict(
+                "\n\n".join([f"# summary\n{lead_section}", page])
+            )
+        )
+        polished_article.post_processing()
+        with open(
+            os.path.join(runner.article_output_dir, "storm_gen_article_polished.txt"),
+            "w",
+            encoding="utf-8",
+        ) as f:
+            f.write(polished_article.to_string())
+        return polished_article
+
+    runner.run_article_generation_module = pipelined_generation
+    runner.run_article_polishing_module = pipelined_polishing
@@ -1,10 +1,10 @@
 import os
 import time
+import uuid
 import json
 import streamlit as st
 from typing import Optional, Dict, Any
 import logging
-import sqlite3
 import json
 import subprocess
 from dspy import Example
@@ -17,6 +17,35 @@ from knowledge_storm import (
 from knowledge_storm.lm import OpenAIModel, OllamaClient, ClaudeModel
 from .search import CombinedSearchAPI
 from .artifact_helpers import convert_txt_to_md
+from .runner_registry import registry, settings_fingerprint
+from .llm_scheduler import schedule_lm, get_scheduler_metrics, suggest_concurrency
+from .prompt_caching import enable_prompt_caching
+from .llm_coalescing import coalesce_lm, get_coalescing_metrics
+from .llm_retry import (
+    with_retries,
+    apply_request_timeout,
+    disable_client_retries,
+    request_timeout,
+)
+from .llm_streaming import supports_streaming, stream_to_file
+from .ollama_residency import warm_up_models
+from .storm_pipeline import install_speculative_outline, install_pipelined_writing
+from .research_condenser import condense_research, load_research_from_disk
+from .token_accounting import (
+    AccountingLM,
+    BudgetExceededError,
+    RunAccounting,
+    install_stage_tracking,
+    write_run_metrics,
+)
+from .consts import LLM_MODELS, RUN_BUDGET_DEFAULTS, STORM_PARALLELISM_DEFAULTS
+from .run_control import (
+    RunCancelledError,
+    CancellableCallbackHandler,
+    install_cancellation_checks,
+    abortable_lm,
+)
+from knowledge_storm.storm_wiki.modules.callback import BaseCallbackHandler
 from pages_util.Settings import (
     load_llm_settings,
     load_search_options,
@@ -95,12 +124,20 @@ def run_storm_with_fallback(
     callback_handler=None,
     runner=None,
     fallback_lm=None,
+    cancellation_token=None,
 ):
     log_progress(callback_handler, "Starting STORM process...")
 
     if runner is None:
         raise ValueError("Runner is not initialized")
 
+    storm_callback_handler = callback_handler or BaseCallbackHandler()
+    if cancellation_token is not None:
+        install_cancellation_checks(runner, cancellation_token)
+        storm_callback_handler = CancellableCallbackHandler(
+            cancellation_token, storm_callback_handler
+        )
+
     try:
         runner.run(
             topic=topic,
@@ -108,17 +145,34 @@ def run_storm_with_fallback(
             do_generate_outline=True,
             do_generate_article=True,
             do_polish_article=True,
+            callback_handler=storm_callback_handler,
         )
+    except RunCancelledError:
+        logger.info(f"STORM process for '{topic}' was cancelled")
+        raise
+    except BudgetExceededError as e:
+        logger.warning(f"STORM process for '{topic}' was aborted: {e}")
+        raise
     except Exception as e:
         logger.error(f"Error during STORM process: {str(e)}")
         log_progress(callback_handler, "Attempting to use fallback LLM...")
 
+        accounting = get_run_accounting(runner)
+        if accounting is not None:
+            accounting.stage = "fallback"
+
         existing_info = collect_existing_information(runner)
 
         try:
             if fallback_lm is None:
                 raise ValueError("Fallback LLM is not configured")
-            fallback_result = use_fallback_llm(topic, existing_info, fallback_lm)
+            fallback_result = use_fallback_llm(
+                topic,
+                existing_info,
+                fallback_lm,
+                output_path=fallback_result_path(current_working_dir, topic),
+                on_chunk=fallback_chunk_handler(callback_handler, cancellation_token),
+            )
             write_fallback_result(fallback_result, current_working_dir, topic)
             log_progress(
                 callback_handler, "Fallback LLM successfully generated content."
@@ -134,16 +188,75 @@ def run_storm_with_fallback(
             raise
     finally:
         runner.post_run()
+        save_run_metrics(runner)
+        logger.info(f"LLM scheduler metrics: {get_scheduler_metrics()}")
+        logger.info(f"LLM coalescing metrics: {get_coalescing_metrics()}")
 
     return runner
 
 
-def use_fallback_llm(topic, existing_info, fallback_lm):
+def get_run_accounting(runner) -> Optional[RunAccounting]:
+    accounting = getattr(runner, "run_accounting", None)
+    return accounting if isinstance(accounting, RunAccounting) else None
+
+
+def save_run_metrics(runner) -> Optional[str]:
+    """
+    Writes the token and latency accounting of the runner's run to
+    run_metrics.json in its article directory, if the run got that far.
+    """
+    accounting = get_run_accounting(runner)
+    article_output_dir = getattr(runner, "article_output_dir", None)
+    if accounting is None or not isinstance(article_output_dir, str):
+        return None
+    try:
+        return write_run_metrics(accounting, article_output_dir)
+    except OSError as e:
+        logger.warning(f"Could not write run metrics: {e}")
+        return None
+
+
+def fallback_chunk_handler(callback_handler=None, cancellation_token=None):
+    """
+    Returns the on_chunk callback for a streamed fallback article: it stops
+    the stream once the run is cancelled and forwards the text generated so
+    far to callback_handler.on_fallback_chunk, if the handler has one.
+    """
+    on_fallback_chunk = getattr(callback_handler, "on_fallback_chunk", None)
+    if on_fallback_chunk is None and cancellation_token is None:
+        return None
+
+    def on_chunk(text):
+        if cancellation_token is not None:
+            cancellation_token.raise_if_cancelled()
+        if on_fallback_chunk is not None:
+            on_fallback_chunk(text)
+
+    return on_chunk
+
+
+def use_fallback_llm(
+    topic, existing_info, fallback_lm, output_path=None, on_chunk=None
+):
+    """
+    Writes the article with the fallback LM from whatever STORM produced.
+
+    Research that does not fit the fallback model's context is condensed
+    first. LMs that support streaming append each chunk to output_path as it
+    arrives and report the text so far to on_chunk(text); other LMs return
+    the whole article in one call.
+    """
+    research = existing_info.get("research", "No research available")
+    if research:
+        # Condensed with the fallback LM as well: the primary LM just failed,
+        # and no faster model is configured.
+        research = condense_research(topic, str(research), fallback_lm)
+
     prompt = f"""
     Topic: {topic}
 
     Research Results:
-    {existing_info.get('research', 'No research available')}
+    {research}
 
     Outline:
     {existing_info.get('outline') if existing_info.get('outline') is not None else 'No outline available'}
@@ -156,6 +269,10 @@ def use_fallback_llm(topic, existing_info, fallback_lm):
     """
 
     try:
+        if supports_streaming(fallback_lm):
+            return stream_to_file(
+                fallback_lm, prompt, output_path=output_path, on_chunk=on_chunk
+            )
         response = fallback_lm(prompt)
         return response[0] if response else ""
     except openai.NotFoundError as e:
@@ -171,17 +288,24 @@ def use_fallback_llm(topic, existing_info, fallback_lm):
         raise
 
 
+def fallback_result_path(current_working_dir, topic):
+    return os.path.join(current_working_dir, f"{topic.replace(' ', '_')}.md")
+
+
 def write_fallback_result(fallback_result, current_working_dir, topic):
-    file_path = os.path.join(current_working_dir, f"{topic.replace(' ', '_')}.md")
+    file_path = fallback_result_path(current_working_dir, topic)
     with open(file_path, "w") as f:
         f.write(fallback_result)
 
 
 def collect_existing_information(runner):
+    research = runner.research_results if hasattr(runner, "research_results") else None
+    article_output_dir = getattr(runner, "article_output_dir", None)
+    if research is None and isinstance(article_output_dir, str):
+        research = load_research_from_disk(article_output_dir)
+
     existing_info = {
-        "research": runner.research_results
-        if hasattr(runner, "research_results")
-        else None,
+        "research": research,
         "outline": runner.outline if hasattr(runner, "outline") else None,
         "partial_article": runner.partial_article
         if hasattr(runner, "partial_article")
@@ -300,22 +424,129 @@ def create_lm_client(
             raise
 
 
-def run_storm_with_config(
-    topic: str,
+def get_lm_client(model_type, model_settings):
+    """
+    Returns a shared LM client for model_type, creating it only the first time
+    it is requested with these settings.
+    """
+    fingerprint = settings_fingerprint(
+        model_type,
+        (model_settings or {}).get(model_type),
+        os.getenv(LLM_MODELS.get(model_type) or "", ""),
+    )
+    return registry.get_or_create(
+        f"lm:{model_type}",
+        fingerprint,
+        lambda: enable_prompt_caching(
+            disable_client_retries(
+                apply_request_timeout(
+                    create_lm_client(
+                        model_type, fallback=False, model_settings=model_settings
+                    ),
+                    model_type,
+                    request_timeout(model_type, model_settings),
+                ),
+                model_type,
+            ),
+            model_type,
+        ),
+    )
+
+
+def get_retriever(search_options, max_results):
+    """
+    Returns a shared CombinedSearchAPI, rebuilt only when the search options
+    change.
+    """
+    fingerprint = settings_fingerprint(search_options, max_results)
+    return registry.get_or_create(
+        "retriever",
+        fingerprint,
+        lambda: CombinedSearchAPI(max_results=max_results),
+    )
+
+
+def build_run_lm(model_type, model_settings, run_id):
+    """
+    Wraps the shared client of model_type for one run: every call is retried
+    on transient errors, identical in-flight requests of all runs are sent
+    once, every request that is sent goes through the backend scheduler, and
+    is aborted once the run is cancelled.
+    """
+    client = get_lm_client(model_type, model_settings)
+    return with_retries(
+        coalesce_lm(
+            schedule_lm(abortable_lm(client, run_id), model_type, run_id),
+            model_type,
+        ),
+        model_type,
+        model_settings,
+    )
+
+
+def get_storm_parallelism(llm_settings: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **STORM_PARALLELISM_DEFAULTS,
+        **(llm_settings.get("storm_parallelism") or {}),
+    }
+
+
+def resolve_storm_parallelism(llm_settings: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Returns the max_conv_turn, max_perspective and max_thread_num of a run.
+
+    With auto_tune, max_thread_num follows the primary backend's scheduler:
+    more threads than the backend accepts requests would only queue, fewer
+    would leave it idle.
+    """
+    parallelism = get_storm_parallelism(llm_settings)
+    max_thread_num = parallelism["max_thread_num"]
+    if parallelism["auto_tune"]:
+        max_thread_num = suggest_concurrency(llm_settings["primary_model"])
+        logger.info(f"Auto-tuned STORM thread count: {max_thread_num}")
+    return {
+        "max_conv_turn": parallelism["max_conv_turn"],
+        "max_perspective": parallelism["max_perspective"],
+        "max_thread_num": max(1, max_thread_num),
+    }
+
+
+def build_storm_runner(
     current_working_dir: str,
-    callback_handler=None,
+    llm_settings: Dict[str, Any],
+    search_options: Dict[str, Any],
+    update_progress=None,
+    run_id: Optional[str] = None,
 ):
-    progress_placeholder = st.empty()
-
-    def update_progress(message):
-        progress_placeholder.write(message)
-        if callback_handler:
-            callback_handler.on_information_gathering_start(message=message)
-        logger.info(message)
+    """
+    Builds a STORM runner and the fallback LM from stored settings.
+
+    LM clients and the retriever come from the process-level registry and are
+    shared between runs. The runner itself holds per-run state (output
+    directory, cancellation checks) and is built for every run; the LM call
+    history and usage it collects are kept per run by the AccountingLMs.
+    Both LMs retry transient errors, and their requests go through the
+    per-backend scheduler under run_id. Every call is recorded on the
+    RunAccounting attached to the runner as runner.run_accounting, which
+    enforces the run budgets from llm_settings["run_budgets"]. The pipeline
+    parallelism comes from llm_settings["storm_parallelism"].
+
+    Args:
+        current_working_dir (str): The output directory for the runner.
+        llm_settings (dict): The LLM settings as returned by load_llm_settings().
+        search_options (dict): The search options as returned by load_search_options().
+        update_progress (callable, optional): Called with a status message per step.
+        run_id (str, optional): Identifies the run to the LLM scheduler so
+            queued requests are served fairly between runs.
+
+    Returns:
+        tuple: The configured STORMWikiRunner and the fallback LM (or None).
+    """
+    if update_progress is None:
+        update_progress = logger.info
+    if run_id is None:
+        run_id = uuid.uuid4().hex
 
-    update_progress("Loading configurations...")
-    llm_settings = load_llm_settings()
-    search_options = load_search_options()
     search_top_k = search_options["search_top_k"]
     retrieve_top_k = search_options["retrieve_top_k"]
 
@@ -328,57 +559,106 @@ def run_storm_with_config(
 
     llm_configs = STORMWikiLMConfigs()
 
-    try:
-        primary_lm = create_lm_client(
-            primary_model,
-            fallback=False,
-            model_settings=model_settings,
-        )
+    budgets = {**RUN_BUDGET_DEFAULTS, **(llm_settings.get("run_budgets") or {})}
+    accounting = RunAccounting(run_id, budgets)
 
-        fallback_lm = None
-        if fallback_model:
-            fallback_lm = create_lm_client(
-                fallback_model,
-                fallback=False,
-                model_settings=model_settings,
-            )
+    primary_lm = AccountingLM(
+        build_run_lm(primary_model, model_settings, run_id),
+        accounting,
+        primary_model,
+    )
 
-        for lm_type in [
-            "conv_simulator",
-            "question_asker",
-            "outline_gen",
-            "article_gen",
-            "article_polish",
-        ]:
-            getattr(llm_configs, f"set_{lm_type}_lm")(primary_lm)
-    except Exception as e:
-        logger.error(f"Error setting up LLM: {str(e)}", exc_info=True)
-        st.error(f"Failed to set up LLM: {str(e)}")
-        return None
+    fallback_lm = None
+    if fallback_model:
+        fallback_lm = AccountingLM(
+            build_run_lm(fallback_model, model_settings, run_id),
+            accounting,
+            fallback_model,
+        )
+    accounting.downgrade_lm = fallback_lm
+
+    for lm_type in [
+        "conv_simulator",
+        "question_asker",
+        "outline_gen",
+        "article_gen",
+        "article_polish",
+    ]:
+        getattr(llm_configs, f"set_{lm_type}_lm")(primary_lm)
 
     update_progress("Setting up search engine...")
     engine_args = STORMWikiRunnerArguments(
         output_dir=current_working_dir,
-        max_conv_turn=3,
-        max_perspective=3,
         search_top_k=search_top_k,
         retrieve_top_k=retrieve_top_k,
+        **resolve_storm_parallelism(llm_settings),
     )
 
-    rm = CombinedSearchAPI(max_results=engine_args.search_top_k)
+    rm = get_retriever(search_options, engine_args.search_top_k)
 
     update_progress("Initializing STORM runner...")
     runner = STORMWikiRunner(engine_args, llm_configs, rm)
 
     add_examples_to_runner(runner)
+    parallelism = get_storm_parallelism(llm_settings)
+    if parallelism["pipelined_writing"]:
+        install_pipelined_writing(runner)
+    install_stage_tracking(runner, accounting)
+    if parallelism["speculative_outline"]:
+        install_speculative_outline(runner)
+    runner.run_accounting = accounting
+    # Binds the LLM calls of the run to its cancellation token.
+    runner.run_id = run_id
 
-    result = run_storm_with_fallback(
-        topic=topic,
-        current_working_dir=current_working_dir,
-        callback_handler=callback_handler,
-        runner=runner,
-        fallback_lm=fallback_lm,
-    )
+    return runner, fallback_lm
+
+
+def run_storm_with_config(
+    topic: str,
+    current_working_dir: str,
+    callback_handler=None,
+    cancellation_token=None,
+):
+    progress_placeholder = st.empty()
+
+    def update_progress(message):
+        progress_placeholder.write(message)
+        if callback_handler:
+            callback_handler.on_information_gathering_start(message=message)
+        logger.info(message)
+
+    update_progress("Loading configurations...")
+    llm_settings = load_llm_settings()
+    search_options = load_search_options()
+    warm_up_models(llm_settings)
+
+    try:
+        runner, fallback_lm = build_storm_runner(
+            current_working_dir,
+            llm_settings,
+            search_options,
+            update_progress=update_progress,
+        )
+    except Exception as e:
+        logger.error(f"Error setting up LLM: {str(e)}", exc_info=True)
+        st.error(f"Failed to set up LLM: {str(e)}")
+        return None
+
+    if cancellation_token is not None:
+        cancellation_token.raise_if_cancelled()
+
+    try:
+        result = run_storm_with_fallback(
+            topic=topic,
+            current_working_dir=current_working_dir,
+            callback_handler=callback_handler,
+            runner=runner,
+            fallback_lm=fallback_lm,
+            cancellation_token=cancellation_token,
+        )
+    finally:
+        # The run's requests reset the keep-alive to Ollama's default.
+        warm_up_models(llm_settings, force=True)
 
     update_progress("STORM process completed.")
     return result
@@ -1,8 +1,6 @@
 import streamlit as st
-import sqlite3
 import json
 from .consts import (
-    DB_PATH,
     THEME_CSS_TEMPLATE,
     GLOBAL_CSS_TEMPLATE,
     MY_ARTICLES_CSS_TEMPLATE,
@@ -11,7 +9,7 @@ from .consts import (
     ALL_CUSTOM_CSS_TEMPLATE,
     TOKYO_NIGHT,
 )
-from db.db_operations import save_setting, load_setting
+from db.settings_store import save_setting, load_setting
 
 
 def save_theme(theme):
@@ -0,0 +1,483 @@
+"""
+Per-run accounting of LLM usage.
+
+Every LM call of a run goes through an AccountingLM, which records the stage,
+backend, model, prompt/completion tokens and latency of the call on the run's
+RunAccounting. The records are written to run_metrics.json next to the
+article, and the optional run budgets (tokens, calls, wall time) are enforced
+before each call by either aborting the run or downgrading it to the fallback
+LM.
+
+LM clients are shared between runs, so the AccountingLM also keeps the run's
+own LM call history and token usage, which dspy and knowledge_storm would
+otherwise read from and reset on the shared client.
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .lm_proxy import LMProxy
+
+logger = logging.getLogger(__name__)
+
+RUN_METRICS_FILE = "run_metrics.json"
+CHARS_PER_TOKEN = 4
+# Entries kept in the history of a shared LM client; each run keeps its own.
+SHARED_HISTORY_LIMIT = 200
+
+STAGE_METHODS = {
+    "run_knowledge_curation_module": "research",
+    "run_outline_generation_module": "outline",
+    "run_article_generation_module": "article",
+    "run_article_polishing_module": "polish",
+}
+
+
+class BudgetExceededError(Exception):
+    """Raised when a run exceeds one of its budgets and must be aborted."""
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN
+
+
+_cache_usage = threading.local()
+
+
+def report_cache_usage(cache_read_tokens: int, cache_write_tokens: int):
+    """
+    Reports prompt-cache reads and writes of a request made on this thread
+    by a backend whose client history does not keep them (Anthropic), to be
+    recorded on the call by the AccountingLM that is waiting for it.
+    """
+    usage = getattr(_cache_usage, "usage", None) or {
+        "cache_read_tokens": 0,
+        "cache_write_tokens": 0,
+    }
+    usage["cache_read_tokens"] += cache_read_tokens
+    usage["cache_write_tokens"] += cache_write_tokens
+    _cache_usage.usage = usage
+
+
+def _take_cache_usage() -> Optional[Dict[str, int]]:
+    usage = getattr(_cache_usage, "usage", None)
+    _cache_usage.usage = None
+    return usage
+
+
+_history_entry = threading.local()
+
+
+def report_history_entry(entry: Optional[Dict[str, Any]], shared: bool = False):
+    """
+    Reports the history entry of the request made on this thread, to be
+    recorded by the AccountingLM that is waiting for it. shared is True when
+    the entry belongs to a request another caller sent (util.llm_coalescing).
+    """
+    _history_entry.entry = entry
+    _history_entry.shared = shared
+
+
+def take_history_entry() -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Returns and clears the entry reported on this thread and if it is shared."""
+    entry = getattr(_history_entry, "entry", None)
+    shared = getattr(_history_entry, "shared", False)
+    _history_entry.entry = None
+    _history_entry.shared = False
+    return entry, shared
+
+
+class ReportingHistory(list):
+    """
+    History list of a shared LM client. dspy and knowledge_storm append the
+    entry of a request on the thread that made it, so appending reports the
+    entry to that thread instead of it being searched for afterwards. Only
+    the latest SHARED_HISTORY_LIMIT entries are kept; each run keeps its own.
+    """
+
+    def append(self, entry):
+        super().append(entry)
+        report_history_entry(entry)
+        if len(self) > SHARED_HISTORY_LIMIT:
+            del self[: len(self) - SHARED_HISTORY_LIMIT]
+
+
+_history_lock = threading.Lock()
+
+
+def _install_reporting_history(client):
+    with _history_lock:
+        history = getattr(client, "history", None)
+        if isinstance(history, list) and not isinstance(history, ReportingHistory):
+            client.history = ReportingHistory(history[-SHARED_HISTORY_LIMIT:])
+
+
+def extract_usage(
+    entry: Optional[Dict[str, Any]], prompt: str, completions
+) -> Dict[str, int]:
+    """
+    Returns the prompt and completion tokens of the call that produced
+    completions, read from its history entry. When there is no entry or the
+    backend reported no usage, the counts are estimated from the text.
+    """
+    if isinstance(entry, dict):
+        response = entry.get("response")
+        usage = (
+            response.get("usage")
+            if isinstance(response, dict)
+            else getattr(response, "usage", None)
+        )
+        if isinstance(usage, dict) and "prompt_tokens" in usage:
+            result = {
+                "prompt_tokens": int(usage.get("prompt_tokens") or 0),
+                "completion_tokens": int(usage.get("completion_tokens") or 0),
+            }
+            # OpenAI reports the automatically cached prefix separately.
+            details = usage.get("prompt_tokens_details") or {}
+            if details.get("cached_tokens"):
+                result["cache_read_tokens"] = int(details["cached_tokens"])
+            return result
+        if isinstance(usage, dict) and "input_tokens" in usage:
+            return {
+                "prompt_tokens": int(usage.get("input_tokens") or 0),
+                "completion_tokens": int(usage.get("output_tokens") or 0),
+            }
+        if hasattr(usage, "input_tokens"):
+            return {
+                "prompt_tokens": int(usage.input_tokens or 0),
+                "completion_tokens": int(usage.output_tokens or 0),
+            }
+
+    text = "".join(c if isinstance(c, str) else str(c) for c in completions or [])
+    return {
+        "prompt_tokens": _estimate_tokens(prompt),
+        "completion_tokens": _estimate_tokens(text),
+    }
+
+
+_stage = threading.local()
+
+
+@contextmanager
+def stage_scope(name: str):
+    """
+    Labels the LM calls made on this thread inside the block with stage
+    name, e.g. work of a later stage started while an earlier one still
+    runs. Other threads keep the stage of their run.
+    """
+    previous = getattr(_stage, "name", None)
+    _stage.name = name
+    try:
+        yield
+    finally:
+        _stage.name = previous
+
+
+class RunAccounting:
+    def __init__(self, run_id: str, budgets: Optional[Dict[str, Any]] = None):
+        self.run_id = run_id
+        self.budgets = budgets or {}
+        self.stage = "setup"
+        self.started_at = time.time()
+        self.downgraded = False
+        self.downgrade_lm = None
+        # The run's LM call history, as dspy clients keep it.
+        self.history: List[Dict[str, Any]] = []
+        self._records: List[Dict[str, Any]] = []
+        self._usage_reported = 0
+        self._lock = threading.Lock()
+
+    @property
+    def on_exceed(self) -> str:
+        return self.budgets.get("on_exceed", "abort")
+
+    def record(
+        self,
+        backend: str,
+        model: str,
+        usage: Dict[str, int],
+        latency_s: float,
+        ok: bool,
+    ):
+        with self._lock:
+            self._records.append(
+                {
+                    "stage": getattr(_stage, "name", None) or self.stage,
+                    "backend": backend,
+                    "model": model,
+                    "prompt_tokens": usage.get("prompt_tokens", 0),
+                    "completion_tokens": usage.get("completion_tokens", 0),
+                    "cache_read_tokens": usage.get("cache_read_tokens", 0),
+                    "cache_write_tokens": usage.get("cache_write_tokens", 0),
+                    "latency_s": round(latency_s, 3),
+                    "ok": ok,
+                }
+            )
+
+    def add_history(self, entry: Dict[str, Any]):
+        with self._lock:
+            self.history.append(entry)
+
+    def usage_and_reset(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns the prompt and completion tokens per model recorded since the
+        last call, as knowledge_storm's get_usage_and_reset() does.
+        """
+        usage: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            records = self._records[self._usage_reported :]
+            self._usage_reported = len(self._records)
+        for record in records:
+            tokens = usage.setdefault(
+                record["model"], {"prompt_tokens": 0, "completion_tokens": 0}
+            )
+            tokens["prompt_tokens"] += record["prompt_tokens"]
+            tokens["completion_tokens"] += record["completion_tokens"]
+        return usage
+
+    def totals(self) -> Dict[str, Any]:
+        with self._lock:
+            records = list(self._records)
+        return {
+            "calls": len(records),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in records),
+            "completion_tokens": sum(r["completion_tokens"] for r in records),
+            "total_tokens": sum(
+                r["prompt_tokens"] + r["completion_tokens"] for r in records
+            ),
+            "cache_read_tokens": sum(r["cache_read_tokens"] for r in records),
+            "cache_write_tokens": sum(r["cache_write_tokens"] for r in records),
+            "latency_s": round(sum(r["latency_s"] for r in records), 3),
+            "duration_s": round(time.time() - self.started_at, 3),
+        }
+
+    def exceeded_budget(self) -> Optional[str]:
+        """Returns a description of the first exceeded budget, if any."""
+        totals = self.totals()
+        limits = [
+            ("max_total_tokens", totals["total_tokens"], "tokens"),
+            ("max_llm_calls", totals["calls"], "LLM calls"),
+            ("max_duration_s", totals["duration_s"], "seconds"),
+        ]
+        for key, used, unit in limits:
+            limit = self.budgets.get(key) or 0
+            if limit and used >= limit:
+                return f"Run budget exceeded: {used} of {limit} {unit}"
+        return None
+
+    def check_budget(self):
+        """
+        Enforces the budgets before a call: raises BudgetExceededError, or
+        switches the run to its downgrade LM once when configured to.
+        """
+        reason = self.exceeded_budget()
+        if reason is None or self.downgraded:
+            return
+        if self.on_exceed == "downgrade" and self.downgrade_lm is not None:
+            logger.warning(f"{reason}; switching run {self.run_id} to the fallback LM")
+            self.downgraded = True
+            return
+        raise BudgetExceededError(reason)
+
+    def _group(self, key: str) -> Dict[str, Dict[str, Any]]:
+        groups = defaultdict(
+            lambda: {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cache_read_tokens": 0,
+                "cache_write_tokens": 0,
+                "latency_s": 0.0,
+            }
+        )
+        with self._lock:
+            for record in self._records:
+                group = groups[record[key]]
+                group["calls"] += 1
+                group["prompt_tokens"] += record["prompt_tokens"]
+                group["completion_tokens"] += record["completion_tokens"]
+                group["cache_read_tokens"] += record["cache_read_tokens"]
+                group["cache_write_tokens"] += record["cache_write_tokens"]
+                group["latency_s"] = round(group["latency_s"] + record["latency_s"], 3)
+        return dict(groups)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "downgraded": self.downgraded,
+            "budgets": self.budgets,
+            "totals": self.totals(),
+            "by_stage": self._group("stage"),
+            "by_backend": self._group("backend"),
+        }
+
+
+class AccountingLM(LMProxy):
+    """
+    LM wrapper recording every call of a run on its RunAccounting. Its
+    history and get_usage_and_reset() cover this run only, not the other
+    runs of the shared client.
+    """
+
+    def __init__(self, lm, accounting: RunAccounting, backend: str):
+        super().__init__(lm)
+        self._accounting = accounting
+        self._backend = backend
+        _install_reporting_history(self.unwrap())
+
+    @property
+    def history(self) -> List[Dict[str, Any]]:
+        return self._accounting.history
+
+    @history.setter
+    def history(self, history: List[Dict[str, Any]]):
+        self._accounting.history = list(history)
+
+    def __setattr__(self, name, value):
+        if name == "history":
+            object.__setattr__(self, name, value)
+        else:
+            super().__setattr__(name, value)
+
+    def get_usage_and_reset(self) -> Dict[str, Dict[str, int]]:
+        return self._accounting.usage_and_reset()
+
+    def _target(self):
+        self._accounting.check_budget()
+        if self._accounting.downgraded and self._accounting.downgrade_lm is not None:
+            return self._accounting.downgrade_lm
+        return self
+
+    def _model_name(self) -> str:
+        client = self.unwrap()
+        kwargs = getattr(client, "kwargs", None)
+        model = kwargs.get("model") if isinstance(kwargs, dict) else None
+        return str(model or getattr(client, "model_name", "") or "")
+
+    def __call__(self, prompt, **kwargs):
+        target = self._target()
+        if target is not self:
+            return target(prompt, **kwargs)
+
+        _take_cache_usage()
+        take_history_entry()
+        started = time.monotonic()
+        try:
+            completions = self._lm(prompt, **kwargs)
+        except Exception:
+            self._accounting.record(
+                self._backend,
+                self._model_name(),
+                {"prompt_tokens": _estimate_tokens(prompt), "completion_tokens": 0},
+                time.monotonic() - started,
+                ok=False,
+            )
+            raise
+        entry, shared = take_history_entry()
+        if entry is not None:
+            self._accounting.add_history(entry)
+        if shared:
+            # The tokens were spent by the caller that sent the request.
+            usage = {"prompt_tokens": 0, "completion_tokens": 0}
+        else:
+            usage = extract_usage(entry, prompt, completions)
+        cache_usage = _take_cache_usage()
+        if cache_usage:
+            # Anthropic counts cached prompt tokens apart from input_tokens.
+            usage["prompt_tokens"] += (
+                cache_usage["cache_read_tokens"] + cache_usage["cache_write_tokens"]
+            )
+            usage.update(cache_usage)
+        self._accounting.record(
+            self._backend,
+            self._model_name(),
+            usage,
+            time.monotonic() - started,
+            ok=True,
+        )
+        return completions
+
+    def stream(self, prompt, **kwargs):
+        target = self._target()
+        if target is not self:
+            yield from target.stream(prompt, **kwargs)
+            return
+
+        started = time.monotonic()
+        text = ""
+        ok = False
+        try:
+            for chunk in super().stream(prompt, **kwargs):
+                text += chunk
+                yield chunk
+            ok = True
+        finally:
+            self._accounting.record(
+                self._backend,
+                self._model_name(),
+                {
+                    "prompt_tokens": _estimate_tokens(prompt),
+                    "completion_tokens": _estimate_tokens(text),
+                },
+                time.monotonic() - started,
+                ok=ok,
+            )
+
+
+def install_stage_tracking(runner, accounting: RunAccounting):
+    """
+    Labels the calls made by each STORM pipeline stage with its name. The
+    run's stage is what the worker threads a stage starts record; the thread
+    running the stage is labelled by stage_scope, so work that overlaps
+    other stages labels itself the same way (see util.storm_pipeline).
+    """
+    for method_name, stage_name in STAGE_METHODS.items():
+        stage = getattr(runner, method_name)
+
+        def tracked_stage(*args, _stage=stage, _name=stage_name, **kwargs):
+            accounting.stage = _name
+            with stage_scope(_name):
+                return _stage(*args, **kwargs)
+
+        setattr(runner, method_name, tracked_stage)
+
+
+def write_run_metrics(accounting: RunAccounting, article_output_dir: str) -> str:
+    """Writes the run summary to run_metrics.json in the article directory."""
+    os.makedirs(article_output_dir, exist_ok=True)
+    path = os.path.join(article_output_dir, RUN_METRICS_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(accounting.summary(), f, indent=2)
+    return path
+
+
+def load_all_run_metrics(root_dir: str) -> List[Dict[str, Any]]:
+    """
+    Collects every run_metrics.json below root_dir (categories/articles),
+    adding the category and article each belongs to.
+    """
+    metrics = []
+    if not os.path.isdir(root_dir):
+        return metrics
+    for dirpath, _, filenames in os.walk(root_dir):
+        if RUN_METRICS_FILE not in filenames:
+            continue
+        try:
+            with open(os.path.join(dirpath, RUN_METRICS_FILE), encoding="utf-8") as f:
+                run = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Skipping unreadable metrics in {dirpath}: {e}")
+            continue
+        relative = os.path.relpath(dirpath, root_dir).split(os.sep)
+        run["article"] = relative[-1]
+        run["category"] = relative[0] if len(relative) > 1 else ""
+        metrics.append(run)
+    return metrics
@@ -1,7 +1,6 @@
 import streamlit as st
 from .file_io import FileIOHelper
 from .text_processing import DemoTextProcessingHelper
-from knowledge_storm.storm_wiki.modules.callback import BaseCallbackHandler
 import unidecode
 import logging
 import os
@@ -260,55 +259,3 @@ class UIComponents:
         st.markdown(get_my_articles_css(current_theme), unsafe_allow_html=True)
         st.markdown(get_form_submit_button_css(current_theme), unsafe_allow_html=True)
 
-
-class StreamlitCallbackHandler(BaseCallbackHandler):
-    def __init__(self, status_container):
-        self.status_container = status_container
-
-    def on_information_gathering_start(self, message, **kwargs):
-        self.status_container.info(message)
-
-    def on_identify_perspective_start(self, **kwargs):
-        self.status_container.info(
-            "Start identifying different perspectives for researching the topic."
-        )
-
-    def on_identify_perspective_end(self, perspectives: list[str], **kwargs):
-        perspective_list = "\n- ".join(perspectives)
-        self.status_container.success(
-            f"Finish identifying perspectives. Will now start gathering information"
-            f" from the following perspectives:\n- {perspective_list}"
-        )
-
-    def on_dialogue_turn_end(self, dlg_turn, **kwargs):
-        urls = list(set([r.url for r in dlg_turn.search_results]))
-        for url in urls:
-            self.status_container.markdown(
-                f"""
-                    <style>
-                    .small-font {{
-                        font-size: 14px;
-                        margin: 0px;
-                        padding: 0px;
-                    }}
-                    </style>
-                    <div class="small-font">Finish browsing <a href="{url}" class="small-font" target="_blank">{url}</a>.</div>
-                    """,
-                unsafe_allow_html=True,
-            )
-
-    def on_information_gathering_end(self, **kwargs):
-        self.status_container.success("Finish collecting information.")
-
-    def on_information_organization_start(self, **kwargs):
-        self.status_container.info(
-            "Start organizing information into a hierarchical outline."
-        )
-
-    def on_direct_outline_generation_end(self, outline: str, **kwargs):
-        self.status_container.success(
-            "Finish leveraging the internal knowledge of the large language model."
-        )
-
-    def on_outline_refinement_end(self, outline: str, **kwargs):
-        self.status_container.success("Finish leveraging the collected information.")